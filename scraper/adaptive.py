@@ -0,0 +1,445 @@
+"""
+Adaptive request control driven by observed responses.
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from .config import ScraperConfig
+
+
+class AdaptiveRateController:
+    """AIMD control of one host's request rate.
+
+    The rate grows additively while responses are healthy and is cut
+    multiplicatively on 429/503 responses, a Retry-After header, a high
+    error rate, or a p95 latency well above the host's healthy baseline.
+    """
+
+    # Ignore further slow-down signals for this long after a decrease, so
+    # one burst of throttled responses only counts once
+    DECREASE_COOLDOWN = 2.0
+
+    def __init__(self,
+                 limiter: Any,
+                 min_rate: float = 0.2,
+                 max_rate: float = 10.0,
+                 increase_step: float = 0.1,
+                 decrease_factor: float = 0.5,
+                 window_size: int = 50,
+                 latency_tolerance: float = 2.0,
+                 max_error_rate: float = 0.1):
+        """Initialize the controller.
+
+        Args:
+            limiter: Rate limiter whose rate is adjusted with set_rate
+            min_rate: Lowest requests per second the rate is cut to
+            max_rate: Highest requests per second the rate grows to
+            increase_step: Requests per second added per second of healthy traffic
+            decrease_factor: Multiplier applied to the rate on a slow-down signal
+            window_size: Number of recent responses used for p95 and error rate
+            latency_tolerance: p95 above baseline * tolerance counts as congestion
+            max_error_rate: Error fraction in the window that triggers a decrease
+        """
+        self.limiter = limiter
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+
+        self._latencies = deque(maxlen=window_size)
+        self._errors = deque(maxlen=window_size)
+        self._baseline_p95: Optional[float] = None
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        # Start inside the configured bounds
+        self.limiter.set_rate(min(max(self.limiter.requests_per_second, min_rate), max_rate))
+
+    @property
+    def rate(self) -> float:
+        """Current requests per second."""
+        return self.limiter.requests_per_second
+
+    def record(self, latency: Optional[float], status_code: Optional[int] = None,
+               retry_after: Optional[float] = None) -> None:
+        """Feed one response (or failed request) into the controller.
+
+        Args:
+            latency: Seconds until the response headers arrived, None on failure
+            status_code: HTTP status, None if no response was received
+            retry_after: Seconds from a Retry-After header, if present
+        """
+        with self._lock:
+            is_error = status_code is None or status_code >= 500 or status_code == 429
+            self._errors.append(1 if is_error else 0)
+            if latency is not None and not is_error:
+                self._latencies.append(latency)
+
+            if status_code in (429, 503) or retry_after is not None:
+                self._decrease(f"HTTP {status_code}", retry_after)
+                return
+
+            window_full = len(self._errors) == self._errors.maxlen
+            error_rate = sum(self._errors) / len(self._errors)
+            if window_full and error_rate > self.max_error_rate:
+                self._decrease(f"error rate {error_rate:.0%}")
+                return
+
+            p95 = self._p95()
+            if p95 is not None and len(self._latencies) == self._latencies.maxlen:
+                if self._baseline_p95 is None:
+                    self._baseline_p95 = p95
+                elif p95 > self._baseline_p95 * self.latency_tolerance:
+                    self._decrease(f"p95 latency {p95:.2f}s vs baseline {self._baseline_p95:.2f}s")
+                    return
+                else:
+                    # Track the healthy baseline slowly so drift is not mistaken for congestion
+                    self._baseline_p95 = 0.95 * self._baseline_p95 + 0.05 * p95
+
+            if not is_error:
+                self._increase()
+
+    def _p95(self) -> Optional[float]:
+        """95th percentile of the latency window."""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def _increase(self) -> None:
+        """Additive increase, spread over the responses of one second."""
+        rate = self.limiter.requests_per_second
+        self.limiter.set_rate(min(self.max_rate, rate + self.increase_step / max(rate, 1.0)))
+
+    def _decrease(self, reason: str, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease, honoring Retry-After."""
+        now = time.monotonic()
+        if now - self._last_decrease >= self.DECREASE_COOLDOWN:
+            self._last_decrease = now
+
+            old_rate = self.limiter.requests_per_second
+            new_rate = max(self.min_rate, old_rate * self.decrease_factor)
+            self.limiter.set_rate(new_rate)
+            # Latency baseline is re-learned at the new rate
+            self._latencies.clear()
+            self._errors.clear()
+            self.logger.info(f"Adaptive rate: {old_rate:.2f} -> {new_rate:.2f} req/s ({reason})")
+
+        if retry_after:
+            self.limiter.pause(retry_after)
+
+
+class AdaptiveRateRegistry:
+    """Process-wide AIMD controllers, one per host bucket."""
+
+    def __init__(self):
+        self._controllers: Dict[str, AdaptiveRateController] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str, limiter: Any, config: ScraperConfig) -> AdaptiveRateController:
+        """Return the controller for a host's limiter, creating it on first use."""
+        with self._lock:
+            controller = self._controllers.get(host)
+            if controller is None or controller.limiter is not limiter:
+                controller = AdaptiveRateController(
+                    limiter,
+                    min_rate=config.min_requests_per_second,
+                    max_rate=config.max_requests_per_second,
+                    increase_step=config.rate_increase_step,
+                    decrease_factor=config.rate_decrease_factor
+                )
+                self._controllers[host] = controller
+            return controller
+
+
+# Shared by every scraper in the process, like the rate limiter buckets
+rate_controllers = AdaptiveRateRegistry()
+
+
+class LatencyHistogram:
+    """Streaming latency histogram with logarithmic buckets.
+
+    Memory is fixed regardless of the number of samples, and counts are
+    halved periodically so percentiles follow recent behaviour.
+    """
+
+    MIN_LATENCY = 0.001
+    GROWTH = 1.2
+    BUCKETS = 80  # covers 1ms to roughly 2 hours
+
+    def __init__(self, decay_every: int = 500):
+        """Initialize the histogram.
+
+        Args:
+            decay_every: Halve all counts after this many samples
+        """
+        self.decay_every = decay_every
+        self._counts = [0.0] * self.BUCKETS
+        self._total = 0.0
+        self._since_decay = 0
+        self.samples = 0
+
+    def _bucket(self, latency: float) -> int:
+        """Index of the bucket holding a latency."""
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return min(self.BUCKETS - 1,
+                   int(math.log(latency / self.MIN_LATENCY, self.GROWTH)) + 1)
+
+    def add(self, latency: float) -> None:
+        """Record one latency in seconds."""
+        self._counts[self._bucket(latency)] += 1
+        self._total += 1
+        self.samples += 1
+        self._since_decay += 1
+
+        if self._since_decay >= self.decay_every:
+            self._counts = [count / 2 for count in self._counts]
+            self._total /= 2
+            self._since_decay = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)."""
+        if not self._total:
+            return None
+
+        target = self._total * q
+        seen = 0.0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return self.MIN_LATENCY * self.GROWTH ** index
+        return self.MIN_LATENCY * self.GROWTH ** (self.BUCKETS - 1)
+
+
+class AdaptiveTimeouts:
+    """Connect and read timeouts for one host derived from its latency p99.
+
+    Timeouts are a multiple of the observed p99, clamped to the configured
+    bounds, so they tighten for fast sites and only loosen for slow ones.
+    Requests whose response times out are recorded at the read timeout
+    they hit, which pushes the percentile up for hosts that are genuinely
+    slow; connect timeouts are not recorded. Requests through a proxy are
+    tracked apart from direct ones, under "host via proxy".
+    """
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, host: str):
+        self.host = host
+        self.histogram = LatencyHistogram()
+        self._current: Optional[Tuple[float, float]] = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, latency: float) -> None:
+        """Record the time until response headers arrived."""
+        with self._lock:
+            self.histogram.add(latency)
+
+    def timeouts(self, config: ScraperConfig, max_timeout: float) -> Tuple[float, float]:
+        """Return (connect, read) timeouts for the next request.
+
+        Args:
+            config: Source of the multiplier and connect/min bounds
+            max_timeout: Upper bound for the read timeout
+        """
+        with self._lock:
+            p99 = self.histogram.percentile(0.99)
+            if p99 is None or self.histogram.samples < self.MIN_SAMPLES:
+                return min(config.connect_timeout, max_timeout), float(max_timeout)
+
+            derived = p99 * config.timeout_multiplier
+            connect = min(max(derived, config.min_timeout), config.connect_timeout, max_timeout)
+            read = min(max(derived, config.min_timeout), float(max_timeout))
+
+            if self._current is None or abs(self._current[1] - read) > 0.1 * self._current[1]:
+                self.logger.info(f"Timeouts for {self.host}: connect {connect:.2f}s, "
+                                 f"read {read:.2f}s (p99 {p99:.3f}s)")
+            self._current = (connect, read)
+            return connect, read
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Percentiles and the current timeouts, for stats displays."""
+        with self._lock:
+            p50 = self.histogram.percentile(0.5)
+            p99 = self.histogram.percentile(0.99)
+            return {
+                'samples': self.histogram.samples,
+                'p50': round(p50, 3) if p50 else None,
+                'p99': round(p99, 3) if p99 else None,
+                'connect_timeout': round(self._current[0], 2) if self._current else None,
+                'read_timeout': round(self._current[1], 2) if self._current else None,
+            }
+
+
+class AdaptiveTimeoutRegistry:
+    """Process-wide latency trackers, one per host."""
+
+    def __init__(self):
+        self._trackers: Dict[str, AdaptiveTimeouts] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> AdaptiveTimeouts:
+        """Return the tracker for a host, creating it on first use."""
+        with self._lock:
+            tracker = self._trackers.get(host)
+            if tracker is None:
+                tracker = AdaptiveTimeouts(host)
+                self._trackers[host] = tracker
+            return tracker
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Stats for every tracked host."""
+        with self._lock:
+            trackers = list(self._trackers.values())
+        return {tracker.host: tracker.snapshot() for tracker in trackers}
+
+
+timeout_trackers = AdaptiveTimeoutRegistry()
+
+
+class ConcurrencyTuner:
+    """Hill-climbing control of how many fetches a run keeps in flight.
+
+    Every ``interval`` seconds the tuner compares products per second with
+    the previous interval. While throughput keeps rising it keeps moving
+    the limit the same way; when it falls it turns around; when it levels
+    off on the way up the knee has been passed, so it steps back and holds
+    there for a few intervals before probing again. A high error rate
+    cuts the limit, and the limit is not raised while the process is
+    CPU-bound. Rate limits still cap the request rate independently.
+    """
+
+    # Relative throughput change treated as no change
+    TOLERANCE = 0.05
+    # Intervals to stay at the knee before probing upwards again
+    HOLD_INTERVALS = 3
+
+    def __init__(self,
+                 initial: int,
+                 min_limit: int = 1,
+                 max_limit: int = 32,
+                 interval: float = 5.0,
+                 max_error_rate: float = 0.1,
+                 max_cpu: float = 0.9):
+        """Initialize the tuner.
+
+        Args:
+            initial: Starting concurrency
+            min_limit: Lowest concurrency the limit is lowered to
+            max_limit: Highest concurrency the limit is raised to
+            interval: Seconds of results compared per step
+            max_error_rate: Failed fraction of an interval that cuts the limit
+            max_cpu: CPU use of the process (1.0 is one core busy) above which
+                the limit is not raised
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.interval = interval
+        self.max_error_rate = max_error_rate
+        self.max_cpu = max_cpu
+        self.adjustments = 0
+
+        self._direction = 1
+        self._last_throughput: Optional[float] = None
+        self._hold = 0
+        self._completed = 0
+        self._errors = 0
+        self._window_start = time.monotonic()
+        self._cpu_start = time.process_time()
+        self.logger = logging.getLogger(__name__)
+
+    def record(self, success: bool) -> None:
+        """Count one finished fetch attempt; successful ones make up the throughput."""
+        self._completed += 1
+        if not success:
+            self._errors += 1
+
+    def update(self) -> int:
+        """Adjust the limit once an interval's results are in, returning the limit."""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        # Small samples are too noisy to compare
+        if elapsed < self.interval or self._completed < min(self.limit, 10):
+            return self.limit
+
+        throughput = (self._completed - self._errors) / elapsed
+        error_rate = self._errors / self._completed
+        cpu = (time.process_time() - self._cpu_start) / elapsed
+        self._completed = self._errors = 0
+        self._window_start = now
+        self._cpu_start = time.process_time()
+
+        step = max(1, self.limit // 4)
+        measured = (f"{throughput:.2f} products/s, {error_rate:.0%} errors, "
+                    f"CPU {cpu:.0%}")
+
+        if error_rate > self.max_error_rate:
+            self._adjust(-step, f"error rate above {self.max_error_rate:.0%}", measured)
+            self._direction = 1
+            self._last_throughput = None
+            self._hold = 1
+        elif self._hold:
+            self._hold -= 1
+            self._last_throughput = throughput
+            if not self._hold:
+                # Compare the next interval at a new limit, not with itself
+                self._climb(step, "probing again", measured, cpu)
+        elif self._last_throughput is None:
+            self._last_throughput = throughput
+            self._climb(self._direction * step, "probing", measured, cpu)
+        else:
+            change = (throughput - self._last_throughput) / max(self._last_throughput, 1e-9)
+            trend = f"throughput {change:+.0%}"
+            self._last_throughput = throughput
+            if change > self.TOLERANCE:
+                self._climb(self._direction * step, trend, measured, cpu)
+            elif change < -self.TOLERANCE:
+                self._direction = -self._direction
+                self._climb(self._direction * step, trend, measured, cpu)
+            elif self._direction > 0:
+                # Past the knee: more fetches in flight bought nothing
+                self._adjust(-step, f"{trend}, knee reached", measured)
+                self._direction = 1
+                self._hold = self.HOLD_INTERVALS
+            else:
+                self._climb(-step, f"{trend} with fewer fetches", measured, cpu)
+
+        return self.limit
+
+    def _climb(self, delta: int, reason: str, measured: str, cpu: float) -> None:
+        """Move the limit one step, holding instead of rising while CPU-bound."""
+        if delta > 0 and cpu > self.max_cpu:
+            self.logger.info(f"Concurrency stays at {self.limit}: CPU-bound ({measured})")
+            self._direction = 1
+            self._hold = self.HOLD_INTERVALS
+            return
+        if not self._adjust(delta, reason, measured):
+            # At a bound: come back from it on the next step
+            self._direction = -1 if delta > 0 else 1
+
+    def _adjust(self, delta: int, reason: str, measured: str) -> bool:
+        """Change the limit within its bounds, logging why; False if it did not move."""
+        new_limit = min(max(self.limit + delta, self.min_limit), self.max_limit)
+        if new_limit == self.limit:
+            return False
+
+        self.logger.info(f"Concurrency {self.limit} -> {new_limit}: {reason} ({measured})")
+        self.limit = new_limit
+        self.adjustments += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Current limit and number of adjustments, for stats displays."""
+        return {'limit': self.limit, 'adjustments': self.adjustments,
+                'min_limit': self.min_limit, 'max_limit': self.max_limit}
@@ -0,0 +1,213 @@
+"""
+Asyncio-based scraper that keeps many page fetches in flight at once.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Tuple
+from urllib.parse import urlparse
+from lxml.html import HtmlElement
+
+from .models import Product
+from .utils import RateLimiter
+from .config import ScraperConfig
+from .scraper import ProductScraper, FetchError
+from .database import DatabaseManager
+
+
+class AsyncProductScraper(ProductScraper):
+    """Scraper adding coroutine versions of the ProductScraper API.
+
+    The coroutines are named after the methods they mirror with an
+    ``_async`` suffix; the inherited methods stay synchronous, so the
+    scraper can be used wherever a ProductScraper is expected.
+
+    Blocking network I/O and parsing run on a thread pool sized to the
+    global concurrency limit, while the event loop enforces the global and
+    per-host limits. Every fetch still passes through the scraper's
+    per-host RateLimiter and CircuitBreaker, exactly like the synchronous
+    scraper.
+    """
+
+    def __init__(self,
+                 base_url: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 custom_headers: Optional[Dict[str, str]] = None,
+                 timeout: Optional[int] = None,
+                 config: Optional[ScraperConfig] = None,
+                 db_manager: Optional[DatabaseManager] = None,
+                 max_concurrency: Optional[int] = None,
+                 max_per_host: Optional[int] = None):
+        """Initialize the async scraper.
+
+        Args:
+            base_url: Base URL of the e-commerce site
+            rate_limiter: Rate limiter shared by all requests; by default
+                each host gets its own bucket from the process-wide registry
+            custom_headers: Custom HTTP headers
+            timeout: Request timeout in seconds
+            config: Scraper configuration
+            db_manager: Database of earlier results, see ProductScraper
+            max_concurrency: Maximum fetches in flight overall
+            max_per_host: Maximum fetches in flight per host
+        """
+        config = config or ScraperConfig()
+        self.max_concurrency = max_concurrency or config.max_concurrency
+        self.max_per_host = max_per_host or config.max_per_host
+        super().__init__(base_url, rate_limiter=rate_limiter,
+                         custom_headers=custom_headers, timeout=timeout,
+                         config=config, db_manager=db_manager)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                            thread_name_prefix='scraper-fetch')
+        # Asyncio primitives are bound to the loop they are first used on,
+        # so they are created lazily and rebuilt for each new event loop.
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._rate_locks: Dict[str, asyncio.Lock] = {}
+
+    def _pool_maxsize(self) -> int:
+        """Keep one pooled connection per concurrent request to a host."""
+        return max(super()._pool_maxsize(), self.max_per_host)
+
+    def _pool_connections(self) -> int:
+        """Keep a pool for every host that can have requests in flight at once."""
+        hosts = -(-self.max_concurrency // self.max_per_host)
+        return max(super()._pool_connections(), hosts + len(self.config.proxies))
+
+    def _limits_for(self, url: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore, asyncio.Lock]:
+        """Return the global semaphore and the host's semaphore and rate lock."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+            self._host_limits = {}
+            self._rate_locks = {}
+
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+            self._rate_locks[host] = asyncio.Lock()
+        return self._global_limit, self._host_limits[host], self._rate_locks[host]
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on the fetch thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _fetch_async(self, url: str,
+                           site_config: Optional[Dict[str, str]] = None
+                           ) -> Tuple[Optional[HtmlElement], bool]:
+        """Fetch and parse a web page, retrying transient failures.
+
+        Returns:
+            Parsed document or None if failed, and whether the page was
+            served from the HTTP cache after a 304 Not Modified
+        """
+        self.retry_policy.record_request()
+        attempt = 0
+
+        while True:
+            if self.circuit_wait(url) > 0:
+                self.logger.error(f"Skipping {url}: circuit breaker for its host is open")
+                return None, False
+
+            try:
+                return await self._download_async(url, site_config)
+            except FetchError as e:
+                if not (e.retryable and self.retry_policy.should_retry(attempt)):
+                    self.logger.error(f"Error fetching {url}: {e}")
+                    return None, False
+
+                backoff_time = self.retry_policy.backoff(attempt, e.retry_after)
+                self.logger.warning(f"Attempt {attempt + 1} for {url} failed: {e}. "
+                                    f"Retrying in {backoff_time:.2f} seconds...")
+                await asyncio.sleep(backoff_time)
+                attempt += 1
+
+    async def _download_async(self, url: str,
+                              site_config: Optional[Dict[str, str]] = None
+                              ) -> Tuple[Optional[HtmlElement], bool]:
+        """Make one rate-limited attempt at a page within the concurrency limits.
+
+        Returns:
+            Parsed document or None, and whether the page was served
+            from the HTTP cache after a 304 Not Modified
+        """
+        global_limit, host_limit, rate_lock = self._limits_for(url)
+        async with global_limit, host_limit:
+            # Fetches to a host queue on its lock in FIFO order, so only one
+            # pool thread at a time sleeps on that host's token bucket.
+            async with rate_lock:
+                if self.sends_request(url, site_config):
+                    await self._run_blocking(self._rate_limiter_for(url).wait_if_needed)
+            return await self._run_blocking(self._download, url, site_config)
+
+    async def extract_product_urls_async(self,
+                                         category_url: str,
+                                         url_pattern: Optional[str] = None,
+                                         max_pages: int = 10) -> List[str]:
+        """Coroutine version of extract_product_urls.
+
+        Listing pages are followed one after another, since each page
+        links to the next, so the walk runs on one pool thread.
+        """
+        return await self._run_blocking(self.extract_product_urls,
+                                        category_url, url_pattern, max_pages)
+
+    async def extract_changed_product_urls_async(self,
+                                                 category_url: str,
+                                                 url_pattern: Optional[str] = None,
+                                                 max_pages: int = 10) -> List[str]:
+        """Coroutine version of extract_changed_product_urls."""
+        return await self._run_blocking(self.extract_changed_product_urls,
+                                        category_url, url_pattern, max_pages)
+
+    async def extract_listing_products_async(self,
+                                             category_url: str,
+                                             url_pattern: Optional[str] = None,
+                                             max_pages: int = 10) -> List[Product]:
+        """Coroutine version of extract_listing_products."""
+        return await self._run_blocking(self.extract_listing_products,
+                                        category_url, url_pattern, max_pages)
+
+    async def scrape_product_async(self, product_url: str) -> Optional[Product]:
+        """Scrape a single product page without blocking the event loop.
+
+        Args:
+            product_url: URL of the product page
+
+        Returns:
+            Product instance or None if failed
+        """
+        doc, not_modified = await self._fetch_async(product_url,
+                                                    self._stream_parse_config(product_url))
+        if doc is None:
+            return None
+
+        return await self._run_blocking(self._build_product, doc, product_url, not_modified)
+
+    async def scrape_product_attempt_async(self, product_url: str) -> Optional[Product]:
+        """Make a single rate-limited attempt at a product page, without retries.
+
+        Args:
+            product_url: URL of the product page
+
+        Returns:
+            Product instance, or None if the page held no product
+
+        Raises:
+            FetchError: If the page could not be fetched
+        """
+        doc, not_modified = await self._download_async(product_url,
+                                                       self._stream_parse_config(product_url))
+        if doc is None:
+            return None
+
+        return await self._run_blocking(self._build_product, doc, product_url, not_modified)
+
+    def close(self) -> None:
+        """Release the fetch thread pool and HTTP connections."""
+        self._executor.shutdown(wait=False)
+        super().close()
@@ -0,0 +1,401 @@
+"""
+Persistent HTTP cache with ETag / Last-Modified revalidation, and a cache
+of dead URLs and redirect targets.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .utils import canonicalize_url
+from .connections import ConnectionPoolAdapter
+
+
+@dataclass
+class CacheEntry:
+    """A stored response body and the validators to revalidate it with."""
+
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: str
+    body: bytes
+
+
+class HTTPCache:
+    """Response bodies and validators kept in a SQLite file, keyed by canonical URL.
+
+    The cache is bounded by the total body size; when it grows past the
+    limit the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 256 * 1024 * 1024):
+        """Initialize the cache.
+
+        Args:
+            db_path: Path to the SQLite file holding the cache
+            max_bytes: Total body size to keep before evicting entries
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                body BLOB,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_last_used ON http_cache(last_used)')
+        self._total_bytes = self._stored_bytes()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _stored_bytes(self) -> int:
+        """Total body size currently in the cache file."""
+        row = self._connection().execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()
+        return row[0]
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """Increment one of this process's counters."""
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Return the entry for a URL, or None if it is not cached."""
+        key = canonicalize_url(url)
+        row = self._connection().execute(
+            'SELECT etag, last_modified, content_type, body FROM http_cache WHERE url = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(key, row[0], row[1], row[2] or '', row[3])
+
+    def hit(self, entry: CacheEntry) -> None:
+        """Record that an entry was served after a 304 response."""
+        self._connection().execute('UPDATE http_cache SET last_used = ? WHERE url = ?',
+                                   (time.time(), entry.url))
+        self._count('hits')
+
+    def miss(self) -> None:
+        """Record a request whose body had to be downloaded."""
+        self._count('misses')
+
+    def store(self, response: requests.Response, body: bytes) -> bool:
+        """Store a complete response body if the response carries validators.
+
+        The body is keyed by the URL it was requested at, which is what
+        CachingAdapter looks entries up by.
+
+        Args:
+            response: Response the body was read from
+            body: Decoded body
+
+        Returns:
+            True if the body was stored
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified) or len(body) > self.max_bytes:
+            return False
+
+        key = canonicalize_url(response.request.url)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT size FROM http_cache WHERE url = ?', (key,)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO http_cache
+                    (url, etag, last_modified, content_type, body, size, stored_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, etag, last_modified, response.headers.get('content-type', ''),
+                  body, len(body), now, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            self._counters['stores'] += 1
+            over_limit = self._total_bytes > self.max_bytes
+
+        if over_limit:
+            self._evict()
+        return True
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits its size limit."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Other processes may share the file, so start from the real total
+            total = self._stored_bytes()
+            evicted = 0
+            for url, size in conn.execute(
+                    'SELECT url, size FROM http_cache ORDER BY last_used').fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM http_cache WHERE url = ?', (url,))
+                total -= size
+                evicted += 1
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self._total_bytes = total
+            self._counters['evictions'] += evicted
+        self.logger.debug(f"HTTP cache evicted {evicted} entries")
+
+    def purge(self) -> int:
+        """Delete every entry, returning how many were removed."""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM http_cache').rowcount
+        conn.execute('VACUUM')
+        with self._lock:
+            self._total_bytes = 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Size of the cache file and this process's hit counters."""
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache').fetchone()
+        with self._lock:
+            return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                    **self._counters}
+
+
+class CachingAdapter(ConnectionPoolAdapter):
+    """ConnectionPoolAdapter that revalidates cached pages with conditional GETs.
+
+    Requests for cached URLs carry If-None-Match / If-Modified-Since; a 304
+    answer is turned into a 200 response holding the stored body, marked
+    with ``from_cache = True``. Storing bodies is left to the caller, which
+    knows when a streamed body has been read completely.
+    """
+
+    def __init__(self, cache: HTTPCache, **kwargs):
+        """Initialize the adapter.
+
+        Args:
+            cache: Cache to revalidate against
+            **kwargs: Passed on to ConnectionPoolAdapter
+        """
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if request.method != 'GET':
+            return super().send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry:
+            if entry.etag:
+                request.headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request.headers['If-Modified-Since'] = entry.last_modified
+
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and entry:
+            self.cache.hit(entry)
+            return self._cached_response(response, entry)
+
+        self.cache.miss()
+        return response
+
+    def _cached_response(self, response: requests.Response, entry: CacheEntry) -> requests.Response:
+        """Build a 200 response with the stored body from a 304 response."""
+        response.content  # release the connection back to the pool
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = 'OK'
+        cached.headers = CaseInsensitiveDict(response.headers)
+        cached.headers.pop('Content-Encoding', None)
+        cached.headers['Content-Type'] = entry.content_type
+        cached.headers['Content-Length'] = str(len(entry.body))
+        cached._content = entry.body
+        cached._content_consumed = True
+        cached.raw = response.raw
+        cached.url = response.url
+        cached.request = response.request
+        cached.connection = response.connection
+        cached.encoding = get_encoding_from_headers(cached.headers)
+        cached.from_cache = True
+        return cached
+
+
+class UrlCache:
+    """Dead URLs and redirect targets kept in a SQLite file, keyed by canonical URL.
+
+    URLs that answered 404 or 410 are remembered for ``negative_ttl``
+    seconds so they are not fetched again, and URLs that redirected
+    permanently are mapped to their target for ``redirect_ttl`` seconds so
+    later requests skip the redirect hops.
+    """
+
+    # Statuses that mark a URL as dead
+    DEAD_STATUS = {404, 410}
+    # Redirects that may be followed without asking the server again
+    PERMANENT_REDIRECT_STATUS = {301, 308}
+
+    def __init__(self, db_path: str, negative_ttl: float = 24 * 3600,
+                 redirect_ttl: float = 7 * 24 * 3600):
+        """Initialize the cache.
+
+        Args:
+            db_path: Path to the SQLite file holding the cache
+            negative_ttl: Seconds a dead URL is skipped for
+            redirect_ttl: Seconds a redirect target is used for
+        """
+        self.db_path = db_path
+        self.negative_ttl = negative_ttl
+        self.redirect_ttl = redirect_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'dead_hits': 0, 'redirect_hits': 0}
+
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS dead_urls (
+                url TEXT PRIMARY KEY,
+                status_code INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS redirects (
+                url TEXT PRIMARY KEY,
+                target TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str) -> None:
+        """Increment one of this process's counters."""
+        with self._lock:
+            self._counters[counter] += 1
+
+    def dead_status(self, url: str) -> Optional[int]:
+        """Return the status a URL was found dead with, or None if it is not known dead."""
+        row = self._connection().execute(
+            'SELECT status_code FROM dead_urls WHERE url = ? AND expires_at > ?',
+            (canonicalize_url(url), time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, url: str) -> Tuple[str, Optional[int]]:
+        """Resolve a URL about to be fetched, counting cache hits.
+
+        Returns:
+            The URL to request (the cached redirect target, if any), and the
+            status the URL was found dead with, or None if it may be fetched
+        """
+        self._count('lookups')
+        status_code = self.dead_status(url)
+        if status_code is not None:
+            self._count('dead_hits')
+            return url, status_code
+
+        row = self._connection().execute(
+            'SELECT target FROM redirects WHERE url = ? AND expires_at > ?',
+            (canonicalize_url(url), time.time())
+        ).fetchone()
+        if row is None:
+            return url, None
+
+        self._count('redirect_hits')
+        return row[0], None
+
+    def mark_dead(self, url: str, status_code: int) -> None:
+        """Remember that a URL answered with a dead status."""
+        self._connection().execute(
+            'INSERT OR REPLACE INTO dead_urls (url, status_code, expires_at) VALUES (?, ?, ?)',
+            (canonicalize_url(url), status_code, time.time() + self.negative_ttl)
+        )
+
+    def add_redirect(self, url: str, target: str) -> None:
+        """Remember the final URL a URL redirected to."""
+        if canonicalize_url(url) == canonicalize_url(target):
+            return
+        self._connection().execute(
+            'INSERT OR REPLACE INTO redirects (url, target, expires_at) VALUES (?, ?, ?)',
+            (canonicalize_url(url), target, time.time() + self.redirect_ttl)
+        )
+
+    def add_redirects(self, url: str, response: requests.Response) -> None:
+        """Remember where a URL redirected to, following only permanent hops.
+
+        A 302, 303 or 307 may point somewhere else next time, so the target
+        recorded is the one reached before the first such hop, if any.
+        """
+        target = None
+        hops = response.history + [response]
+        for hop, following in zip(hops, hops[1:]):
+            if hop.status_code not in self.PERMANENT_REDIRECT_STATUS:
+                break
+            target = following.url
+        if target:
+            self.add_redirect(url, target)
+
+    def forget_redirect(self, url: str) -> None:
+        """Drop the redirect recorded for a URL."""
+        self._connection().execute('DELETE FROM redirects WHERE url = ?',
+                                   (canonicalize_url(url),))
+
+    def purge(self) -> int:
+        """Delete every entry, returning how many were removed."""
+        conn = self._connection()
+        removed = conn.execute('DELETE FROM dead_urls').rowcount
+        removed += conn.execute('DELETE FROM redirects').rowcount
+        conn.execute('VACUUM')
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of live entries and this process's hit counters."""
+        conn = self._connection()
+        now = time.time()
+        dead = conn.execute('SELECT COUNT(*) FROM dead_urls WHERE expires_at > ?',
+                            (now,)).fetchone()[0]
+        redirects = conn.execute('SELECT COUNT(*) FROM redirects WHERE expires_at > ?',
+                                 (now,)).fetchone()[0]
+        with self._lock:
+            return {'dead_urls': dead, 'redirects': redirects, **self._counters}
@@ -7,13 +7,20 @@ import sys
 import logging
 from typing import Optional, List
 from pathlib import Path
+from urllib.parse import urlparse
 import time
+import asyncio
 from tqdm import tqdm
 
 from .scraper import ProductScraper
+from .async_scraper import AsyncProductScraper
 from .database import DatabaseManager
 from .models import Product
-from .utils import RateLimiter
+from .runner import ScrapeRunner, ScrapeSummary
+from .config import ScraperConfig
+from .cache import HTTPCache, UrlCache
+from .extraction import SelectorLearner
+from .utils import parse_duration, parse_size
 
 
 def setup_logging(verbose: bool = False, log_file: Optional[str] = None) -> None:
@@ -54,9 +61,36 @@ Examples:
   # Scrape with custom rate limiting
   python -m scraper.cli scrape https://example.com/category/electronics --rate 0.5 --burst 3
   
+  # Scrape product pages with 8 worker threads
+  python -m scraper.cli scrape https://example.com/category/electronics --workers 8 --rate 4
+  
+  # Scrape with many requests in flight using the asyncio engine
+  python -m scraper.cli scrape https://example.com/category/electronics --async --rate 10 --concurrency 100 --per-host 8
+  
   # Scrape specific product URLs
   python -m scraper.cli scrape-urls urls.txt
   
+  # Re-drive URLs that failed in earlier runs
+  python -m scraper.cli retry-failed --limit 100
+  
+  # Re-run a scrape, revalidating unchanged pages against the HTTP cache
+  python -m scraper.cli scrape https://example.com/category/electronics --http-cache
+  
+  # Skip URLs that answered 404/410 and follow known redirects directly
+  python -m scraper.cli scrape https://example.com/category/electronics --url-cache
+  
+  # Learn which selectors work on sites without configured selectors
+  python -m scraper.cli scrape https://example.com/category/electronics --learn-selectors
+  
+  # Take name, price, rating and availability from listing cards only, and
+  # fetch the product pages for the remaining fields later
+  python -m scraper.cli scrape https://books.toscrape.com/ --listing-cards
+  python -m scraper.cli fill-details --limit 100
+  
+  # Show or empty the HTTP and URL caches
+  python -m scraper.cli cache stats
+  python -m scraper.cli cache purge
+  
   # Export scraped data to CSV
   python -m scraper.cli export products.csv
   
@@ -125,6 +159,21 @@ Examples:
             '--headers',
             help='Custom headers as JSON string'
         )
+        listing_mode = scrape_parser.add_mutually_exclusive_group()
+        listing_mode.add_argument(
+            '--listing-cards',
+            action='store_true',
+            help='Save the products shown on listing cards without fetching product pages, '
+                 'on sites with card selectors; the fields cards lack are marked pending'
+        )
+        listing_mode.add_argument(
+            '--listing-diff',
+            action='store_true',
+            help='Only scrape the product pages of new products and of products whose '
+                 'listing card shows another name, price or availability, on sites with '
+                 'card selectors'
+        )
+        self._add_engine_arguments(scrape_parser)
         
         # Scrape URLs command
         scrape_urls_parser = subparsers.add_parser(
@@ -153,6 +202,84 @@ Examples:
             default=30,
             help='Request timeout in seconds (default: 30)'
         )
+        self._add_engine_arguments(scrape_urls_parser)
+        
+        # Retry failed URLs command
+        retry_failed_parser = subparsers.add_parser(
+            'retry-failed',
+            help='Scrape again the URLs recorded as failed by earlier runs'
+        )
+        retry_failed_parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of failed URLs to retry (oldest first)'
+        )
+        retry_failed_parser.add_argument(
+            '--rate', '-r',
+            type=float,
+            default=1.0,
+            help='Requests per second (default: 1.0)'
+        )
+        retry_failed_parser.add_argument(
+            '--burst', '-b',
+            type=int,
+            default=5,
+            help='Burst size for rate limiting (default: 5)'
+        )
+        retry_failed_parser.add_argument(
+            '--timeout',
+            type=int,
+            default=30,
+            help='Request timeout in seconds (default: 30)'
+        )
+        self._add_engine_arguments(retry_failed_parser)
+        
+        # Fill details command
+        fill_details_parser = subparsers.add_parser(
+            'fill-details',
+            help='Scrape the product pages of products saved from listing cards'
+        )
+        fill_details_parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of products to fill in (oldest first)'
+        )
+        fill_details_parser.add_argument(
+            '--fields',
+            help='Only products whose cards lacked one of these comma-separated fields, '
+                 'e.g. description,category'
+        )
+        fill_details_parser.add_argument(
+            '--rate', '-r',
+            type=float,
+            default=1.0,
+            help='Requests per second (default: 1.0)'
+        )
+        fill_details_parser.add_argument(
+            '--burst', '-b',
+            type=int,
+            default=5,
+            help='Burst size for rate limiting (default: 5)'
+        )
+        fill_details_parser.add_argument(
+            '--timeout',
+            type=int,
+            default=30,
+            help='Request timeout in seconds (default: 30)'
+        )
+        self._add_engine_arguments(fill_details_parser)
+        
+        # Cache command
+        cache_parser = subparsers.add_parser(
+            'cache',
+            help='Show statistics for or purge the HTTP and URL caches'
+        )
+        cache_parser.add_argument(
+            'action',
+            choices=['stats', 'purge'],
+            help='stats: show cache sizes; purge: delete all cached pages, dead URLs '
+                 'and redirects'
+        )
         
         # Export command
         export_parser = subparsers.add_parser(
@@ -196,6 +323,164 @@ Examples:
         
         return parser
     
+    def _add_engine_arguments(self, parser: argparse.ArgumentParser) -> None:
+        """Add fetch engine options shared by the scrape commands."""
+        parser.add_argument(
+            '--adaptive-rate',
+            action='store_true',
+            help='Adjust the rate per host (AIMD) from latency, errors, 429s and Retry-After'
+        )
+        parser.add_argument(
+            '--min-rate',
+            type=float,
+            default=0.2,
+            help='Lowest requests per second with --adaptive-rate (default: 0.2)'
+        )
+        parser.add_argument(
+            '--max-rate',
+            type=float,
+            default=10.0,
+            help='Highest requests per second with --adaptive-rate (default: 10.0)'
+        )
+        parser.add_argument(
+            '--adaptive-timeouts',
+            action='store_true',
+            help='Derive per-host connect/read timeouts from observed p99 latency, '
+                 'capped by --timeout'
+        )
+        parser.add_argument(
+            '--max-body-bytes',
+            type=int,
+            default=10 * 1024 * 1024,
+            help='Abort responses with larger bodies, 0 for no limit (default: 10 MiB)'
+        )
+        parser.add_argument(
+            '--download-timeout',
+            type=float,
+            default=60.0,
+            help='Abort body downloads taking longer than this many seconds (default: 60)'
+        )
+        parser.add_argument(
+            '--streaming-parse',
+            action='store_true',
+            help='Parse product pages while they download and stop reading once '
+                 'all fields of a configured site are found (with --no-structured-data)'
+        )
+        parser.add_argument(
+            '--http-cache',
+            action='store_true',
+            help='Cache pages in httpcache.db next to the database and revalidate them '
+                 'with ETag/Last-Modified; unchanged products are not extracted again'
+        )
+        parser.add_argument(
+            '--url-cache',
+            action='store_true',
+            help='Remember URLs that answered 404/410 and the target of 301/308 redirects '
+                 'in urlcache.db next to the database, and skip them on later runs'
+        )
+        parser.add_argument(
+            '--learn-selectors',
+            action='store_true',
+            help='On sites without configured selectors, learn which selectors find each '
+                 'field (kept in selectors.db next to the database) and only try those'
+        )
+        parser.add_argument(
+            '--no-structured-data',
+            dest='structured_data',
+            action='store_false',
+            help='Ignore JSON-LD, microdata, embedded state and OpenGraph data and '
+                 'extract every field with selectors'
+        )
+        parser.add_argument(
+            '--proxy',
+            dest='proxies',
+            action='append',
+            default=[],
+            help='Proxy URL to spread requests over; repeat for a pool of proxies'
+        )
+        parser.add_argument(
+            '--proxy-assignment',
+            choices=['request', 'session'],
+            default='request',
+            help='Pick a proxy for every request (request) or keep one per host '
+                 '(session) (default: request)'
+        )
+        parser.add_argument(
+            '--time-budget',
+            type=parse_duration,
+            default=0.0,
+            help='Stop starting new fetches after this long, e.g. 90s, 20m or 2h (default: no limit)'
+        )
+        parser.add_argument(
+            '--request-budget',
+            type=int,
+            default=0,
+            help='Send at most this many requests (default: no limit)'
+        )
+        parser.add_argument(
+            '--byte-budget',
+            type=parse_size,
+            default=0,
+            help='Stop starting new fetches after downloading this much, e.g. 500MB or 2GB '
+                 '(default: no limit)'
+        )
+        parser.add_argument(
+            '--prewarm',
+            type=int,
+            default=0,
+            help='Open this many keep-alive connections to each host before scraping '
+                 '(default: 0)'
+        )
+        parser.add_argument(
+            '--no-dns-cache',
+            dest='dns_cache',
+            action='store_false',
+            help='Resolve host names for every new connection instead of caching them'
+        )
+        parser.add_argument(
+            '--workers', '-w',
+            type=int,
+            default=1,
+            help='Number of worker threads scraping product pages (default: 1)'
+        )
+        parser.add_argument(
+            '--autotune',
+            action='store_true',
+            help='Adjust the number of fetches in flight during the run to find the '
+                 'throughput knee, starting from --workers (or --per-host with --async)'
+        )
+        parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=32,
+            help='Most worker threads --autotune may use (default: 32)'
+        )
+        parser.add_argument(
+            '--rate-backend',
+            choices=['memory', 'sqlite'],
+            default='memory',
+            help='Keep rate limit buckets in this process (memory) or share them '
+                 'with other processes through ratelimits.db next to the database (sqlite)'
+        )
+        parser.add_argument(
+            '--async',
+            dest='use_async',
+            action='store_true',
+            help='Use the asyncio engine to keep many requests in flight'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=100,
+            help='Maximum requests in flight with --async (default: 100)'
+        )
+        parser.add_argument(
+            '--per-host',
+            type=int,
+            default=8,
+            help='Maximum requests in flight per host with --async (default: 8)'
+        )
+    
     def run(self, args: Optional[List[str]] = None) -> int:
         """Run the CLI application."""
         parsed_args = self.parser.parse_args(args)
@@ -215,6 +500,12 @@ Examples:
                 return self._handle_scrape(parsed_args)
             elif parsed_args.command == 'scrape-urls':
                 return self._handle_scrape_urls(parsed_args)
+            elif parsed_args.command == 'retry-failed':
+                return self._handle_retry_failed(parsed_args)
+            elif parsed_args.command == 'fill-details':
+                return self._handle_fill_details(parsed_args)
+            elif parsed_args.command == 'cache':
+                return self._handle_cache(parsed_args)
             elif parsed_args.command == 'export':
                 return self._handle_export(parsed_args)
             elif parsed_args.command == 'stats':
@@ -231,6 +522,9 @@ Examples:
         except Exception as e:
             self.logger.error(f"Error: {e}")
             return 1
+        finally:
+            if self.scraper:
+                self.scraper.close()
     
     def _handle_scrape(self, args) -> int:
         """Handle scrape command."""
@@ -245,58 +539,80 @@ Examples:
                 return 1
         
         # Initialize scraper
-        rate_limiter = RateLimiter(args.rate, args.burst)
-        self.scraper = ProductScraper(
-            args.url,
-            rate_limiter=rate_limiter,
-            custom_headers=custom_headers,
-            timeout=args.timeout
-        )
+        self.scraper = self._create_scraper(args, args.url, custom_headers)
+        
+        if args.listing_cards:
+            if self.scraper.has_listing_cards(args.url):
+                return self._scrape_listing_cards(args)
+            print(f"No listing card selectors for {urlparse(args.url).netloc}, "
+                  f"scraping product pages")
+        
+        listing_diff = args.listing_diff and self.scraper.has_listing_cards(args.url)
+        if args.listing_diff and not listing_diff:
+            print(f"No listing card selectors for {urlparse(args.url).netloc}, "
+                  f"scraping every product page")
         
         # Extract product URLs
         print(f"Extracting product URLs from: {args.url}")
-        product_urls = self.scraper.extract_product_urls(
+        if args.use_async:
+            extract = (self.scraper.extract_changed_product_urls_async if listing_diff
+                       else self.scraper.extract_product_urls_async)
+        else:
+            extract = (self.scraper.extract_changed_product_urls if listing_diff
+                       else self.scraper.extract_product_urls)
+        extraction = extract(
             args.url,
             url_pattern=args.pattern,
             max_pages=args.max_pages
         )
+        product_urls = asyncio.run(extraction) if args.use_async else extraction
+        
+        if not product_urls and listing_diff and not self.scraper.budget.exhausted():
+            diff = self.scraper.get_stats()['listing_diff'] or {'unchanged': 0}
+            print(f"No new or changed products ({diff['unchanged']} unchanged products "
+                  f"marked as seen)")
+            return 0
         
         if not product_urls:
-            print("No product URLs found")
+            exhausted = self.scraper.budget.exhausted()
+            if exhausted:
+                print(f"No product URLs found before the {self.scraper.budget.describe(exhausted)} "
+                      f"was reached")
+            else:
+                print("No product URLs found")
             return 1
         
         print(f"Found {len(product_urls)} product URLs")
         
-        # Scrape products with progress bar
-        success_count = 0
-        error_count = 0
+        self._scrape_products(product_urls)
+        return 0
+    
+    def _scrape_listing_cards(self, args) -> int:
+        """Save the products on a category's listing cards."""
+        print(f"Extracting products from listing cards: {args.url}")
+        extract = (self.scraper.extract_listing_products_async if args.use_async
+                   else self.scraper.extract_listing_products)
+        extraction = extract(
+            args.url,
+            url_pattern=args.pattern,
+            max_pages=args.max_pages
+        )
+        products = asyncio.run(extraction) if args.use_async else extraction
+        
+        if not products:
+            print("No products found on listing cards")
+            return 1
         
-        with tqdm(total=len(product_urls), desc="Scraping products") as pbar:
-            for url in product_urls:
-                try:
-                    product = self.scraper.scrape_product(url)
-                    if product:
-                        if self.db_manager.save_product(product):
-                            success_count += 1
-                        else:
-                            error_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    self.logger.error(f"Error scraping {url}: {e}")
-                    error_count += 1
-                
-                pbar.update(1)
-                pbar.set_postfix({
-                    'Success': success_count,
-                    'Errors': error_count
-                })
+        saved = self.db_manager.save_listing_products(products)
+        pending = self.db_manager.get_detail_pending_count()
+        requests_sent = self.scraper.get_stats()['retries']['requests']
         
         print(f"\nScraping completed:")
-        print(f"  Successfully scraped: {success_count}")
-        print(f"  Errors: {error_count}")
+        print(f"  Saved from listing cards: {saved} products ({requests_sent} requests)")
         print(f"  Total in database: {self.db_manager.get_product_count()}")
-        
+        if pending:
+            print(f"  Detail fields pending: {pending} products "
+                  f"(fetch their product pages with the fill-details command)")
         return 0
     
     def _handle_scrape_urls(self, args) -> int:
@@ -313,52 +629,253 @@ Examples:
             print("No URLs found in file")
             return 1
         
-        # Initialize scraper
-        rate_limiter = RateLimiter(args.rate, args.burst)
-        
         # Use first URL to determine base URL
-        from urllib.parse import urlparse
         parsed_url = urlparse(urls[0])
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         
-        self.scraper = ProductScraper(
-            base_url,
-            rate_limiter=rate_limiter,
-            timeout=args.timeout
-        )
+        # Initialize scraper
+        self.scraper = self._create_scraper(args, base_url)
         
         print(f"Scraping {len(urls)} product URLs")
         
-        # Scrape products with progress bar
-        success_count = 0
-        error_count = 0
-        
-        with tqdm(total=len(urls), desc="Scraping products") as pbar:
-            for url in urls:
-                try:
-                    product = self.scraper.scrape_product(url)
-                    if product:
-                        if self.db_manager.save_product(product):
-                            success_count += 1
-                        else:
-                            error_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    self.logger.error(f"Error scraping {url}: {e}")
-                    error_count += 1
-                
+        self._scrape_products(urls)
+        return 0
+    
+    def _handle_retry_failed(self, args) -> int:
+        """Handle retry-failed command."""
+        failed = self.db_manager.get_failed_urls(limit=args.limit)
+        if not failed:
+            print("No failed URLs to retry")
+            return 0
+        
+        urls = [row['url'] for row in failed]
+        parsed_url = urlparse(urls[0])
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        
+        self.scraper = self._create_scraper(args, base_url)
+        
+        print(f"Retrying {len(urls)} failed URLs")
+        
+        self._scrape_products(urls)
+        return 0
+    
+    def _handle_fill_details(self, args) -> int:
+        """Handle fill-details command."""
+        fields = [field.strip() for field in args.fields.split(',')] if args.fields else None
+        pending = self.db_manager.get_detail_pending(limit=args.limit, fields=fields)
+        if not pending:
+            print("No products with detail fields pending")
+            return 0
+        
+        urls = [row['url'] for row in pending]
+        parsed_url = urlparse(urls[0])
+        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        
+        self.scraper = self._create_scraper(args, base_url)
+        
+        print(f"Fetching {len(urls)} product pages for pending detail fields")
+        
+        self._scrape_products(urls)
+        return 0
+    
+    def _create_scraper(self, args, base_url: str,
+                        custom_headers: Optional[dict] = None) -> ProductScraper:
+        """Create the scraper selected by the command line options."""
+        config = ScraperConfig(
+            requests_per_second=args.rate,
+            burst_size=args.burst,
+            timeout=args.timeout,
+            adaptive_timeouts=args.adaptive_timeouts,
+            max_body_bytes=args.max_body_bytes,
+            download_timeout=args.download_timeout,
+            streaming_parse=args.streaming_parse,
+            http_cache=args.http_cache,
+            url_cache=args.url_cache,
+            selector_learning=args.learn_selectors,
+            structured_data=args.structured_data,
+            proxies=args.proxies,
+            proxy_assignment=args.proxy_assignment,
+            dns_cache=args.dns_cache,
+            prewarm_connections=args.prewarm,
+            time_budget=args.time_budget,
+            request_budget=args.request_budget,
+            byte_budget=args.byte_budget,
+            adaptive_rate=args.adaptive_rate,
+            min_requests_per_second=args.min_rate,
+            max_requests_per_second=args.max_rate,
+            rate_limit_backend=args.rate_backend,
+            database_path=args.database,
+            workers=args.workers,
+            autotune_concurrency=args.autotune,
+            autotune_max_workers=args.max_workers,
+            max_concurrency=args.concurrency,
+            max_per_host=args.per_host
+        )
+        scraper_class = AsyncProductScraper if args.use_async else ProductScraper
+        
+        return scraper_class(base_url, custom_headers=custom_headers, config=config,
+                             db_manager=self.db_manager)
+    
+    def _scrape_products(self, product_urls: List[str]) -> ScrapeSummary:
+        """Scrape product URLs with a progress bar and print a summary."""
+        with tqdm(total=len(product_urls), desc="Scraping products") as pbar:
+            def on_progress(url: str, summary: ScrapeSummary) -> None:
                 pbar.update(1)
                 pbar.set_postfix({
-                    'Success': success_count,
-                    'Errors': error_count
+                    'Success': summary.success_count,
+                    'Errors': summary.error_count
                 })
+            
+            runner = ScrapeRunner(self.scraper, self.db_manager,
+                                  workers=self.scraper.config.workers,
+                                  on_progress=on_progress)
+            summary = runner.run(product_urls)
         
         print(f"\nScraping completed:")
-        print(f"  Successfully scraped: {success_count}")
-        print(f"  Errors: {error_count}")
+        print(f"  Successfully scraped: {summary.success_count}")
+        print(f"  Errors: {summary.error_count}")
         print(f"  Total in database: {self.db_manager.get_product_count()}")
+        if summary.failed_urls:
+            print(f"  Failed URLs recorded: {summary.failed_urls} "
+                  f"(re-drive them with the retry-failed command)")
+        if summary.concurrency is not None:
+            print(f"  Concurrency autotuned: settled at {summary.concurrency} fetches in flight "
+                  f"after {summary.concurrency_adjustments} adjustments")
+        listing_diff = self.scraper.get_stats()['listing_diff']
+        if listing_diff:
+            print(f"  Listing diff: {listing_diff['new']} new and {listing_diff['changed']} "
+                  f"changed products scraped, {listing_diff['unchanged']} unchanged "
+                  f"marked as seen without fetching")
+        if summary.stopped_by:
+            print(f"  Stopped early: {self.scraper.budget.describe(summary.stopped_by)} reached, "
+                  f"{summary.total - summary.processed} URLs not scraped")
+        
+        budget = self.scraper.get_stats()['budget']
+        if budget['max_seconds'] or budget['max_requests'] or budget['max_bytes']:
+            print(f"  Budget used: {budget['seconds']}s, {budget['requests']} requests, "
+                  f"{budget['bytes'] / (1024 * 1024):.1f} MiB")
+        
+        retries = self.scraper.get_stats()['retries']
+        print(f"  Retries: {retries['retries']} for {retries['requests']} requests"
+              + (f" (budget exhausted {retries['budget_exhausted']} times)"
+                 if retries['budget_exhausted'] else ""))
+        
+        transfer = self.scraper.get_stats()['transfer']
+        if transfer['aborted']:
+            print(f"  Downloads aborted early: {transfer['aborted']} "
+                  f"({transfer['bytes_saved'] / 1024:.0f} KiB not transferred)")
+        
+        coalesced = self.scraper.get_stats()['coalesced']
+        if coalesced['coalesced']:
+            print(f"  Coalesced fetches: {coalesced['coalesced']} of {coalesced['calls']} "
+                  f"page downloads shared another in-flight download")
+        
+        http_cache = self.scraper.get_stats()['http_cache']
+        if http_cache:
+            print(f"  HTTP cache: {http_cache['hits']} pages not modified, "
+                  f"{http_cache['unchanged_products']} unchanged products not re-extracted, "
+                  f"{http_cache['entries']} pages cached "
+                  f"({http_cache['bytes'] / (1024 * 1024):.1f} MiB)")
+        
+        url_cache = self.scraper.get_stats()['url_cache']
+        if url_cache:
+            lookups = url_cache['lookups'] or 1
+            print(f"  URL cache: {url_cache['dead_hits']} of {url_cache['lookups']} fetches "
+                  f"skipped as dead ({url_cache['dead_hits'] / lookups:.0%}), "
+                  f"{url_cache['redirect_hits']} sent straight to the redirect target "
+                  f"({url_cache['redirect_hits'] / lookups:.0%})")
+        
+        selector_learning = self.scraper.get_stats()['selector_learning']
+        if selector_learning:
+            print(f"  Learned selectors: {selector_learning['learned_pages']} pages extracted "
+                  f"with learned selectors, {selector_learning['full_pages']} with all "
+                  f"({selector_learning['rechecked_pages']} rechecked after a missing field), "
+                  f"{selector_learning['relearned_fields']} fields relearned")
+        
+        structured = self.scraper.get_stats()['structured_data']
+        if structured:
+            print(f"  Structured data: {structured['pages']} products had structured data, "
+                  f"{structured['complete']} needed no selectors")
+        
+        proxies = self.scraper.get_stats()['proxies']
+        if proxies:
+            print(f"  Proxies:")
+            for proxy, stats in proxies.items():
+                latency = f"{stats['latency']}s" if stats['latency'] is not None else "n/a"
+                print(f"    {proxy}: {stats['requests']} requests, {stats['errors']} errors, "
+                      f"{stats['bans']} bans, latency {latency}"
+                      + (f", quarantined for {stats['quarantined_for']}s"
+                         if stats['quarantined_for'] else ""))
+        
+        connections = self.scraper.get_stats()['connections']
+        if connections:
+            print(f"  Connections per host:")
+            for host, stats in connections.items():
+                reuse = f"{stats['reuse_ratio']:.0%}" if stats['reuse_ratio'] is not None else "n/a"
+                print(f"    {host}: {stats['requests']} requests, {stats['handshakes']} handshakes"
+                      + (f" (+{stats['prewarmed']} pre-warmed)" if stats['prewarmed'] else "")
+                      + f", reuse {reuse}")
+        dns = self.scraper.get_stats()['dns_cache']
+        if dns:
+            print(f"  DNS cache: {dns['hits']} hits, {dns['misses']} lookups")
+        
+        open_circuits = [host for host, state in self.scraper.get_stats()['circuits'].items()
+                         if state != 'closed']
+        if open_circuits:
+            print(f"  Circuit breakers not closed: {', '.join(open_circuits)}")
+        
+        if self.scraper.config.adaptive_rate:
+            print(f"  Request rates per host:")
+            for host, rate in self.scraper.get_stats()['host_rates'].items():
+                print(f"    {host}: {rate} req/s")
+        
+        if self.scraper.config.adaptive_timeouts:
+            print(f"  Timeouts per host:")
+            for host, stats in self.scraper.get_stats()['host_timeouts'].items():
+                print(f"    {host}: connect {stats['connect_timeout']}s, read {stats['read_timeout']}s "
+                      f"(p50 {stats['p50']}s, p99 {stats['p99']}s, {stats['samples']} samples)")
+        
+        return summary
+    
+    def _handle_cache(self, args) -> int:
+        """Handle cache command."""
+        config = ScraperConfig(database_path=args.database)
+        cache_path = config.http_cache_db_path()
+        url_cache_path = config.url_cache_db_path()
+        selectors_path = config.selector_learning_db_path()
+        if not any(Path(path).exists() for path in (cache_path, url_cache_path, selectors_path)):
+            print(f"No HTTP cache at {cache_path}, no URL cache at {url_cache_path} "
+                  f"and no learned selectors at {selectors_path}")
+            return 0
         
+        if Path(cache_path).exists():
+            cache = HTTPCache(cache_path)
+            if args.action == 'purge':
+                print(f"Purged {cache.purge()} cached pages from {cache_path}")
+            else:
+                stats = cache.stats()
+                print(f"HTTP Cache Statistics ({cache_path}):")
+                print(f"  Cached pages: {stats['entries']}")
+                print(f"  Size: {stats['bytes'] / (1024 * 1024):.1f} MiB")
+        
+        if Path(url_cache_path).exists():
+            url_cache = UrlCache(url_cache_path)
+            if args.action == 'purge':
+                print(f"Purged {url_cache.purge()} dead URLs and redirects from {url_cache_path}")
+            else:
+                stats = url_cache.stats()
+                print(f"URL Cache Statistics ({url_cache_path}):")
+                print(f"  Dead URLs: {stats['dead_urls']}")
+                print(f"  Redirects: {stats['redirects']}")
+        
+        if Path(selectors_path).exists() and args.action == 'stats':
+            learned = SelectorLearner(selectors_path, config.selector_min_pages).learned()
+            print(f"Learned Selectors ({selectors_path}):")
+            for domain, entry in learned.items():
+                state = 'learned' if entry['learned'] else 'learning'
+                print(f"  {domain}: {entry['pages']} pages ({state})")
+                for field, selectors in entry['selectors'].items():
+                    print(f"    {field}: {', '.join(selectors)}")
         return 0
     
     def _handle_export(self, args) -> int:
@@ -378,6 +895,8 @@ Examples:
         
         print(f"Database Statistics:")
         print(f"  Total products: {total_products}")
+        print(f"  Failed URLs: {self.db_manager.get_failed_url_count()}")
+        print(f"  Detail fields pending: {self.db_manager.get_detail_pending_count()}")
         
         # Get sample products by category and brand
         if total_products > 0:
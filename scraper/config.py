@@ -4,7 +4,7 @@ Configuration management for the web scraper.
 
 import os
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -17,20 +17,103 @@ class ScraperConfig:
     requests_per_second: float = 1.0
     burst_size: int = 5
     
+    # Per-host overrides, e.g. {"books.toscrape.com": {"requests_per_second": 2.0, "burst_size": 5}}
+    host_rate_limits: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    
+    # AIMD adaptive rate control within [min, max] requests per second
+    adaptive_rate: bool = False
+    min_requests_per_second: float = 0.2
+    max_requests_per_second: float = 10.0
+    rate_increase_step: float = 0.1
+    rate_decrease_factor: float = 0.5
+    
+    # "memory" keeps buckets per process; "sqlite" shares them between processes
+    rate_limit_backend: str = "memory"
+    rate_limit_path: str = ""  # defaults to ratelimits.db next to the database
+    
     # Request settings
     timeout: int = 30
     max_retries: int = 3
     backoff_factor: float = 2.0
+    retry_budget_ratio: float = 0.1  # retries may add at most 10% extra requests
+    
+    # Adaptive timeouts: timeout_multiplier * per-host p99 latency, clamped to
+    # [min_timeout, connect_timeout] for connecting and [min_timeout, timeout] for reading
+    adaptive_timeouts: bool = False
+    connect_timeout: float = 10.0
+    min_timeout: float = 2.0
+    timeout_multiplier: float = 3.0
+    
+    # Response bodies are streamed: larger bodies (0 for no limit) and slower
+    # downloads are aborted
+    max_body_bytes: int = 10 * 1024 * 1024
+    download_timeout: float = 60.0
+    
+    # Parse product pages while they download and stop reading once every
+    # field in the site's selectors has been found (only without structured_data)
+    streaming_parse: bool = False
+    
+    # Persistent HTTP cache revalidated with ETag / Last-Modified; kept in
+    # http_cache_path (default httpcache.db next to the database)
+    http_cache: bool = False
+    http_cache_path: str = ""
+    http_cache_max_mb: int = 256
     
-    # Circuit breaker settings
+    # Skip URLs that answered 404/410 for negative_cache_ttl seconds and go
+    # straight to the final URL of redirects for redirect_cache_ttl seconds;
+    # kept in url_cache_path (default urlcache.db next to the database)
+    url_cache: bool = False
+    url_cache_path: str = ""
+    negative_cache_ttl: int = 24 * 3600
+    redirect_cache_ttl: int = 7 * 24 * 3600
+    
+    # On sites without selectors in SITE_CONFIGS, learn which generic
+    # selectors find each field and, after selector_min_pages pages of a
+    # domain, only try those; every selector_revalidate_every-th page is
+    # checked with all of them. Kept in selector_learning_path (default
+    # selectors.db next to the database)
+    selector_learning: bool = False
+    selector_learning_path: str = ""
+    selector_min_pages: int = 20
+    selector_revalidate_every: int = 50
+    
+    # Take product fields from structured data (JSON-LD, microdata, embedded
+    # state JSON, OpenGraph) first; selectors only look for the rest
+    structured_data: bool = True
+    
+    # Concurrency settings
+    workers: int = 1
+    max_concurrency: int = 100
+    max_per_host: int = 8
+    
+    # Adjust the number of fetches in flight during a run to find the
+    # throughput knee, between 1 and autotune_max_workers threads (or
+    # max_concurrency with the async engine); rate limits still apply
+    autotune_concurrency: bool = False
+    autotune_max_workers: int = 32
+    autotune_interval: float = 5.0
+    
+    # Connections: resolve hosts through an in-process DNS cache, and open
+    # prewarm_connections keep-alive connections per host before a run (0 for none)
+    dns_cache: bool = True
+    prewarm_connections: int = 0
+    
+    # Circuit breaker settings (one breaker per host)
     failure_threshold: int = 5
     recovery_timeout: int = 60
+    half_open_max_calls: int = 1
     
     # Database settings
     database_path: str = "products.db"
     
     # Scraping settings
     max_pages: int = 10
+    
+    # Crawl budgets for a whole run (0 for no limit): seconds from the first
+    # request, requests sent and response body bytes downloaded
+    time_budget: float = 0.0
+    request_budget: int = 0
+    byte_budget: int = 0
     max_images_per_product: int = 10
     description_max_length: int = 1000
     
@@ -40,6 +123,14 @@ class ScraperConfig:
     # Proxy settings
     proxy_config: Optional[Dict[str, str]] = None
     
+    # Proxy pool: requests are spread over these proxies by health, either
+    # per request or with one proxy per host ("session"); a proxy answering
+    # 403/429 or failing repeatedly is quarantined for proxy_quarantine_time
+    # seconds. Per-host rate limits apply per proxy. Overrides proxy_config.
+    proxies: List[str] = field(default_factory=list)
+    proxy_assignment: str = "request"
+    proxy_quarantine_time: float = 60.0
+    
     # Site-specific selectors
     product_selectors: Dict[str, Dict[str, str]] = field(default_factory=dict)
     
@@ -64,17 +155,60 @@ class ScraperConfig:
             config_data = {
                 'requests_per_second': self.requests_per_second,
                 'burst_size': self.burst_size,
+                'host_rate_limits': self.host_rate_limits,
+                'adaptive_rate': self.adaptive_rate,
+                'min_requests_per_second': self.min_requests_per_second,
+                'max_requests_per_second': self.max_requests_per_second,
+                'rate_increase_step': self.rate_increase_step,
+                'rate_decrease_factor': self.rate_decrease_factor,
+                'rate_limit_backend': self.rate_limit_backend,
+                'rate_limit_path': self.rate_limit_path,
                 'timeout': self.timeout,
                 'max_retries': self.max_retries,
                 'backoff_factor': self.backoff_factor,
+                'retry_budget_ratio': self.retry_budget_ratio,
+                'adaptive_timeouts': self.adaptive_timeouts,
+                'connect_timeout': self.connect_timeout,
+                'min_timeout': self.min_timeout,
+                'timeout_multiplier': self.timeout_multiplier,
+                'max_body_bytes': self.max_body_bytes,
+                'download_timeout': self.download_timeout,
+                'streaming_parse': self.streaming_parse,
+                'http_cache': self.http_cache,
+                'http_cache_path': self.http_cache_path,
+                'http_cache_max_mb': self.http_cache_max_mb,
+                'url_cache': self.url_cache,
+                'url_cache_path': self.url_cache_path,
+                'negative_cache_ttl': self.negative_cache_ttl,
+                'redirect_cache_ttl': self.redirect_cache_ttl,
+                'selector_learning': self.selector_learning,
+                'selector_learning_path': self.selector_learning_path,
+                'selector_min_pages': self.selector_min_pages,
+                'selector_revalidate_every': self.selector_revalidate_every,
+                'structured_data': self.structured_data,
                 'failure_threshold': self.failure_threshold,
                 'recovery_timeout': self.recovery_timeout,
+                'half_open_max_calls': self.half_open_max_calls,
+                'workers': self.workers,
+                'max_concurrency': self.max_concurrency,
+                'max_per_host': self.max_per_host,
+                'autotune_concurrency': self.autotune_concurrency,
+                'autotune_max_workers': self.autotune_max_workers,
+                'autotune_interval': self.autotune_interval,
+                'dns_cache': self.dns_cache,
+                'prewarm_connections': self.prewarm_connections,
                 'database_path': self.database_path,
                 'max_pages': self.max_pages,
+                'time_budget': self.time_budget,
+                'request_budget': self.request_budget,
+                'byte_budget': self.byte_budget,
                 'max_images_per_product': self.max_images_per_product,
                 'description_max_length': self.description_max_length,
                 'custom_headers': self.custom_headers,
                 'proxy_config': self.proxy_config,
+                'proxies': self.proxies,
+                'proxy_assignment': self.proxy_assignment,
+                'proxy_quarantine_time': self.proxy_quarantine_time,
                 'product_selectors': self.product_selectors
             }
             
@@ -86,6 +220,38 @@ class ScraperConfig:
             print(f"Error saving config to {config_path}: {e}")
             return False
     
+    def rate_limit_for(self, host: str) -> Tuple[float, int]:
+        """Return (requests_per_second, burst_size) for a host."""
+        host = host.lower()
+        limits = self.host_rate_limits.get(host)
+        if limits is None and host.startswith('www.'):
+            limits = self.host_rate_limits.get(host[4:])
+        limits = limits or {}
+        
+        return (float(limits.get('requests_per_second', self.requests_per_second)),
+                int(limits.get('burst_size', self.burst_size)))
+    
+    def sidecar_path(self, filename: str) -> str:
+        """Return the path of an auxiliary file next to the products database."""
+        database_dir = os.path.dirname(os.path.abspath(self.database_path))
+        return os.path.join(database_dir, filename)
+    
+    def rate_limit_db_path(self) -> str:
+        """Return the SQLite file used by the shared rate limit backend."""
+        return self.rate_limit_path or self.sidecar_path('ratelimits.db')
+    
+    def http_cache_db_path(self) -> str:
+        """Return the SQLite file holding the HTTP cache."""
+        return self.http_cache_path or self.sidecar_path('httpcache.db')
+    
+    def url_cache_db_path(self) -> str:
+        """Return the SQLite file holding dead URLs and redirect targets."""
+        return self.url_cache_path or self.sidecar_path('urlcache.db')
+    
+    def selector_learning_db_path(self) -> str:
+        """Return the SQLite file holding the selectors learned per domain."""
+        return self.selector_learning_path or self.sidecar_path('selectors.db')
+    
     @classmethod
     def from_env(cls) -> 'ScraperConfig':
         """Load configuration from environment variables."""
@@ -94,13 +260,47 @@ class ScraperConfig:
         # Override with environment variables if they exist
         config.requests_per_second = float(os.getenv('SCRAPER_REQUESTS_PER_SECOND', config.requests_per_second))
         config.burst_size = int(os.getenv('SCRAPER_BURST_SIZE', config.burst_size))
+        config.adaptive_rate = os.getenv('SCRAPER_ADAPTIVE_RATE', str(config.adaptive_rate)).lower() in ('1', 'true', 'yes')
+        config.min_requests_per_second = float(os.getenv('SCRAPER_MIN_REQUESTS_PER_SECOND', config.min_requests_per_second))
+        config.max_requests_per_second = float(os.getenv('SCRAPER_MAX_REQUESTS_PER_SECOND', config.max_requests_per_second))
+        config.rate_limit_backend = os.getenv('SCRAPER_RATE_LIMIT_BACKEND', config.rate_limit_backend)
+        config.rate_limit_path = os.getenv('SCRAPER_RATE_LIMIT_PATH', config.rate_limit_path)
         config.timeout = int(os.getenv('SCRAPER_TIMEOUT', config.timeout))
         config.max_retries = int(os.getenv('SCRAPER_MAX_RETRIES', config.max_retries))
         config.backoff_factor = float(os.getenv('SCRAPER_BACKOFF_FACTOR', config.backoff_factor))
+        config.retry_budget_ratio = float(os.getenv('SCRAPER_RETRY_BUDGET_RATIO', config.retry_budget_ratio))
+        config.adaptive_timeouts = os.getenv('SCRAPER_ADAPTIVE_TIMEOUTS', str(config.adaptive_timeouts)).lower() in ('1', 'true', 'yes')
+        config.connect_timeout = float(os.getenv('SCRAPER_CONNECT_TIMEOUT', config.connect_timeout))
+        config.max_body_bytes = int(os.getenv('SCRAPER_MAX_BODY_BYTES', config.max_body_bytes))
+        config.download_timeout = float(os.getenv('SCRAPER_DOWNLOAD_TIMEOUT', config.download_timeout))
+        config.streaming_parse = os.getenv('SCRAPER_STREAMING_PARSE', str(config.streaming_parse)).lower() in ('1', 'true', 'yes')
+        config.http_cache = os.getenv('SCRAPER_HTTP_CACHE', str(config.http_cache)).lower() in ('1', 'true', 'yes')
+        config.http_cache_path = os.getenv('SCRAPER_HTTP_CACHE_PATH', config.http_cache_path)
+        config.http_cache_max_mb = int(os.getenv('SCRAPER_HTTP_CACHE_MAX_MB', config.http_cache_max_mb))
+        config.url_cache = os.getenv('SCRAPER_URL_CACHE', str(config.url_cache)).lower() in ('1', 'true', 'yes')
+        config.url_cache_path = os.getenv('SCRAPER_URL_CACHE_PATH', config.url_cache_path)
+        config.negative_cache_ttl = int(os.getenv('SCRAPER_NEGATIVE_CACHE_TTL', config.negative_cache_ttl))
+        config.redirect_cache_ttl = int(os.getenv('SCRAPER_REDIRECT_CACHE_TTL', config.redirect_cache_ttl))
+        config.selector_learning = os.getenv('SCRAPER_SELECTOR_LEARNING', str(config.selector_learning)).lower() in ('1', 'true', 'yes')
+        config.selector_learning_path = os.getenv('SCRAPER_SELECTOR_LEARNING_PATH', config.selector_learning_path)
+        config.selector_min_pages = int(os.getenv('SCRAPER_SELECTOR_MIN_PAGES', config.selector_min_pages))
+        config.selector_revalidate_every = int(os.getenv('SCRAPER_SELECTOR_REVALIDATE_EVERY', config.selector_revalidate_every))
+        config.structured_data = os.getenv('SCRAPER_STRUCTURED_DATA', str(config.structured_data)).lower() in ('1', 'true', 'yes')
         config.failure_threshold = int(os.getenv('SCRAPER_FAILURE_THRESHOLD', config.failure_threshold))
         config.recovery_timeout = int(os.getenv('SCRAPER_RECOVERY_TIMEOUT', config.recovery_timeout))
+        config.half_open_max_calls = int(os.getenv('SCRAPER_HALF_OPEN_MAX_CALLS', config.half_open_max_calls))
+        config.workers = int(os.getenv('SCRAPER_WORKERS', config.workers))
+        config.max_concurrency = int(os.getenv('SCRAPER_MAX_CONCURRENCY', config.max_concurrency))
+        config.max_per_host = int(os.getenv('SCRAPER_MAX_PER_HOST', config.max_per_host))
+        config.autotune_concurrency = os.getenv('SCRAPER_AUTOTUNE_CONCURRENCY', str(config.autotune_concurrency)).lower() in ('1', 'true', 'yes')
+        config.autotune_max_workers = int(os.getenv('SCRAPER_AUTOTUNE_MAX_WORKERS', config.autotune_max_workers))
+        config.dns_cache = os.getenv('SCRAPER_DNS_CACHE', str(config.dns_cache)).lower() in ('1', 'true', 'yes')
+        config.prewarm_connections = int(os.getenv('SCRAPER_PREWARM_CONNECTIONS', config.prewarm_connections))
         config.database_path = os.getenv('SCRAPER_DATABASE_PATH', config.database_path)
         config.max_pages = int(os.getenv('SCRAPER_MAX_PAGES', config.max_pages))
+        config.time_budget = float(os.getenv('SCRAPER_TIME_BUDGET', config.time_budget))
+        config.request_budget = int(os.getenv('SCRAPER_REQUEST_BUDGET', config.request_budget))
+        config.byte_budget = int(os.getenv('SCRAPER_BYTE_BUDGET', config.byte_budget))
         
         # Parse proxy config from env
         proxy_url = os.getenv('SCRAPER_PROXY_URL')
@@ -109,6 +309,12 @@ class ScraperConfig:
                 'http': proxy_url,
                 'https': proxy_url
             }
+        proxies = os.getenv('SCRAPER_PROXIES')
+        if proxies:
+            config.proxies = [proxy.strip() for proxy in proxies.split(',') if proxy.strip()]
+        config.proxy_assignment = os.getenv('SCRAPER_PROXY_ASSIGNMENT', config.proxy_assignment)
+        config.proxy_quarantine_time = float(os.getenv('SCRAPER_PROXY_QUARANTINE_TIME',
+                                                       config.proxy_quarantine_time))
         
         # Parse custom headers from env
         custom_headers = os.getenv('SCRAPER_CUSTOM_HEADERS')
@@ -121,7 +327,9 @@ class ScraperConfig:
         return config
 
 
-# Site-specific selector configurations
+# Site-specific selector configurations. A 'card' selector matches the
+# product cards on the site's listing pages; 'card_link' and 'card_<field>'
+# selectors are evaluated within each card
 SITE_CONFIGS = {
     'amazon.com': {
         'name': '#productTitle',
@@ -165,13 +373,20 @@ SITE_CONFIGS = {
         'availability': '.instock.availability',
         'brand': '',
         'category': '.breadcrumb',
-        'images': '#product_gallery img'
+        'images': '#product_gallery img',
+        'card': 'article.product_pod',
+        'card_link': 'h3 a',
+        'card_name': 'h3 a',
+        'card_price': '.price_color',
+        'card_rating': '.star-rating',
+        'card_availability': '.availability',
+        'card_images': '.image_container img'
     }
 }
 
 
-def get_site_config(url: str) -> Optional[Dict[str, str]]:
-    """Get site-specific configuration for selectors."""
+def site_domain(url: str) -> str:
+    """Return the domain a URL's site is known by, without any www. prefix."""
     from urllib.parse import urlparse
     
     parsed_url = urlparse(url)
@@ -181,7 +396,12 @@ def get_site_config(url: str) -> Optional[Dict[str, str]]:
     if domain.startswith('www.'):
         domain = domain[4:]
     
-    return SITE_CONFIGS.get(domain)
+    return domain
+
+
+def get_site_config(url: str) -> Optional[Dict[str, str]]:
+    """Get site-specific configuration for selectors."""
+    return SITE_CONFIGS.get(site_domain(url))
 
 
 def load_config(config_path: Optional[str] = None) -> ScraperConfig:
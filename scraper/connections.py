@@ -0,0 +1,274 @@
+"""
+Connection management: keep-alive pools sized to concurrency, pre-warming,
+an in-process DNS cache and connection reuse metrics.
+"""
+
+import socket
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+
+
+class DNSCache:
+    """Resolved addresses kept for a while, so new connections skip the lookup."""
+
+    # Seconds an address is used before it is looked up again
+    TTL = 300.0
+
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        self._addresses: Dict[Tuple[str, int], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def resolve(self, host: str, port: int) -> str:
+        """Return an address for host, looking it up when not cached.
+
+        Raises:
+            socket.gaierror: If the host cannot be resolved
+        """
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._addresses.get(key)
+            if cached and cached[1] > now:
+                self._counters['hits'] += 1
+                return cached[0]
+
+        address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+        with self._lock:
+            self._addresses[key] = (address, now + self.ttl)
+            self._counters['misses'] += 1
+        return address
+
+    def stats(self) -> Dict[str, int]:
+        """Lookups answered from the cache and lookups that went to the resolver."""
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self) -> None:
+        """Forget all addresses."""
+        with self._lock:
+            self._addresses.clear()
+
+
+class ConnectionStats:
+    """Requests and new connections (TCP/TLS handshakes) per host and port."""
+
+    def __init__(self):
+        self._hosts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, host: str, counter: str) -> None:
+        with self._lock:
+            counters = self._hosts.setdefault(host.lower(), {'requests': 0, 'handshakes': 0,
+                                                             'prewarmed': 0})
+            counters[counter] += 1
+
+    def record_request(self, host: str) -> None:
+        """Count a request sent over a connection to host ("name:port")."""
+        self._count(host, 'requests')
+
+    def record_handshake(self, host: str, prewarm: bool = False) -> None:
+        """Count a new connection to host ("name:port"), opened ahead of time if prewarm."""
+        self._count(host, 'prewarmed' if prewarm else 'handshakes')
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Counters and connection reuse ratio per host.
+
+        The reuse ratio is the share of requests that did not have to open
+        a connection of their own.
+        """
+        with self._lock:
+            return {
+                host: {**counters,
+                       'reuse_ratio': (round(max(0.0, 1 - counters['handshakes'] / counters['requests']), 3)
+                                       if counters['requests'] else None)}
+                for host, counters in self._hosts.items()
+            }
+
+    def clear(self) -> None:
+        """Reset all counters."""
+        with self._lock:
+            self._hosts.clear()
+
+
+# Shared by every scraper in the process
+dns_cache = DNSCache()
+connection_stats = ConnectionStats()
+
+# Set on threads opening connections ahead of time
+_prewarming = threading.local()
+
+
+class _ManagedConnectionMixin:
+    """Counts new connections and resolves hosts through the DNS cache.
+
+    Only the socket is opened to the cached address; the host name is left
+    as it is, so the Host header, TLS SNI and certificate checks use it.
+    """
+
+    use_dns_cache = True
+
+    def _new_conn(self) -> socket.socket:
+        address = None
+        if self.use_dns_cache:
+            try:
+                address = dns_cache.resolve(self._dns_host, self.port)
+            except OSError:
+                # Let urllib3 resolve it and report the failure its own way
+                pass
+
+        sock = super()._new_conn() if address is None else self._connect_to(address)
+        connection_stats.record_handshake(f"{self.host}:{self.port}",
+                                          getattr(_prewarming, 'active', False))
+        return sock
+
+    def _connect_to(self, address: str) -> socket.socket:
+        """Open a socket to a resolved address, raising what urllib3 would."""
+        try:
+            return urllib3_connection.create_connection(
+                (address, self.port), self.timeout,
+                source_address=self.source_address, socket_options=self.socket_options)
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+
+class _HTTPConnection(_ManagedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_ManagedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _NoDNSCacheHTTPConnection(_HTTPConnection):
+    use_dns_cache = False
+
+
+class _NoDNSCacheHTTPSConnection(_HTTPSConnection):
+    use_dns_cache = False
+
+
+def _pool_classes(use_dns_cache: bool) -> Dict[str, type]:
+    """Connection pool classes per scheme that open managed connections."""
+    http_conn = _HTTPConnection if use_dns_cache else _NoDNSCacheHTTPConnection
+    https_conn = _HTTPSConnection if use_dns_cache else _NoDNSCacheHTTPSConnection
+    return {
+        'http': type('ManagedHTTPConnectionPool', (HTTPConnectionPool,),
+                     {'ConnectionCls': http_conn}),
+        'https': type('ManagedHTTPSConnectionPool', (HTTPSConnectionPool,),
+                      {'ConnectionCls': https_conn}),
+    }
+
+
+_POOL_CLASSES = {True: _pool_classes(True), False: _pool_classes(False)}
+
+
+class ConnectionPoolAdapter(HTTPAdapter):
+    """HTTPAdapter keeping one keep-alive pool per host, with connection metrics.
+
+    ``pool_maxsize`` connections are kept per host and up to
+    ``pool_connections`` host pools are kept before the least recently used
+    one is closed. New connections are counted per host in
+    ``connection_stats`` and, unless disabled, resolve hosts through the
+    process-wide DNS cache.
+    """
+
+    def __init__(self, use_dns_cache: bool = True, **kwargs):
+        """Initialize the adapter.
+
+        Args:
+            use_dns_cache: Resolve hosts through the in-process DNS cache
+            **kwargs: Passed on to HTTPAdapter
+        """
+        self.use_dns_cache = use_dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _POOL_CLASSES[self.use_dns_cache]
+
+    def proxy_manager_for(self, proxy: str, **proxy_kwargs) -> Any:
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        manager.pool_classes_by_scheme = _POOL_CLASSES[self.use_dns_cache]
+        return manager
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        # Count the request against the host the connection goes to
+        proxy = select_proxy(request.url, kwargs.get('proxies') or {})
+        target = urlparse(proxy or request.url)
+        port = target.port or (443 if target.scheme == 'https' else 80)
+        connection_stats.record_request(f"{target.hostname}:{port}")
+        return super().send(request, **kwargs)
+
+    def _pool_for(self, url: str, verify: Any = True) -> HTTPConnectionPool:
+        """Return the pool a GET of url with the given verify setting would use."""
+        request = requests.Request('GET', url).prepare()
+        if hasattr(self, 'get_connection_with_tls_context'):
+            return self.get_connection_with_tls_context(request, verify)
+        return self.get_connection(url)
+
+    def prewarm(self, urls: Iterable[str], connections: int, timeout: float = 10.0,
+                verify: Any = True) -> int:
+        """Open keep-alive connections to the hosts of some URLs ahead of time.
+
+        Args:
+            urls: URLs whose hosts will be requested
+            connections: Connections to open per host, capped by pool_maxsize
+            timeout: Seconds to wait for each connection
+            verify: TLS verification setting the requests will be sent with,
+                as resolved by the session, so they land in the same pools
+
+        Returns:
+            Number of connections opened
+        """
+        hosts: Dict[Tuple[str, str, Optional[int]], str] = {}
+        for url in urls:
+            parsed = urlparse(url)
+            hosts.setdefault((parsed.scheme, parsed.hostname, parsed.port), url)
+
+        connections = min(connections, self._pool_maxsize)
+        jobs = [url for url in hosts.values() for _ in range(connections)]
+        if not jobs:
+            return 0
+
+        def open_connection(url: str) -> Optional[Any]:
+            _prewarming.active = True
+            try:
+                pool = self._pool_for(url, verify)
+                conn = pool._get_conn()
+                conn.timeout = timeout
+                try:
+                    conn.connect()
+                except Exception as e:
+                    logging.getLogger(__name__).debug(f"Could not pre-warm a connection for {url}: {e}")
+                    conn.close()
+                    pool._put_conn(conn)
+                    return None
+                return pool, conn
+            finally:
+                _prewarming.active = False
+
+        # Every connection is checked out before any is returned to its
+        # pool, so each job opens a new one
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 16)) as executor:
+            opened: List[Any] = [result for result in executor.map(open_connection, jobs) if result]
+        for pool, conn in opened:
+            pool._put_conn(conn)
+        return len(opened)
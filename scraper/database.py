@@ -4,6 +4,7 @@ Database management for storing scraped product data.
 
 import sqlite3
 import logging
+from datetime import datetime
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 from contextlib import contextmanager
@@ -42,10 +43,19 @@ class DatabaseManager:
                     image_urls TEXT,
                     metadata TEXT,
                     scraped_at TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    detail_pending TEXT DEFAULT '',
+                    last_seen_at TEXT
                 )
             ''')
             
+            # Databases created by earlier versions lack the newer columns
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(products)')}
+            for column, definition in (('detail_pending', "TEXT DEFAULT ''"),
+                                       ('last_seen_at', 'TEXT')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE products ADD COLUMN {column} {definition}')
+            
             conn.execute('''
                 CREATE INDEX IF NOT EXISTS idx_url ON products(url)
             ''')
@@ -58,6 +68,17 @@ class DatabaseManager:
                 CREATE INDEX IF NOT EXISTS idx_category ON products(category)
             ''')
             
+            # Dead-letter table: URLs whose fetch failed after all retries
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS failed_urls (
+                    url TEXT PRIMARY KEY,
+                    status_code INTEGER,
+                    error TEXT,
+                    attempts INTEGER,
+                    failed_at TEXT
+                )
+            ''')
+            
             conn.commit()
     
     @contextmanager
@@ -83,43 +104,35 @@ class DatabaseManager:
             with self.get_connection() as conn:
                 product_data = product.to_dict()
                 
-                # Check if product already exists
-                existing = conn.execute(
-                    'SELECT id FROM products WHERE url = ?',
-                    (product_data['url'],)
-                ).fetchone()
+                # Insert or update in one statement so concurrent writers
+                # (worker threads, other processes) cannot race on the url
+                conn.execute('''
+                    INSERT INTO products (
+                        name, price, url, description, rating, reviews_count,
+                        availability, brand, category, image_urls, metadata, scraped_at,
+                        detail_pending, last_seen_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        name = excluded.name, price = excluded.price,
+                        description = excluded.description, rating = excluded.rating,
+                        reviews_count = excluded.reviews_count,
+                        availability = excluded.availability, brand = excluded.brand,
+                        category = excluded.category, image_urls = excluded.image_urls,
+                        metadata = excluded.metadata, scraped_at = excluded.scraped_at,
+                        detail_pending = excluded.detail_pending,
+                        last_seen_at = excluded.last_seen_at
+                ''', (
+                    product_data['name'], product_data['price'],
+                    product_data['url'], product_data['description'],
+                    product_data['rating'], product_data['reviews_count'],
+                    product_data['availability'], product_data['brand'],
+                    product_data['category'], product_data['image_urls'],
+                    product_data['metadata'], product_data['scraped_at'],
+                    product_data['detail_pending'], product_data['scraped_at']
+                ))
                 
-                if existing:
-                    # Update existing product
-                    conn.execute('''
-                        UPDATE products SET
-                            name = ?, price = ?, description = ?, rating = ?,
-                            reviews_count = ?, availability = ?, brand = ?,
-                            category = ?, image_urls = ?, metadata = ?, scraped_at = ?
-                        WHERE url = ?
-                    ''', (
-                        product_data['name'], product_data['price'],
-                        product_data['description'], product_data['rating'],
-                        product_data['reviews_count'], product_data['availability'],
-                        product_data['brand'], product_data['category'],
-                        product_data['image_urls'], product_data['metadata'],
-                        product_data['scraped_at'], product_data['url']
-                    ))
-                else:
-                    # Insert new product
-                    conn.execute('''
-                        INSERT INTO products (
-                            name, price, url, description, rating, reviews_count,
-                            availability, brand, category, image_urls, metadata, scraped_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        product_data['name'], product_data['price'],
-                        product_data['url'], product_data['description'],
-                        product_data['rating'], product_data['reviews_count'],
-                        product_data['availability'], product_data['brand'],
-                        product_data['category'], product_data['image_urls'],
-                        product_data['metadata'], product_data['scraped_at']
-                    ))
+                # A URL that scraped successfully is no longer a failure
+                conn.execute('DELETE FROM failed_urls WHERE url = ?', (product_data['url'],))
                 
                 conn.commit()
                 self.logger.info(f"Saved product: {product.name}")
@@ -129,6 +142,217 @@ class DatabaseManager:
             self.logger.error(f"Error saving product {product.name}: {e}")
             return False
     
+    def save_listing_products(self, products: List[Product]) -> int:
+        """Save products taken from listing cards, in one transaction.
+        
+        A product already stored keeps the values of the fields its card
+        left empty, and its detail_pending marker: scraped details are not
+        lost when a listing is scraped again.
+        
+        Args:
+            products: Products built from listing cards
+            
+        Returns:
+            Number of products saved
+        """
+        if not products:
+            return 0
+        
+        rows = []
+        for product in products:
+            data = product.to_dict()
+            rows.append((data['name'], data['price'], data['url'], data['description'],
+                         data['rating'], data['reviews_count'], data['availability'],
+                         data['brand'], data['category'], data['image_urls'],
+                         data['metadata'], data['scraped_at'], data['detail_pending'],
+                         data['scraped_at']))
+        
+        try:
+            with self.get_connection() as conn:
+                conn.executemany('''
+                    INSERT INTO products (
+                        name, price, url, description, rating, reviews_count,
+                        availability, brand, category, image_urls, metadata, scraped_at,
+                        detail_pending, last_seen_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        name = COALESCE(NULLIF(excluded.name, ''), name),
+                        price = COALESCE(excluded.price, price),
+                        description = COALESCE(NULLIF(excluded.description, ''), description),
+                        rating = COALESCE(excluded.rating, rating),
+                        reviews_count = COALESCE(excluded.reviews_count, reviews_count),
+                        availability = COALESCE(NULLIF(excluded.availability, ''), availability),
+                        brand = COALESCE(NULLIF(excluded.brand, ''), brand),
+                        category = COALESCE(NULLIF(excluded.category, ''), category),
+                        image_urls = COALESCE(NULLIF(excluded.image_urls, ''), image_urls),
+                        scraped_at = excluded.scraped_at, last_seen_at = excluded.last_seen_at
+                ''', rows)
+                conn.commit()
+                self.logger.info(f"Saved {len(rows)} products from listing cards")
+                return len(rows)
+                
+        except Exception as e:
+            self.logger.error(f"Error saving listing products: {e}")
+            return 0
+    
+    def get_listing_snapshots(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Retrieve what listing cards show of stored products, in one query per 500 URLs.
+        
+        Args:
+            urls: Product URLs
+            
+        Returns:
+            name, price, availability and detail_pending of each stored
+            product, keyed by URL; URLs not in the database are left out
+        """
+        snapshots = {}
+        try:
+            with self.get_connection() as conn:
+                for start in range(0, len(urls), 500):
+                    chunk = urls[start:start + 500]
+                    rows = conn.execute(f'''
+                        SELECT url, name, price, availability, detail_pending FROM products
+                        WHERE url IN ({','.join('?' * len(chunk))})
+                    ''', chunk).fetchall()
+                    snapshots.update((row['url'], dict(row)) for row in rows)
+        except Exception as e:
+            self.logger.error(f"Error retrieving stored products: {e}")
+        return snapshots
+    
+    def mark_seen(self, urls: List[str]) -> int:
+        """Record that products were seen unchanged on a listing, without rescraping them.
+        
+        Args:
+            urls: Product URLs
+            
+        Returns:
+            Number of products updated
+        """
+        seen_at = datetime.now().isoformat()
+        updated = 0
+        try:
+            with self.get_connection() as conn:
+                for start in range(0, len(urls), 500):
+                    chunk = urls[start:start + 500]
+                    updated += conn.execute(f'''
+                        UPDATE products SET last_seen_at = ?
+                        WHERE url IN ({','.join('?' * len(chunk))})
+                    ''', [seen_at, *chunk]).rowcount
+                conn.commit()
+        except Exception as e:
+            self.logger.error(f"Error marking products as seen: {e}")
+        return updated
+    
+    def get_detail_pending(self, limit: Optional[int] = None,
+                           fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Retrieve products whose listing card left fields to fetch, oldest first.
+        
+        Args:
+            limit: Maximum number of products to return
+            fields: Only products missing at least one of these fields
+            
+        Returns:
+            List of dicts with url and the pending fields
+        """
+        try:
+            with self.get_connection() as conn:
+                rows = conn.execute('''
+                    SELECT url, detail_pending FROM products
+                    WHERE detail_pending != '' ORDER BY scraped_at
+                ''').fetchall()
+        except Exception as e:
+            self.logger.error(f"Error retrieving products with pending details: {e}")
+            return []
+        
+        pending = []
+        for row in rows:
+            missing = row['detail_pending'].split(',')
+            if fields and not set(fields) & set(missing):
+                continue
+            pending.append({'url': row['url'], 'fields': missing})
+            if limit and len(pending) >= limit:
+                break
+        return pending
+    
+    def get_detail_pending_count(self) -> int:
+        """Get number of products whose listing card left fields to fetch."""
+        try:
+            with self.get_connection() as conn:
+                result = conn.execute(
+                    "SELECT COUNT(*) FROM products WHERE detail_pending != ''").fetchone()
+                return result[0] if result else 0
+        except Exception as e:
+            self.logger.error(f"Error getting pending detail count: {e}")
+            return 0
+    
+    def save_failed_url(self, url: str, status_code: Optional[int],
+                        error: str, attempts: int) -> bool:
+        """Record a URL that could not be fetched, replacing any earlier failure.
+        
+        Args:
+            url: URL that failed
+            status_code: HTTP status of the last attempt, if a response was received
+            error: Description of the last error
+            attempts: Number of attempts made
+            
+        Returns:
+            bool: True if recorded successfully
+        """
+        try:
+            with self.get_connection() as conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO failed_urls (url, status_code, error, attempts, failed_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (url, status_code, error, attempts, datetime.now().isoformat()))
+                conn.commit()
+                return True
+        except Exception as e:
+            self.logger.error(f"Error recording failed URL {url}: {e}")
+            return False
+    
+    def get_failed_urls(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Retrieve failed URLs, oldest failure first.
+        
+        Args:
+            limit: Maximum number of URLs to return
+            
+        Returns:
+            List of dicts with url, status_code, error, attempts and failed_at
+        """
+        query = "SELECT * FROM failed_urls ORDER BY failed_at"
+        params = []
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        try:
+            with self.get_connection() as conn:
+                return [dict(row) for row in conn.execute(query, params).fetchall()]
+        except Exception as e:
+            self.logger.error(f"Error retrieving failed URLs: {e}")
+            return []
+    
+    def remove_failed_url(self, url: str) -> bool:
+        """Remove a URL from the failed URLs, e.g. after it was scraped."""
+        try:
+            with self.get_connection() as conn:
+                conn.execute('DELETE FROM failed_urls WHERE url = ?', (url,))
+                conn.commit()
+                return True
+        except Exception as e:
+            self.logger.error(f"Error removing failed URL {url}: {e}")
+            return False
+    
+    def get_failed_url_count(self) -> int:
+        """Get number of URLs in the failed URLs table."""
+        try:
+            with self.get_connection() as conn:
+                result = conn.execute('SELECT COUNT(*) FROM failed_urls').fetchone()
+                return result[0] if result else 0
+        except Exception as e:
+            self.logger.error(f"Error getting failed URL count: {e}")
+            return 0
+    
     def get_products(self, limit: Optional[int] = None, 
                     category: Optional[str] = None,
                     brand: Optional[str] = None) -> List[Product]:
@@ -167,6 +391,16 @@ class DatabaseManager:
             self.logger.error(f"Error retrieving products: {e}")
             return []
     
+    def get_product_by_url(self, url: str) -> Optional[Product]:
+        """Retrieve the product stored for a URL, if any."""
+        try:
+            with self.get_connection() as conn:
+                row = conn.execute('SELECT * FROM products WHERE url = ?', (url,)).fetchone()
+                return Product.from_dict(dict(row)) if row else None
+        except Exception as e:
+            self.logger.error(f"Error retrieving product {url}: {e}")
+            return None
+    
     def get_product_count(self) -> int:
         """Get total number of products in database."""
         try:
@@ -182,6 +416,7 @@ class DatabaseManager:
         try:
             with self.get_connection() as conn:
                 conn.execute('DELETE FROM products')
+                conn.execute('DELETE FROM failed_urls')
                 conn.commit()
                 self.logger.info("Database cleared successfully")
                 return True
@@ -0,0 +1,992 @@
+"""
+HTML parsing with lxml and product selectors compiled once per site.
+"""
+
+import re
+import atexit
+import codecs
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Pattern, Set, Tuple
+from urllib.parse import urljoin
+
+from lxml import etree, html
+from cssselect import HTMLTranslator, SelectorError, parser
+
+from .streaming import PRODUCT_FIELDS, LIST_FIELDS
+from .utils import canonicalize_url, clean_url
+
+
+# Selectors tried for every site, after the site's own selector for the field
+GENERIC_SELECTORS: Dict[str, List[str]] = {
+    'name': [
+        'h1[data-product-name]',
+        'h1.product-title',
+        'h1.product-name',
+        '.product-title h1',
+        '.product-name h1',
+        'h1',
+        '[data-testid="product-name"]',
+        '.pdp-title',
+    ],
+    'price': [
+        '[data-testid="price"]',
+        '.price-current',
+        '.price-now',
+        '.product-price',
+        '.price',
+        '.current-price',
+        '.sale-price',
+        '[data-price]',
+    ],
+    'description': [
+        '[data-testid="product-description"]',
+        '.product-description',
+        '.product-details',
+        '.product-info',
+        '.description',
+        '.product-overview',
+    ],
+    'rating': [
+        '[data-testid="rating"]',
+        '.rating-value',
+        '.star-rating',
+        '.rating',
+        '.review-rating',
+    ],
+    'reviews_count': [
+        '[data-testid="reviews-count"]',
+        '.reviews-count',
+        '.review-count',
+        '.rating-count',
+    ],
+    'availability': [
+        '[data-testid="availability"]',
+        '.availability',
+        '.stock-status',
+        '.product-availability',
+    ],
+    'brand': [
+        '[data-testid="brand"]',
+        '.brand',
+        '.product-brand',
+        '.manufacturer',
+    ],
+    'category': [
+        '[data-testid="category"]',
+        '.breadcrumb',
+        '.category',
+        '.product-category',
+    ],
+    'images': [
+        '.product-image img',
+        '.product-photos img',
+        '.product-gallery img',
+        '[data-testid="product-image"] img',
+    ],
+}
+
+# Common selectors for product links on listing pages
+LISTING_LINK_SELECTORS = [
+    'a[href*="/product/"]',
+    'a[href*="/item/"]',
+    'a[href*="/p/"]',
+    'a[href*="/catalogue/"]',  # books.toscrape.com
+    '.product-link',
+    '.product-item a',
+    '.product-card a',
+    '[data-product-id] a',
+    'h3 a',  # books.toscrape.com book titles
+]
+
+NEXT_PAGE_SELECTORS = [
+    'a[rel="next"]',
+    'a:contains("Next")',
+    'a:contains(">")',
+    '.pagination .next a',
+    '.pager-next a',
+]
+
+# Text nodes of an element, leaving out scripts, styles, templates and ruby annotations
+_VISIBLE_TEXT = etree.XPath(
+    'descendant::text()[not(ancestor::script or ancestor::style or ancestor::template'
+    ' or ancestor::rt or ancestor::rp)]', smart_strings=False)
+
+_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+_BOMS = ((codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'),
+         (codecs.BOM_UTF16_BE, 'utf-16-be'))
+
+# lxml parsers can be reused, but not shared between threads
+_parsers = threading.local()
+
+_translator = HTMLTranslator()
+logger = logging.getLogger(__name__)
+
+
+def _known_encoding(name: Optional[str]) -> Optional[str]:
+    """Return name if Python knows the encoding, else None."""
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def page_encoding(content: bytes, content_type: str = '') -> Optional[str]:
+    """Encoding to decode an HTML body with.
+
+    A byte order mark wins, then the charset in the Content-Type header.
+    Without either, the encoding is left to a ``<meta>`` declaration in the
+    document, and None is returned for lxml to honour it; a page declaring
+    nothing is taken to be UTF-8.
+
+    Args:
+        content: Raw response body
+        content_type: Content-Type header of the response
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    match = _CHARSET.search(content_type)
+    encoding = _known_encoding(match.group(1)) if match else None
+    if encoding:
+        return encoding
+
+    match = _META_CHARSET.search(content[:4096])
+    if match and _known_encoding(match.group(1).decode('ascii')):
+        return None
+    return 'utf-8'
+
+
+def _parser_for(encoding: Optional[str]) -> html.HTMLParser:
+    """Return this thread's lxml HTML parser for an encoding."""
+    parsers = getattr(_parsers, 'by_encoding', None)
+    if parsers is None:
+        parsers = _parsers.by_encoding = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = html.HTMLParser(encoding=encoding)
+    return parser
+
+
+def parse_html(content: bytes, content_type: str = '') -> html.HtmlElement:
+    """Parse an HTML body with lxml.
+
+    Args:
+        content: Raw response body
+        content_type: Content-Type header, whose charset decodes the body
+
+    Returns:
+        The root ``<html>`` element; an empty one for an empty body
+    """
+    root = etree.fromstring(content, _parser_for(page_encoding(content, content_type)))
+    if root is None:
+        root = html.Element('html')
+    return root
+
+
+def element_text(element: etree._Element) -> str:
+    """Visible text of an element with every text node stripped and joined.
+
+    Text inside scripts, styles and templates is left out, as are comments.
+    """
+    return ''.join(text.strip() for text in _VISIBLE_TEXT(element))
+
+
+class CompiledSelector:
+    """A CSS selector translated to XPath and compiled once."""
+
+    def __init__(self, css: str):
+        """Compile a selector.
+
+        Raises:
+            SelectorError: If the selector is not valid CSS or has no XPath
+                equivalent
+        """
+        self.css = css
+        xpath = _translator.css_to_xpath(css)
+        self._all = etree.XPath(xpath, smart_strings=False)
+        self._first = etree.XPath(f'({xpath})[1]', smart_strings=False)
+
+    def select(self, root: etree._Element) -> List[etree._Element]:
+        """Every matching element, in document order."""
+        return self._all(root)
+
+    def select_one(self, root: etree._Element) -> Optional[etree._Element]:
+        """The first matching element, or None."""
+        matches = self._first(root)
+        return matches[0] if matches else None
+
+
+@lru_cache(maxsize=None)
+def compile_selector(css: str) -> Optional[CompiledSelector]:
+    """Compile a CSS selector, or return None if it cannot be used.
+
+    Compiled selectors are cached, so every distinct selector is only
+    translated once per process.
+    """
+    try:
+        return CompiledSelector(css)
+    except (SelectorError, etree.XPathError) as e:
+        logger.warning(f"Ignoring selector {css!r}: {e}")
+        return None
+
+
+def compile_selectors(selectors: List[str]) -> List[CompiledSelector]:
+    """Compile selectors in order, leaving out those that cannot be used."""
+    compiled = [compile_selector(css) for css in selectors if css]
+    return [selector for selector in compiled if selector is not None]
+
+
+class _Unsupported(Exception):
+    """A selector the element matcher cannot evaluate; XPath is used instead."""
+
+
+# Separators of class names, as XPath's normalize-space sees them
+_XML_SPACE = re.compile(r'[ \t\r\n]+')
+
+_Matcher = Callable[[etree._Element], bool]
+
+
+def _attribute_test(operator: str, expected: Optional[str]) -> Callable[[Optional[str]], bool]:
+    """Test of an attribute value (None when absent) for an attribute selector."""
+    if operator == 'exists':
+        return lambda value: value is not None
+    if operator == '=':
+        return lambda value: value == expected
+    if operator == '!=':
+        return lambda value: value != expected
+    if operator == '|=':
+        return lambda value: value is not None and (value == expected
+                                                    or value.startswith(expected + '-'))
+    if not expected:
+        # cssselect never matches these with an empty value
+        return lambda value: False
+    if operator == '~=':
+        if _XML_SPACE.search(expected):
+            return lambda value: False
+        return lambda value: value is not None and expected in _XML_SPACE.split(value.strip(' \t\r\n'))
+    if operator == '^=':
+        return lambda value: value is not None and value.startswith(expected)
+    if operator == '$=':
+        return lambda value: value is not None and value.endswith(expected)
+    if operator == '*=':
+        return lambda value: value is not None and expected in value
+    raise _Unsupported(operator)
+
+
+def _compile_matcher(tree: Any) -> _Matcher:
+    """Turn a parsed selector into a test of one element.
+
+    Tags, ids, classes, attribute selectors and the four combinators are
+    supported, with the same semantics as cssselect's XPath translation.
+
+    Raises:
+        _Unsupported: For pseudo-classes, namespaces and the like
+    """
+    if isinstance(tree, parser.Element):
+        if tree.namespace:
+            raise _Unsupported('namespace')
+        if tree.element in (None, '*'):
+            return lambda element: True
+        tag = tree.element.lower()
+        return lambda element: element.tag == tag
+
+    if isinstance(tree, parser.Hash):
+        inner = _compile_matcher(tree.selector)
+        element_id = tree.id
+        return lambda element: element.get('id') == element_id and inner(element)
+
+    if isinstance(tree, parser.Class):
+        inner = _compile_matcher(tree.selector)
+        has_class = _attribute_test('~=', tree.class_name)
+        return lambda element: has_class(element.get('class')) and inner(element)
+
+    if isinstance(tree, parser.Attrib):
+        if tree.namespace or tree.flag:
+            raise _Unsupported('attribute namespace or flag')
+        inner = _compile_matcher(tree.selector)
+        name = tree.attrib.lower()
+        test = _attribute_test(tree.operator,
+                               tree.value.value if tree.value is not None else None)
+        return lambda element: test(element.get(name)) and inner(element)
+
+    if isinstance(tree, parser.CombinedSelector):
+        left = _compile_matcher(tree.selector)
+        right = _compile_matcher(tree.subselector)
+        return _combine(left, tree.combinator, right)
+
+    raise _Unsupported(type(tree).__name__)
+
+
+def _previous_element(element: etree._Element) -> Optional[etree._Element]:
+    """The element sibling before an element, skipping comments."""
+    sibling = element.getprevious()
+    while sibling is not None and not isinstance(sibling.tag, str):
+        sibling = sibling.getprevious()
+    return sibling
+
+
+def _combine(left: _Matcher, combinator: str, right: _Matcher) -> _Matcher:
+    """Test of "left <combinator> right", checking right first."""
+    if combinator == ' ':
+        def descendant(element):
+            if not right(element):
+                return False
+            ancestor = element.getparent()
+            while ancestor is not None:
+                if left(ancestor):
+                    return True
+                ancestor = ancestor.getparent()
+            return False
+        return descendant
+
+    if combinator == '>':
+        def child(element):
+            if not right(element):
+                return False
+            parent = element.getparent()
+            return parent is not None and left(parent)
+        return child
+
+    if combinator == '+':
+        def adjacent(element):
+            if not right(element):
+                return False
+            sibling = _previous_element(element)
+            return sibling is not None and left(sibling)
+        return adjacent
+
+    if combinator == '~':
+        def general_sibling(element):
+            if not right(element):
+                return False
+            sibling = _previous_element(element)
+            while sibling is not None:
+                if left(sibling):
+                    return True
+                sibling = _previous_element(sibling)
+            return False
+        return general_sibling
+
+    raise _Unsupported(combinator)
+
+
+def _dispatch_key(tree: Any) -> Tuple[str, Optional[str]]:
+    """What an element must have for a parsed selector to possibly match it.
+
+    Taken from the rightmost compound selector: its id, else a class, else
+    its tag, else an attribute it requires; ('any', None) if none.
+    """
+    if isinstance(tree, parser.CombinedSelector):
+        tree = tree.subselector
+
+    keys = {}
+    while not isinstance(tree, parser.Element):
+        if isinstance(tree, parser.Hash):
+            keys.setdefault('id', tree.id)
+        elif isinstance(tree, parser.Class):
+            keys.setdefault('class', tree.class_name)
+        elif isinstance(tree, parser.Attrib) and tree.operator != '!=':
+            keys.setdefault('attribute', tree.attrib.lower())
+        tree = tree.selector
+    if tree.element not in (None, '*'):
+        keys.setdefault('tag', tree.element.lower())
+
+    for kind in ('id', 'class', 'tag', 'attribute'):
+        if kind in keys:
+            return kind, keys[kind]
+    return 'any', None
+
+
+class PageMatches:
+    """Candidate elements for every product field of a page, best first.
+
+    Iterating a field's candidates notes which selector each came from, so
+    once a value has been extracted hits() tells which selectors supplied
+    it.
+    """
+
+    def __init__(self, found: Dict[str, List[Tuple[str, etree._Element]]]):
+        """Initialize the matches.
+
+        Args:
+            found: (selector, element) pairs per field, in plan order
+        """
+        self._found = found
+        self._last: Dict[str, str] = {}
+
+    def __getitem__(self, field: str) -> Iterator[etree._Element]:
+        """Yield the candidate elements of a field, best first."""
+        for css, element in self._found[field]:
+            self._last[field] = css
+            yield element
+
+    def hits(self, field: str) -> List[str]:
+        """Selectors that supplied a field's value.
+
+        For list fields every selector that matched; for the others the
+        selector of the last candidate iterated, i.e. the one the value
+        was taken from when extraction stopped at it.
+        """
+        if field in LIST_FIELDS:
+            return list(dict.fromkeys(css for css, _ in self._found[field]))
+        return [self._last[field]] if field in self._last else []
+
+
+class SelectorPlan:
+    """Compiled selectors for every product field of a site.
+
+    For each field the site's own selector comes first, then the generic
+    ones, in the order they are tried. match() finds what every selector
+    matches in one walk over the document: each selector is filed under
+    the id, class, tag or attribute its rightmost part requires, so an
+    element is only tested against selectors that could match it.
+    Selectors the walk cannot evaluate (pseudo-classes and the like) are
+    run as XPath instead.
+    """
+
+    def __init__(self, site_config: Optional[Dict[str, str]] = None,
+                 keep: Optional[Dict[str, Collection[str]]] = None):
+        """Compile the plan.
+
+        Args:
+            site_config: Site selectors keyed by field name, as in
+                SITE_CONFIGS; None for sites without one
+            keep: When given, only these selectors are kept for each field,
+                in their usual order; fields left out get none
+        """
+        # Selector indexes per field, in the order they are tried
+        self.fields: Dict[str, List[int]] = {}
+        self._selectors: List[CompiledSelector] = []
+        self._collect_all: List[bool] = []
+        self._buckets: Dict[str, Dict[Optional[str], List[Tuple[int, _Matcher]]]] = {
+            'id': {}, 'class': {}, 'tag': {}, 'attribute': {}, 'any': {}}
+        self._fallback: List[int] = []
+        self._site_config = site_config
+        self._subsets: Dict[frozenset, 'SelectorPlan'] = {}
+        self._subsets_lock = threading.Lock()
+
+        for field in PRODUCT_FIELDS:
+            selectors = list(GENERIC_SELECTORS[field])
+            if site_config and site_config.get(field):
+                selectors.insert(0, site_config[field])
+            if keep is not None:
+                selectors = [css for css in selectors if css in keep.get(field, ())]
+
+            self.fields[field] = []
+            for selector in compile_selectors(selectors):
+                index = len(self._selectors)
+                self._selectors.append(selector)
+                self._collect_all.append(field in LIST_FIELDS)
+                self.fields[field].append(index)
+                self._file(index, selector.css)
+
+        self._attributes = list(self._buckets['attribute'])
+
+    def subset(self, fields: Collection[str]) -> 'SelectorPlan':
+        """The plan with the selectors of some fields only, compiled on first use.
+
+        Args:
+            fields: Fields to keep; the others get no selectors
+
+        Returns:
+            The plan itself when every field with selectors is kept
+        """
+        key = frozenset(fields)
+        if key.issuperset(field for field, indexes in self.fields.items() if indexes):
+            return self
+
+        with self._subsets_lock:
+            plan = self._subsets.get(key)
+            if plan is None:
+                plan = SelectorPlan(self._site_config, keep={
+                    field: [self._selectors[index].css for index in self.fields[field]]
+                    for field in key if field in self.fields})
+                self._subsets[key] = plan
+            return plan
+
+    def _file(self, index: int, css: str) -> None:
+        """File a selector's matchers under their dispatch keys."""
+        try:
+            matchers = []
+            for selector in parser.parse(css):
+                if selector.pseudo_element:
+                    raise _Unsupported(selector.pseudo_element)
+                matchers.append((_dispatch_key(selector.parsed_tree),
+                                 _compile_matcher(selector.parsed_tree)))
+        except _Unsupported:
+            self._fallback.append(index)
+            return
+
+        for (kind, key), matcher in matchers:
+            self._buckets[kind].setdefault(key, []).append((index, matcher))
+
+    def _candidates(self, element: etree._Element) -> List[Tuple[int, _Matcher]]:
+        """Matchers whose dispatch key the element has."""
+        buckets = self._buckets
+        candidates = list(buckets['any'].get(None, ()))
+        candidates.extend(buckets['tag'].get(element.tag, ()))
+
+        element_id = element.get('id')
+        if element_id is not None and buckets['id']:
+            candidates.extend(buckets['id'].get(element_id, ()))
+
+        classes = element.get('class')
+        if classes and buckets['class']:
+            for class_name in _XML_SPACE.split(classes.strip(' \t\r\n')):
+                candidates.extend(buckets['class'].get(class_name, ()))
+
+        for attribute in self._attributes:
+            if element.get(attribute) is not None:
+                candidates.extend(buckets['attribute'][attribute])
+        return candidates
+
+    def match(self, root: etree._Element) -> PageMatches:
+        """Elements the selectors of every field match, in one pass over the page.
+
+        Returns:
+            For each field, the first element each of its selectors matches
+            in plan order, skipping selectors without a match; for list
+            fields such as images, every element each selector matches
+        """
+        found: List[List[etree._Element]] = [[] for _ in self._selectors]
+        collect_all = self._collect_all
+
+        for element in root.iter(etree.Element):
+            for index, matcher in self._candidates(element):
+                matches = found[index]
+                if matches and (not collect_all[index] or matches[-1] is element):
+                    continue
+                if matcher(element):
+                    matches.append(element)
+
+        for index in self._fallback:
+            selector = self._selectors[index]
+            if collect_all[index]:
+                found[index] = selector.select(root)
+            else:
+                element = selector.select_one(root)
+                found[index] = [element] if element is not None else []
+
+        return PageMatches({
+            field: [(self._selectors[index].css, element)
+                    for index in indexes for element in found[index]]
+            for field, indexes in self.fields.items()
+        })
+
+
+class LinkHarvester:
+    """Collects the links matched by any of a list of selectors in one pass.
+
+    Every link (a and area element) is visited once, in document order,
+    and tested against the selectors' element matchers; selectors the
+    matcher cannot evaluate are run as XPath beforehand. Links are resolved
+    against the page URL and cleaned of fragments and tracking parameters
+    (see clean_url) as they are found, and compared by canonical URL, so a
+    link matched by several selectors or repeated with other tracking
+    parameters is only returned once.
+    """
+
+    # Relative hrefs without query, fragment or dot segments: appended to
+    # the page's directory or origin they give the joined URL, clean and
+    # canonical alike
+    _PLAIN_HREF = re.compile(r'(?!.*(?:\./|//|\.$))(/?)[^/?#:][^?#:]*$')
+
+    def __init__(self, selectors: List[str]):
+        """Compile the selectors.
+
+        Args:
+            selectors: CSS selectors of the links to collect
+        """
+        self._matchers: List[_Matcher] = []
+        self._fallback: List[CompiledSelector] = []
+        for css in selectors:
+            try:
+                matchers = []
+                for selector in parser.parse(css):
+                    if selector.pseudo_element:
+                        raise _Unsupported(selector.pseudo_element)
+                    matchers.append(_compile_matcher(selector.parsed_tree))
+                self._matchers.extend(matchers)
+            except _Unsupported:
+                compiled = compile_selector(css)
+                if compiled is not None:
+                    self._fallback.append(compiled)
+            except SelectorError as e:
+                logger.warning(f"Invalid link selector {css!r}: {e}")
+
+    def harvest(self, root: etree._Element, page_url: str,
+                url_pattern: Optional[Pattern] = None,
+                seen: Optional[Set[str]] = None) -> List[str]:
+        """Return the URLs of the links on a page, each once.
+
+        Args:
+            root: Parsed page
+            page_url: URL of the page, to resolve links against
+            url_pattern: Compiled pattern the returned URLs must match
+            seen: Canonical URLs already collected, e.g. from earlier pages;
+                those of the new ones are added to it
+
+        Returns:
+            New matching http(s) URLs in document order, without fragment
+            and tracking parameters
+        """
+        seen = set() if seen is None else seen
+        fallback = {element for selector in self._fallback for element in selector.select(root)}
+        # Joined the way urljoin would, and the same prefixes in canonical form
+        origin, directory = urljoin(page_url, '/_')[:-2], urljoin(page_url, '_')[:-1]
+        canonical_origin = canonicalize_url(origin + '/_')[:-2]
+        canonical_directory = canonicalize_url(directory + '_')[:-1]
+        resolved: Dict[str, Tuple[str, str]] = {}
+        urls = []
+
+        for element in root.iter('a', 'area'):
+            href = element.get('href')
+            if not href or not (element in fallback
+                                or any(matcher(element) for matcher in self._matchers)):
+                continue
+
+            link = resolved.get(href)
+            if link is None:
+                stripped = href.strip()
+                plain = self._PLAIN_HREF.match(stripped)
+                if plain:
+                    link = ((origin if plain.group(1) else directory) + stripped,
+                            (canonical_origin if plain.group(1) else canonical_directory) + stripped)
+                elif stripped:
+                    url = clean_url(urljoin(page_url, stripped))
+                    link = url, canonicalize_url(url)
+                else:
+                    link = '', ''
+                resolved[href] = link
+            url, key = link
+            if not url.startswith(('http://', 'https://')) or key in seen:
+                continue
+            if url_pattern is not None and not url_pattern.search(url):
+                continue
+            seen.add(key)
+            urls.append(url)
+
+        return urls
+
+
+class SelectorPlanRegistry:
+    """Process-wide selector plans, one per site configuration."""
+
+    def __init__(self):
+        self._plans: Dict[Tuple[Tuple[str, str], ...], SelectorPlan] = {}
+        self._lock = threading.Lock()
+
+    def get(self, site_config: Optional[Dict[str, str]] = None) -> SelectorPlan:
+        """Return the plan for a site configuration, compiling it on first use."""
+        key = tuple(sorted(site_config.items())) if site_config else ()
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                plan = SelectorPlan(site_config)
+                self._plans[key] = plan
+            return plan
+
+    def clear(self) -> None:
+        """Forget all plans."""
+        with self._lock:
+            self._plans.clear()
+
+
+# Shared by every scraper in the process
+selector_plans = SelectorPlanRegistry()
+
+
+class ListingCardPlan:
+    """Compiled listing card selectors of a site.
+
+    A site opts in with a 'card' selector in SITE_CONFIGS matching each
+    product card on its listing pages, 'card_link' for the card's link to
+    the product page and 'card_<field>' selectors for the product fields
+    the card shows, which are evaluated within the card.
+    """
+
+    def __init__(self, site_config: Dict[str, str]):
+        """Compile the plan.
+
+        Args:
+            site_config: Site selectors, as in SITE_CONFIGS, with a 'card' selector
+
+        Raises:
+            ValueError: If the card or link selector is invalid
+        """
+        self.card = compile_selector(site_config['card'])
+        self.link = compile_selector(site_config.get('card_link') or 'a[href]')
+        if self.card is None or self.link is None:
+            raise ValueError(f"Invalid listing card selectors: {site_config['card']}")
+
+        self.fields: Dict[str, CompiledSelector] = {}
+        for field in PRODUCT_FIELDS:
+            css = site_config.get(f'card_{field}')
+            selector = compile_selector(css) if css else None
+            if selector is not None:
+                self.fields[field] = selector
+
+    def cards(self, root: etree._Element) -> Iterator[Tuple[Optional[str], PageMatches]]:
+        """Yield the link and the candidate elements of each card on a page.
+
+        Returns:
+            The href of each card's product link (None if it has none) and
+            its matches, keyed by the fields the plan has selectors for
+        """
+        for card in self.card.select(root):
+            link = self.link.select_one(card)
+            found = {}
+            for field, selector in self.fields.items():
+                if field in LIST_FIELDS:
+                    elements = selector.select(card)
+                else:
+                    element = selector.select_one(card)
+                    elements = [element] if element is not None else []
+                found[field] = [(selector.css, element) for element in elements]
+            yield (link.get('href') if link is not None else None), PageMatches(found)
+
+
+class ListingCardPlanRegistry:
+    """Process-wide listing card plans, one per site configuration."""
+
+    def __init__(self):
+        self._plans: Dict[Tuple[Tuple[str, str], ...], Optional[ListingCardPlan]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, site_config: Optional[Dict[str, str]]) -> Optional[ListingCardPlan]:
+        """Return the card plan of a site, or None if it has no card selectors."""
+        if not site_config or not site_config.get('card'):
+            return None
+
+        key = tuple(sorted(site_config.items()))
+        with self._lock:
+            if key not in self._plans:
+                try:
+                    self._plans[key] = ListingCardPlan(site_config)
+                except ValueError as e:
+                    logger.warning(str(e))
+                    self._plans[key] = None
+            return self._plans[key]
+
+
+# Shared by every scraper in the process
+listing_card_plans = ListingCardPlanRegistry()
+
+
+class _DomainSelectors:
+    """What has been learned about one domain."""
+
+    def __init__(self, pages: int = 0):
+        self.pages = pages
+        # Times each selector supplied each field
+        self.hits: Dict[str, Dict[str, int]] = {}
+        self.plan: Optional[SelectorPlan] = None
+        self.dirty = False
+
+
+class SelectorLearner:
+    """Learns which generic selectors find each field on each domain.
+
+    Only for sites without an entry in SITE_CONFIGS. Once min_pages
+    product pages of a domain have been extracted with every generic
+    selector, its pages are extracted with a plan holding only the
+    selectors that have supplied a field there, in their usual order, so
+    the others are never tested. A page goes through the full plan again
+    when a field the domain has had comes out empty, and every
+    revalidate_every-th page is checked with it regardless; a selector
+    found to supply a field there (e.g. after a template change) is
+    learned along with the others.
+
+    What has been learned is kept in a SQLite file, so the next run starts
+    with it.
+    """
+
+    # Pages recorded between writes to the file
+    FLUSH_EVERY = 20
+
+    def __init__(self, db_path: str, min_pages: int = 20, revalidate_every: int = 50):
+        """Initialize the learner, loading what earlier runs learned.
+
+        Args:
+            db_path: Path to the SQLite file holding the learned selectors
+            min_pages: Pages of a domain to learn from before using a
+                learned plan
+            revalidate_every: Every this many pages of a domain are checked
+                with the full plan
+        """
+        self.db_path = db_path
+        self.min_pages = min_pages
+        self.revalidate_every = revalidate_every
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._full_plan = SelectorPlan()
+        self._domains: Dict[str, _DomainSelectors] = {}
+        self._unflushed = 0
+        self._counters = {'learned_pages': 0, 'full_pages': 0, 'rechecked_pages': 0,
+                          'relearned_fields': 0}
+
+        self._conn = sqlite3.connect(db_path, timeout=30.0, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS selector_domains (
+                domain TEXT PRIMARY KEY,
+                pages INTEGER NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS selector_hits (
+                domain TEXT NOT NULL,
+                field TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                hits INTEGER NOT NULL,
+                PRIMARY KEY (domain, field, selector)
+            )
+        ''')
+
+        for domain, pages in self._conn.execute('SELECT domain, pages FROM selector_domains'):
+            self._domains[domain] = _DomainSelectors(pages)
+        for domain, field, css, hits in self._conn.execute(
+                'SELECT domain, field, selector, hits FROM selector_hits'):
+            if domain in self._domains:
+                self._domains[domain].hits.setdefault(field, {})[css] = hits
+
+    def plan_for(self, domain: str) -> Tuple[SelectorPlan, bool]:
+        """Return the plan to extract a page of a domain with.
+
+        Returns:
+            The plan, and whether it is a learned one; the full plan of
+            generic selectors while the domain is being learned and on
+            revalidation pages
+        """
+        with self._lock:
+            state = self._domains.get(domain)
+            if (state is None or state.pages < self.min_pages
+                    or (state.pages + 1) % self.revalidate_every == 0):
+                return self._full_plan, False
+
+            if state.plan is None:
+                state.plan = SelectorPlan(keep=state.hits)
+            return state.plan, True
+
+    def full_plan(self) -> SelectorPlan:
+        """The plan with every generic selector."""
+        return self._full_plan
+
+    def record(self, domain: str, hits: Dict[str, List[str]], learned: bool,
+               rechecked: bool = False) -> None:
+        """Learn from an extracted product page.
+
+        Args:
+            domain: Domain of the page
+            hits: Selectors that supplied each field found on the page
+            learned: Whether the learned plan supplied them
+            rechecked: Whether the page went through the full plan after
+                the learned plan missed a field
+        """
+        with self._lock:
+            state = self._domains.setdefault(domain, _DomainSelectors())
+            was_learned = state.pages >= self.min_pages
+            state.pages += 1
+            state.dirty = True
+            self._counters['learned_pages' if learned else 'full_pages'] += 1
+            if rechecked:
+                self._counters['rechecked_pages'] += 1
+
+            for field, selectors in hits.items():
+                counts = state.hits.setdefault(field, {})
+                unknown = [css for css in selectors if css not in counts]
+                if unknown:
+                    # Tried from now on, next to the selectors the domain's other pages need
+                    state.plan = None
+                    if was_learned:
+                        self.logger.info(f"Relearning {field} selectors for {domain}: "
+                                         f"also found by {', '.join(unknown)}")
+                        self._counters['relearned_fields'] += 1
+                for css in selectors:
+                    counts[css] = counts.get(css, 0) + 1
+
+            self._unflushed += 1
+            if self._unflushed >= self.FLUSH_EVERY:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write what has been learned to the file."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        dirty = [(domain, state) for domain, state in self._domains.items() if state.dirty]
+        if dirty:
+            with self._conn:
+                for domain, state in dirty:
+                    self._conn.execute('INSERT OR REPLACE INTO selector_domains (domain, pages) '
+                                       'VALUES (?, ?)', (domain, state.pages))
+                    self._conn.execute('DELETE FROM selector_hits WHERE domain = ?', (domain,))
+                    self._conn.executemany(
+                        'INSERT INTO selector_hits (domain, field, selector, hits) '
+                        'VALUES (?, ?, ?, ?)',
+                        [(domain, field, css, hits) for field, counts in state.hits.items()
+                         for css, hits in counts.items()])
+                    state.dirty = False
+        self._unflushed = 0
+
+    def learned(self) -> Dict[str, Dict[str, Any]]:
+        """Pages seen and selectors per field for every domain."""
+        with self._lock:
+            return {domain: {'pages': state.pages,
+                             'learned': state.pages >= self.min_pages,
+                             'selectors': {field: sorted(counts, key=counts.get, reverse=True)
+                                           for field, counts in state.hits.items() if counts}}
+                    for domain, state in self._domains.items()}
+
+    def stats(self) -> Dict[str, int]:
+        """Pages extracted with learned and full plans in this process."""
+        with self._lock:
+            return {**self._counters,
+                    'domains': sum(1 for state in self._domains.values()
+                                   if state.pages >= self.min_pages)}
+
+
+class SelectorLearnerRegistry:
+    """Process-wide selector learners keyed by their file.
+
+    Scrapers using the same file share one learner, which writes what it
+    learned when the process exits.
+    """
+
+    def __init__(self):
+        self._learners: Dict[str, SelectorLearner] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_path: str, min_pages: int = 20, revalidate_every: int = 50) -> SelectorLearner:
+        """Return the learner for a file, loading it on first use.
+
+        Settings of an existing learner are kept.
+        """
+        with self._lock:
+            learner = self._learners.get(db_path)
+            if learner is None:
+                learner = SelectorLearner(db_path, min_pages, revalidate_every)
+                self._learners[db_path] = learner
+            return learner
+
+    def flush(self) -> None:
+        """Write what every learner has learned."""
+        with self._lock:
+            learners = list(self._learners.values())
+        for learner in learners:
+            learner.flush()
+
+
+# Shared by every scraper in the process
+selector_learners = SelectorLearnerRegistry()
+atexit.register(selector_learners.flush)
@@ -23,6 +23,8 @@ class Product:
     image_urls: List[str] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
     scraped_at: datetime = field(default_factory=datetime.now)
+    # Fields a listing card did not show, until the product page is scraped
+    detail_pending: List[str] = field(default_factory=list)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert product to dictionary for database storage."""
@@ -38,7 +40,8 @@ class Product:
             'category': self.category,
             'image_urls': ','.join(self.image_urls),
             'metadata': str(self.metadata),
-            'scraped_at': self.scraped_at.isoformat()
+            'scraped_at': self.scraped_at.isoformat(),
+            'detail_pending': ','.join(self.detail_pending)
         }
     
     @classmethod
@@ -46,6 +49,7 @@ class Product:
         """Create product from dictionary."""
         image_urls = data.get('image_urls', '')
         image_urls = image_urls.split(',') if image_urls else []
+        detail_pending = data.get('detail_pending') or ''
         
         return cls(
             name=data['name'],
@@ -59,5 +63,6 @@ class Product:
             category=data.get('category', ''),
             image_urls=image_urls,
             metadata=eval(data.get('metadata', '{}')),
-            scraped_at=datetime.fromisoformat(data['scraped_at'])
+            scraped_at=datetime.fromisoformat(data['scraped_at']),
+            detail_pending=detail_pending.split(',') if detail_pending else []
         )
\ No newline at end of file
@@ -0,0 +1,385 @@
+"""
+Scrape runs: drive a scraper over product URLs and store the results.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .adaptive import ConcurrencyTuner
+from .database import DatabaseManager
+from .models import Product
+from .scraper import ProductScraper, FetchError, BudgetExhaustedError
+from .async_scraper import AsyncProductScraper
+
+
+@dataclass
+class ScrapeSummary:
+    """Outcome counters for a scrape run."""
+
+    total: int = 0
+    processed: int = 0
+    success_count: int = 0
+    error_count: int = 0
+    failed_urls: int = 0
+    stopped_by: Optional[str] = None  # crawl budget that ended the run early
+    concurrency: Optional[int] = None  # where the concurrency autotuner settled
+    concurrency_adjustments: int = 0
+
+
+class UrlScheduler:
+    """Product URLs waiting to be fetched, grouped by host.
+
+    Hosts take turns, and a host can be put on hold until a point in time
+    (its rate limit or circuit breaker) while single URLs can be delayed
+    (retry backoff). Neither holds up URLs on other hosts.
+    """
+
+    def __init__(self):
+        self._queues: Dict[str, deque] = {}
+        self._ready_hosts = deque()
+        self._held = set()
+        self._delayed = []  # heap of (not_before, sequence, url, host)
+        self._sequence = itertools.count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Number of URLs queued or delayed."""
+        return self._size
+
+    def add(self, url: str, not_before: float = 0.0) -> None:
+        """Queue a URL, optionally not before a time.monotonic() timestamp."""
+        self._size += 1
+        if not_before > time.monotonic():
+            heapq.heappush(self._delayed, (not_before, next(self._sequence), url, None))
+        else:
+            self._enqueue(url)
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp at which the next delayed URL or held host is released."""
+        return self._delayed[0][0] if self._delayed else None
+
+    def take(self, admit: Callable[[str], float]) -> Optional[str]:
+        """Return the next URL whose host admits a request now.
+
+        Args:
+            admit: Called with the first URL of each ready host in turn;
+                returns 0 to accept it, or the seconds to hold the host for
+
+        Returns:
+            URL to fetch, or None if no host can take a request yet
+        """
+        now = time.monotonic()
+        self._release_due(now)
+
+        for _ in range(len(self._ready_hosts)):
+            host = self._ready_hosts.popleft()
+            queue = self._queues[host]
+
+            hold_time = admit(queue[0])
+            if hold_time > 0:
+                self._held.add(host)
+                heapq.heappush(self._delayed, (now + hold_time, next(self._sequence), None, host))
+                continue
+
+            url = queue.popleft()
+            if queue:
+                self._ready_hosts.append(host)
+            self._size -= 1
+            return url
+
+        return None
+
+    def _enqueue(self, url: str) -> None:
+        """Append a URL to its host's queue."""
+        host = urlparse(url).netloc.lower()
+        queue = self._queues.setdefault(host, deque())
+        queue.append(url)
+        if len(queue) == 1 and host not in self._held:
+            self._ready_hosts.append(host)
+
+    def _release_due(self, now: float) -> None:
+        """Move delayed URLs and held hosts whose time has come back to ready."""
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, url, host = heapq.heappop(self._delayed)
+            if url is not None:
+                self._enqueue(url)
+            else:
+                self._held.discard(host)
+                if self._queues[host]:
+                    self._ready_hosts.append(host)
+
+
+class ScrapeRunner:
+    """Scrape product URLs with a ProductScraper and save them to the database.
+
+    Workers never sleep on a rate limit or retry backoff: a URL is handed
+    out only once its host's rate limiter grants a token, and retryable
+    failures go back on the queue with a not-before time, so workers pick
+    up other ready URLs in the meantime. URLs whose host has an open
+    circuit breaker are set aside until the breaker admits requests again.
+    URLs that still fail are recorded in the database's failed_urls table.
+    Duplicate URLs in flight at the same time share one download.
+
+    Once the scraper's crawl budget runs out no new URLs are started,
+    fetches already in flight finish and are saved, and the remaining URLs
+    are left unprocessed, without being recorded as failures.
+
+    With the scraper's config.autotune_concurrency set, a ConcurrencyTuner
+    decides how many URLs are in flight, instead of ``workers``.
+    """
+
+    # Times a URL is set aside for its host's open circuit before it is failed
+    MAX_DEFERRALS = 3
+
+    def __init__(self,
+                 scraper: ProductScraper,
+                 db_manager: DatabaseManager,
+                 workers: int = 1,
+                 on_progress: Optional[Callable[[str, ScrapeSummary], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        """Initialize the runner.
+
+        Args:
+            scraper: Scraper used to fetch products; an AsyncProductScraper
+                runs its fetches concurrently on an event loop
+            db_manager: Database the scraped products are saved to
+            workers: Number of threads fetching product pages concurrently
+                (ignored for an AsyncProductScraper)
+            on_progress: Called with the URL and summary after each product
+            should_stop: Polled between products; returning True ends the run
+        """
+        self.scraper = scraper
+        self.db_manager = db_manager
+        self.workers = max(1, workers)
+        self.on_progress = on_progress
+        self.should_stop = should_stop or (lambda: False)
+        self.logger = logging.getLogger(__name__)
+        self._circuit_deferrals: Dict[str, int] = {}
+        self.tuner: Optional[ConcurrencyTuner] = None
+
+    def _create_tuner(self) -> Optional[ConcurrencyTuner]:
+        """Return a concurrency tuner if the scraper's config asks for one."""
+        config = self.scraper.config
+        if not config.autotune_concurrency:
+            return None
+        if isinstance(self.scraper, AsyncProductScraper):
+            initial, max_limit = self.scraper.max_per_host, self.scraper.max_concurrency
+        else:
+            initial, max_limit = self.workers, max(self.workers, config.autotune_max_workers)
+        return ConcurrencyTuner(initial, max_limit=max_limit, interval=config.autotune_interval)
+
+    def _limit(self) -> int:
+        """Number of URLs to keep in flight right now."""
+        return self.tuner.limit if self.tuner else self.workers
+
+    def _tune(self, error: Optional[FetchError]) -> None:
+        """Feed one finished attempt to the concurrency tuner, if any."""
+        if self.tuner:
+            self.tuner.record(error is None)
+            self.tuner.update()
+
+    def run(self, product_urls: List[str]) -> ScrapeSummary:
+        """Scrape and save every URL, returning the run summary."""
+        summary = ScrapeSummary(total=len(product_urls))
+        self._circuit_deferrals = {}
+        self.tuner = self._create_tuner()
+        self.scraper.prewarm(product_urls)
+
+        if isinstance(self.scraper, AsyncProductScraper):
+            asyncio.run(self._run_async(product_urls, summary))
+        else:
+            self._run_threaded(product_urls, summary)
+
+        summary.stopped_by = self.scraper.budget.exhausted()
+        if self.tuner:
+            summary.concurrency = self.tuner.limit
+            summary.concurrency_adjustments = self.tuner.adjustments
+        return summary
+
+    def _record(self, url: str, product: Optional[Product], summary: ScrapeSummary,
+                error: Optional[FetchError] = None, attempts: int = 1) -> None:
+        """Save one result and report progress.
+
+        Always called from the thread driving the run, so the counters and
+        database writes never race.
+        """
+        if product and self.db_manager.save_product(product):
+            summary.success_count += 1
+        else:
+            summary.error_count += 1
+            if error is not None and self.db_manager.save_failed_url(
+                    url, error.status_code, str(error), attempts):
+                summary.failed_urls += 1
+
+        summary.processed += 1
+        if self.on_progress:
+            self.on_progress(url, summary)
+
+    def _retry_delay(self, url: str, error: FetchError, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a failed attempt, or None to give up."""
+        retry_policy = self.scraper.retry_policy
+        if not (error.retryable and retry_policy.should_retry(attempt)):
+            self.logger.error(f"Error fetching {url}: {error}")
+            return None
+
+        backoff_time = retry_policy.backoff(attempt, error.retry_after)
+        self.logger.warning(f"Attempt {attempt + 1} for {url} failed: {error}. "
+                            f"Retrying in {backoff_time:.2f} seconds...")
+        return backoff_time
+
+    def _admit(self, url: str) -> float:
+        """Seconds until a request to url may go out; 0 means a token was taken."""
+        circuit_wait = self.scraper.circuit_wait(url)
+        if circuit_wait > 0:
+            deferrals = self._circuit_deferrals.get(url, 0)
+            if deferrals < self.MAX_DEFERRALS:
+                self._circuit_deferrals[url] = deferrals + 1
+                return circuit_wait
+            # Still open: let the attempt fail fast without sending a request
+            return 0.0
+
+        self._circuit_deferrals.pop(url, None)
+        # The attempt sends no request when it joins the running download of
+        # the page (should that download finish first, one request goes out
+        # without a token) or the URL is known to be dead
+        if not self.scraper.sends_request(url):
+            return 0.0
+        return self.scraper.try_acquire(url)
+
+    def _attempt(self, url: str) -> Tuple[Optional[Product], Optional[FetchError]]:
+        """Make one attempt at a URL on a worker thread, returning any fetch error."""
+        try:
+            return self.scraper.scrape_product_attempt(url), None
+        except FetchError as e:
+            return None, e
+        except Exception as e:
+            self.logger.error(f"Error scraping {url}: {e}")
+            return None, FetchError(str(e))
+
+    def _run_threaded(self, product_urls: List[str], summary: ScrapeSummary) -> None:
+        """Spread product page fetches over a pool of ``workers`` threads.
+
+        At most ``workers`` URLs (or the tuner's limit) are in flight;
+        results are collected here on the calling thread, and in-flight work
+        drains when stopping.
+        """
+        scheduler = UrlScheduler()
+        for url in product_urls:
+            scheduler.add(url)
+
+        attempts: Dict[str, int] = {}
+        in_flight = {}
+        stopping = False
+
+        max_workers = self.tuner.max_limit if self.tuner else self.workers
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix='scraper-worker') as executor:
+            while True:
+                stopping = stopping or self.should_stop() or bool(self.scraper.budget.exhausted())
+                while not stopping and len(in_flight) < self._limit():
+                    url = scheduler.take(self._admit)
+                    if url is None:
+                        break
+                    if url not in attempts:
+                        self.scraper.retry_policy.record_request()
+                        attempts[url] = 0
+                    in_flight[executor.submit(self._attempt, url)] = url
+
+                next_due = scheduler.next_due()
+                if in_flight:
+                    # With every worker busy only a finished fetch frees a slot
+                    timeout = None
+                    if next_due is not None and len(in_flight) < self._limit():
+                        timeout = max(0.0, next_due - time.monotonic())
+
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = in_flight.pop(future)
+                        product, error = future.result()
+                        if isinstance(error, BudgetExhaustedError):
+                            continue
+                        self._tune(error)
+                        delay = self._retry_delay(url, error, attempts[url]) if error else None
+                        if delay is not None:
+                            attempts[url] += 1
+                            scheduler.add(url, time.monotonic() + delay)
+                        else:
+                            self._record(url, product, summary, error, attempts[url] + 1)
+                elif not stopping and next_due is not None:
+                    # Everything left is waiting; check for a stop now and then
+                    time.sleep(min(max(0.0, next_due - time.monotonic()), 1.0))
+                else:
+                    break
+
+    async def _run_async(self, product_urls: List[str], summary: ScrapeSummary) -> None:
+        """Scrape URLs concurrently.
+
+        URLs are started up to the scraper's max_concurrency (or the
+        tuner's limit) and only while the crawl budget lasts; the scraper's
+        semaphores also bound the fetches in flight per host.
+        """
+        async def scrape(url: str) -> Tuple[str, Optional[Product], Optional[FetchError], int]:
+            attempt = 0
+
+            while True:
+                for _ in range(self.MAX_DEFERRALS):
+                    circuit_wait = self.scraper.circuit_wait(url)
+                    if circuit_wait <= 0:
+                        break
+                    await asyncio.sleep(circuit_wait)
+
+                product, error, unexpected = None, None, False
+                try:
+                    product = await self.scraper.scrape_product_attempt_async(url)
+                except BudgetExhaustedError as e:
+                    return url, None, e, attempt + 1
+                except FetchError as e:
+                    error = e
+                except Exception as e:
+                    self.logger.error(f"Error scraping {url}: {e}")
+                    error, unexpected = FetchError(str(e)), True
+
+                # Counted once per URL the budget let through, as in the threaded engine
+                if attempt == 0:
+                    self.scraper.retry_policy.record_request()
+                self._tune(error)
+                if error is None:
+                    return url, product, None, attempt + 1
+
+                delay = None if unexpected else self._retry_delay(url, error, attempt)
+                if delay is None:
+                    return url, None, error, attempt + 1
+
+                # Backoff waits on the loop and holds no concurrency slot
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        pending = deque(product_urls)
+        tasks = set()
+        try:
+            while pending or tasks:
+                limit = self.tuner.limit if self.tuner else self.scraper.max_concurrency
+                while pending and len(tasks) < limit and not self.scraper.budget.exhausted():
+                    tasks.add(asyncio.ensure_future(scrape(pending.popleft())))
+                if not tasks:
+                    break
+
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, product, error, attempts = task.result()
+                    # Fetches refused by the budget finish at once; those in flight drain
+                    if not isinstance(error, BudgetExhaustedError):
+                        self._record(url, product, summary, error, attempts)
+                if self.should_stop():
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
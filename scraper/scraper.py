@@ -3,51 +3,137 @@ Main web scraper class for extracting product data from e-commerce sites.
 """
 
 import re
+import time
 import logging
-from typing import List, Optional, Dict, Any, Callable
+import threading
+from typing import List, Optional, Dict, Any, Collection, Iterator, Pattern, Set, Tuple
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from lxml.html import HtmlElement
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from requests.adapters import DEFAULT_POOLSIZE
 
 from .models import Product
-from .utils import RateLimiter, retry_on_failure, CircuitBreaker, random_user_agent, get_proxy_config
-from .config import get_site_config
+from .utils import (RateLimiter, RetryPolicy, CrawlBudget, CircuitBreaker, CircuitOpenError, CallNotMade,
+                    random_user_agent, get_proxy_config, get_rate_limiter_registry,
+                    host_circuit_breakers, parse_retry_after, canonicalize_url, clean_url)
+from .adaptive import rate_controllers, timeout_trackers
+from .streaming import FieldWatcher
+from .cache import HTTPCache, CachingAdapter, UrlCache
+from .singleflight import page_flights
+from .extraction import (PageMatches, LinkHarvester, selector_plans, selector_learners,
+                         listing_card_plans, compile_selectors, parse_html, element_text, PRODUCT_FIELDS,
+                         LISTING_LINK_SELECTORS, NEXT_PAGE_SELECTORS)
+from .proxies import ProxyState, proxy_pools, redact_proxy_url
+from .connections import ConnectionPoolAdapter, connection_stats, dns_cache
+from .database import DatabaseManager
+from .structured import extract_structured
+from .config import ScraperConfig, get_site_config, site_domain
+
+
+class FetchError(Exception):
+    """A page could not be fetched."""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None, retryable: bool = False):
+        """Initialize the error.
+        
+        Args:
+            message: Description of the failure
+            status_code: HTTP status, if a response was received
+            retry_after: Seconds requested by a Retry-After header
+            retryable: Whether another attempt may succeed
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+class BudgetExhaustedError(FetchError, CallNotMade):
+    """A request was not sent because the run's crawl budget is used up."""
+    
+    def __init__(self, message: str, budget: str):
+        """Initialize the error.
+        
+        Args:
+            message: Description of the budget that was reached
+            budget: 'time', 'requests' or 'bytes'
+        """
+        super().__init__(message)
+        self.budget = budget
 
 
 class ProductScraper:
     """Main scraper class for extracting product data."""
     
+    # Bytes read from a streamed response body at a time
+    CHUNK_SIZE = 64 * 1024
+    # Smaller reads while parsing incrementally, so reading can stop sooner
+    STREAM_PARSE_CHUNK_SIZE = 8 * 1024
+    # Listing page selectors, compiled once
+    LISTING_LINKS = LinkHarvester(LISTING_LINK_SELECTORS)
+    NEXT_PAGE_LINKS = compile_selectors(NEXT_PAGE_SELECTORS)
+    
     def __init__(self, 
                  base_url: str,
                  rate_limiter: Optional[RateLimiter] = None,
                  custom_headers: Optional[Dict[str, str]] = None,
-                 timeout: int = 30):
+                 timeout: Optional[int] = None,
+                 config: Optional[ScraperConfig] = None,
+                 db_manager: Optional[DatabaseManager] = None):
         """Initialize the scraper.
         
         Args:
             base_url: Base URL of the e-commerce site
-            rate_limiter: Rate limiter instance
+            rate_limiter: Rate limiter shared by all requests; by default
+                each host gets its own bucket from the process-wide registry
             custom_headers: Custom HTTP headers
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds (defaults to config.timeout)
+            config: Scraper configuration; explicit arguments take precedence
+            db_manager: Database of earlier results; with the HTTP cache
+                enabled, unchanged product pages are taken from it instead
+                of being extracted again
         """
         self.base_url = base_url
-        self.rate_limiter = rate_limiter or RateLimiter()
-        self.timeout = timeout
+        self.config = config or ScraperConfig()
+        self.db_manager = db_manager
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout if timeout is not None else self.config.timeout
         self.logger = logging.getLogger(__name__)
-        self.circuit_breaker = CircuitBreaker()
+        self.retry_policy = RetryPolicy.from_config(self.config)
+        self.budget = CrawlBudget.from_config(self.config)
+        self._transfer_stats = {'aborted': 0, 'bytes_saved': 0}
+        self._unchanged_products = 0
+        self._structured_stats = {'pages': 0, 'complete': 0}
+        self._listing_diff = {'new': 0, 'changed': 0, 'unchanged': 0}
+        self._stats_lock = threading.Lock()
         
-        # Set up session with retry strategy
+        # Set up session; retries are handled by the retry policy, not urllib3
         self.session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        pool_settings = dict(max_retries=0, use_dns_cache=self.config.dns_cache,
+                             pool_connections=self._pool_connections(),
+                             pool_maxsize=self._pool_maxsize())
+        self.http_cache = None
+        if self.config.http_cache:
+            self.http_cache = HTTPCache(self.config.http_cache_db_path(),
+                                        self.config.http_cache_max_mb * 1024 * 1024)
+            self.adapter = CachingAdapter(self.http_cache, **pool_settings)
+        else:
+            self.adapter = ConnectionPoolAdapter(**pool_settings)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        
+        self.url_cache = None
+        if self.config.url_cache:
+            self.url_cache = UrlCache(self.config.url_cache_db_path(),
+                                      self.config.negative_cache_ttl,
+                                      self.config.redirect_cache_ttl)
+        
+        self.selector_learner = None
+        if self.config.selector_learning:
+            self.selector_learner = selector_learners.get(self.config.selector_learning_db_path(),
+                                                          self.config.selector_min_pages,
+                                                          self.config.selector_revalidate_every)
         
         # Set headers
         self.session.headers.update({
@@ -60,45 +146,509 @@ class ProductScraper:
             'Upgrade-Insecure-Requests': '1',
         })
         
+        if self.config.custom_headers:
+            self.session.headers.update(self.config.custom_headers)
         if custom_headers:
             self.session.headers.update(custom_headers)
         
-        # Set proxy if available
-        proxy_config = get_proxy_config()
-        if proxy_config:
-            self.session.proxies.update(proxy_config)
+        # Set proxy if available; a proxy pool picks the proxy per request
+        self.proxy_pool = None
+        if self.config.proxies:
+            self.proxy_pool = proxy_pools.get(self.config.proxies, self.config.proxy_assignment,
+                                              self.config.proxy_quarantine_time)
+        else:
+            proxy_config = self.config.proxy_config or get_proxy_config()
+            if proxy_config:
+                self.session.proxies.update(proxy_config)
+        
+        # Downloads are only shared with scrapers that would send the same
+        # request and account for it the same way; the random User-Agent
+        # does not change the page, so it is left out
+        budget = self.budget
+        explicit_headers = {**(self.config.custom_headers or {}), **(custom_headers or {})}
+        self._flight_scope = (
+            id(budget) if (budget.max_seconds or budget.max_requests or budget.max_bytes) else None,
+            self.http_cache.db_path if self.http_cache else None,
+            self.url_cache.db_path if self.url_cache else None,
+            id(self.proxy_pool) if self.proxy_pool else tuple(sorted(self.session.proxies.items())),
+            tuple(sorted(explicit_headers.items())),
+        )
+    
+    def close(self) -> None:
+        """Release the HTTP connections."""
+        self.session.close()
+    
+    def _pool_maxsize(self) -> int:
+        """Number of keep-alive connections to hold per host.
+        
+        Worker threads share this session, so the pool holds at least one
+        connection per worker instead of discarding the extras.
+        """
+        return max(DEFAULT_POOLSIZE, self._max_workers())
+    
+    def _max_workers(self) -> int:
+        """Most worker threads a run may use, allowing for the concurrency autotuner."""
+        if self.config.autotune_concurrency:
+            return max(self.config.workers, self.config.autotune_max_workers)
+        return self.config.workers
+    
+    def _pool_connections(self) -> int:
+        """Number of per-host pools to keep before closing the least recently used.
+        
+        Every worker may be on a different host, and each proxy in the pool
+        needs a pool of its own.
+        """
+        return max(DEFAULT_POOLSIZE, self._max_workers()) + len(self.config.proxies)
+    
+    def prewarm(self, urls: List[str]) -> int:
+        """Open config.prewarm_connections keep-alive connections to each host in urls.
+        
+        Skipped when requests go through proxies, whose connections are
+        opened on first use.
+        
+        Returns:
+            Number of connections opened
+        """
+        if not self.config.prewarm_connections or self.proxy_pool or self.session.proxies:
+            return 0
+        
+        if not urls:
+            return 0
+        # The pools are keyed on the CA bundle the session resolves verify=True to
+        verify = self.session.merge_environment_settings(urls[0], {}, None, None, None)['verify']
+        opened = self.adapter.prewarm(urls, self.config.prewarm_connections,
+                                      timeout=self.config.connect_timeout, verify=verify)
+        self.logger.info(f"Pre-warmed {opened} connections")
+        return opened
+    
+    def _rate_limiter_for(self, url: str) -> Any:
+        """Return the token bucket that throttles requests to a URL."""
+        if self.rate_limiter:
+            return self.rate_limiter
+        
+        host = urlparse(url).netloc.lower()
+        requests_per_second, burst_size = self.config.rate_limit_for(host)
+        if self.proxy_pool:
+            # Limits apply per egress IP, so the host's budget grows with the pool
+            requests_per_second *= len(self.proxy_pool)
+            burst_size *= len(self.proxy_pool)
+        return self._rate_limiter_registry().get(host, requests_per_second, burst_size)
     
-    @retry_on_failure(max_retries=3, exceptions=(requests.RequestException,))
-    def _fetch_page(self, url: str) -> Optional[BeautifulSoup]:
+    def try_acquire(self, url: str) -> float:
+        """Take a rate limit token for a URL's host without waiting.
+        
+        Returns:
+            0 if a request may go out now, otherwise seconds until one may
+        """
+        return self._rate_limiter_for(url).try_acquire()
+    
+    def _rate_limiter_registry(self):
+        """Return the per-host bucket registry for the configured backend."""
+        return get_rate_limiter_registry(self.config.rate_limit_backend,
+                                         self.config.rate_limit_db_path())
+    
+    def _circuit_breaker_for(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker guarding requests to a URL's host."""
+        return host_circuit_breakers.get(urlparse(url).netloc.lower(),
+                                         self.config.failure_threshold,
+                                         self.config.recovery_timeout,
+                                         self.config.half_open_max_calls)
+    
+    def circuit_wait(self, url: str) -> float:
+        """Seconds until the host's circuit breaker would admit a request to a URL.
+        
+        Runners use this to set URLs aside and work on other hosts instead
+        of sending requests that the breaker would reject.
+        """
+        return self._circuit_breaker_for(url).retry_after()
+    
+    def _observe_response(self, url: str, response: Optional[requests.Response]) -> None:
+        """Feed a response (None for a failed request) to adaptive control."""
+        if not self.config.adaptive_rate:
+            return
+        
+        host = urlparse(url).netloc.lower()
+        controller = rate_controllers.get(host, self._rate_limiter_for(url), self.config)
+        if response is None:
+            controller.record(None)
+        else:
+            controller.record(response.elapsed.total_seconds(), response.status_code,
+                              parse_retry_after(response.headers.get('Retry-After')))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics for progress and status displays."""
+        return {
+            'host_rates': {host: round(rate, 2) for host, rate
+                           in self._rate_limiter_registry().rates().items()},
+            'host_timeouts': timeout_trackers.snapshot(),
+            'retries': self.retry_policy.stats(),
+            'budget': self.budget.stats(),
+            'circuits': host_circuit_breakers.states(),
+            'transfer': dict(self._transfer_stats),
+            'coalesced': page_flights.stats(),
+            'http_cache': ({**self.http_cache.stats(),
+                            'unchanged_products': self._unchanged_products}
+                           if self.http_cache else None),
+            'url_cache': self.url_cache.stats() if self.url_cache else None,
+            'selector_learning': self.selector_learner.stats() if self.selector_learner else None,
+            'structured_data': dict(self._structured_stats) if self.config.structured_data else None,
+            'listing_diff': (dict(self._listing_diff) if any(self._listing_diff.values())
+                             else None),
+            'proxies': self.proxy_pool.stats() if self.proxy_pool else None,
+            'connections': connection_stats.snapshot(),
+            'dns_cache': dns_cache.stats() if self.config.dns_cache else None,
+        }
+    
+    def _fetch_page(self, url: str,
+                    site_config: Optional[Dict[str, str]] = None) -> Optional[HtmlElement]:
         """Fetch and parse a web page.
         
+        Transient failures are retried under the scraper's retry policy.
+        
         Args:
             url: URL to fetch
+            site_config: Product selectors; when given, the body is only read
+                until every configured field has been parsed
             
         Returns:
-            BeautifulSoup object or None if failed
+            Parsed document or None if failed
+        """
+        return self._fetch(url, site_config)[0]
+    
+    def _fetch(self, url: str,
+               site_config: Optional[Dict[str, str]] = None) -> Tuple[Optional[HtmlElement], bool]:
+        """Fetch and parse a web page, retrying transient failures.
+        
+        Returns:
+            Parsed document or None if failed, and whether the page was
+            served from the HTTP cache after a 304 Not Modified
         """
-        self.rate_limiter.wait_if_needed()
+        self.retry_policy.record_request()
+        attempt = 0
         
+        while True:
+            if self.circuit_wait(url) > 0:
+                self.logger.error(f"Skipping {url}: circuit breaker for its host is open")
+                return None, False
+            
+            if self.sends_request(url, site_config):
+                self._rate_limiter_for(url).wait_if_needed()
+            try:
+                return self._download(url, site_config)
+            except FetchError as e:
+                if not (e.retryable and self.retry_policy.should_retry(attempt)):
+                    self.logger.error(f"Error fetching {url}: {e}")
+                    return None, False
+                
+                backoff_time = self.retry_policy.backoff(attempt, e.retry_after)
+                self.logger.warning(f"Attempt {attempt + 1} for {url} failed: {e}. "
+                                    f"Retrying in {backoff_time:.2f} seconds...")
+                time.sleep(backoff_time)
+                attempt += 1
+    
+    def _timeout_for(self, url: str, proxy: Optional[ProxyState] = None) -> Any:
+        """Return the requests timeout for a URL.
+
+        A fixed timeout unless adaptive timeouts are enabled, in which case
+        a (connect, read) pair derived from the host's latency percentiles.
+        """
+        if not self.config.adaptive_timeouts:
+            return self.timeout
+        return timeout_trackers.get(self._latency_key(url, proxy)).timeouts(self.config,
+                                                                           self.timeout)
+    
+    def _latency_key(self, url: str, proxy: Optional[ProxyState] = None) -> str:
+        """Key the latency of requests to a URL is tracked under.
+
+        The host, or the host and proxy for requests through a proxy, whose
+        own latency adds to the host's.
+        """
+        parts = urlparse(url)
+        host = parts.netloc.lower()
+        if proxy:
+            return f"{host} via {proxy.label}"
+        proxy_url = self.session.proxies.get(parts.scheme)
+        return f"{host} via {redact_proxy_url(proxy_url)}" if proxy_url else host
+
+    def _request(self, url: str) -> requests.Response:
+        """GET a URL, raising on throttling and server errors.
+        
+        Those responses count as failures for the circuit breaker; the
+        response is observed by adaptive rate control either way.
+        
+        Raises:
+            BudgetExhaustedError: If the crawl budget does not allow the request
+        """
+        # Charged here, once the circuit breaker has admitted the request
+        exhausted = self.budget.charge_request()
+        if exhausted:
+            raise BudgetExhaustedError(f"Not fetching {url}: {self.budget.describe(exhausted)} "
+                                       f"reached", exhausted)
+        
+        proxy = self.proxy_pool.acquire(urlparse(url).netloc.lower()) if self.proxy_pool else None
+        response = None
         try:
-            response = self.circuit_breaker.call(
-                self.session.get, url, timeout=self.timeout
-            )
+            timeout = self._timeout_for(url, proxy)
+            # Streamed, so status and headers can be checked before the body is read
+            response = self.session.get(url, timeout=timeout, stream=True,
+                                        proxies=proxy.proxies if proxy else None)
+        except requests.RequestException as e:
+            # Connect timeouts say nothing about how long the host takes to answer
+            if isinstance(e, requests.ReadTimeout) and self.config.adaptive_timeouts:
+                # Censored sample: the host took at least this long
+                timeout_trackers.get(self._latency_key(url, proxy)).record(timeout[1])
+            raise
+        finally:
+            # Whatever went wrong, the request is no longer in flight
+            if proxy and response is None:
+                self.proxy_pool.release(proxy)
+            elif proxy:
+                self.proxy_pool.release(proxy, response.elapsed.total_seconds(),
+                                        response.status_code)
+        
+        if self.config.adaptive_timeouts:
+            timeout_trackers.get(self._latency_key(url, proxy)).record(
+                response.elapsed.total_seconds())
+        self._observe_response(url, response)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.close()
             response.raise_for_status()
-            
-            # Check if content is HTML
-            content_type = response.headers.get('content-type', '')
-            if 'text/html' not in content_type:
-                self.logger.warning(f"Non-HTML content received from {url}")
-                return None
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            self.logger.debug(f"Successfully fetched {url}")
-            return soup
-            
+        return response
+    
+    def _download(self, url: str,
+                  site_config: Optional[Dict[str, str]] = None) -> Tuple[Optional[HtmlElement], bool]:
+        """Download and parse a page once, without rate limiting or retries.
+        
+        Concurrent downloads of the same canonical URL, from any scraper in
+        the process with the same budget, caches, proxies and headers, share
+        one request and one parsed document.
+        
+        Args:
+            url: URL to fetch
+            site_config: Product selectors to stop reading the body early on
+        
+        Returns:
+            Parsed document, or None if the content is not HTML, and whether
+            the page was served from the HTTP cache after a 304 Not Modified
+        
+        Raises:
+            FetchError: If the page could not be fetched
+        """
+        return page_flights.do(self._flight_key(url, site_config),
+                               self._download_uncoalesced, url, site_config)
+    
+    def _flight_key(self, url: str, site_config: Optional[Dict[str, str]] = None) -> tuple:
+        """Key under which downloads of a page are coalesced."""
+        # Bodies cut short by streaming parse are only shared with other product fetches
+        return canonicalize_url(url), bool(site_config), self._flight_scope
+    
+    def fetch_in_flight(self, url: str, site_config: Optional[Dict[str, str]] = None) -> bool:
+        """Whether a download of the page is running, which a new fetch would join.
+        
+        Such fetches need no rate limit token. By default the page is
+        treated as a product page, as for scrape_product.
+        """
+        if site_config is None:
+            site_config = self._stream_parse_config(url)
+        return page_flights.in_flight(self._flight_key(url, site_config))
+    
+    def known_dead(self, url: str) -> bool:
+        """Whether the URL cache holds a recent 404/410 for the URL."""
+        return bool(self.url_cache) and self.url_cache.dead_status(url) is not None
+    
+    def sends_request(self, url: str, site_config: Optional[Dict[str, str]] = None) -> bool:
+        """Whether fetching the page now would send a request, and so needs a rate limit token.
+        
+        Fetches that join a running download, fetches of URLs known to be
+        dead and fetches after the crawl budget ran out send none.
+        """
+        return not (self.fetch_in_flight(url, site_config) or self.known_dead(url)
+                    or self.budget.exhausted())
+    
+    def _download_uncoalesced(self, url: str,
+                              site_config: Optional[Dict[str, str]] = None
+                              ) -> Tuple[Optional[HtmlElement], bool]:
+        """Download and parse a page, see _download.
+        
+        With the URL cache enabled, URLs known to be dead are not requested
+        and URLs known to redirect are requested at their final URL.
+        """
+        request_url = url
+        if self.url_cache:
+            request_url, dead_status = self.url_cache.lookup(url)
+            if dead_status is not None:
+                raise FetchError(f"{url} answered {dead_status} recently, not fetching it again",
+                                 status_code=dead_status)
+        
+        try:
+            response = self._request_redirected(url, request_url)
+        except FetchError:
+            raise
+        except CircuitOpenError as e:
+            raise FetchError(str(e), retry_after=e.retry_after) from e
+        except requests.HTTPError as e:
+            e.response.close()
+            status_code = e.response.status_code
+            if self.url_cache and status_code in UrlCache.DEAD_STATUS:
+                self.url_cache.mark_dead(url, status_code)
+            raise FetchError(
+                str(e), status_code=status_code,
+                retry_after=parse_retry_after(e.response.headers.get('Retry-After')),
+                # Behind a proxy pool a 403 is an IP ban another proxy may get past
+                retryable=(status_code in RetryPolicy.RETRYABLE_STATUS
+                           or (status_code == 403 and self.proxy_pool is not None
+                               and len(self.proxy_pool) > 1))
+            ) from e
+        except (requests.ConnectionError, requests.Timeout) as e:
+            self._observe_response(url, None)
+            raise FetchError(str(e), retryable=True) from e
         except Exception as e:
-            self.logger.error(f"Error fetching {url}: {e}")
+            raise FetchError(str(e)) from e
+        
+        if self.url_cache and response.history:
+            self.url_cache.add_redirects(url, response)
+        
+        # Check if content is HTML before downloading the body
+        content_type = response.headers.get('content-type', '')
+        if 'text/html' not in content_type:
+            self.logger.warning(f"Non-HTML content received from {url}")
+            self._abort_download(response)
+            return None, False
+        
+        not_modified = getattr(response, 'from_cache', False)
+        if not_modified:
+            content = response.content
+        else:
+            if site_config:
+                content, complete = self._read_until_fields(response, url, site_config)
+            else:
+                content, complete = b''.join(self._iter_body(response, url)), True
+            if self.http_cache and complete:
+                self.http_cache.store(response, content)
+        # Decoded with the charset the server declared, not one guessed from the bytes
+        doc = parse_html(content, content_type)
+        self.logger.debug(f"Successfully fetched {url}")
+        return doc, not_modified
+    
+    def _request_redirected(self, url: str, request_url: str) -> requests.Response:
+        """Request a page at its cached redirect target, falling back to the page URL.
+        
+        A target that answers 404/410 or cannot be fetched is dropped from
+        the URL cache and the page is requested at its own URL, whose
+        redirect may have moved since.
+        
+        Raises:
+            requests.HTTPError: If the response has an error status
+            BudgetExhaustedError: If the crawl budget does not allow a request
+        """
+        breaker = self._circuit_breaker_for(url)
+        if request_url != url:
+            try:
+                response = breaker.call(self._request, request_url)
+                if response.status_code not in UrlCache.DEAD_STATUS:
+                    response.raise_for_status()
+                    return response
+                response.close()
+            except requests.RequestException as e:
+                self.logger.debug(f"Cached redirect target {request_url} of {url} failed: {e}")
+            self.url_cache.forget_redirect(url)
+        
+        response = breaker.call(self._request, url)
+        response.raise_for_status()
+        return response
+    
+    def _iter_body(self, response: requests.Response, url: str,
+                   chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        """Yield a streamed response body in chunks within the configured limits.
+        
+        Raises:
+            FetchError: If the body exceeds max_body_bytes, the download takes
+                longer than download_timeout, or the connection fails
+        """
+        max_bytes = self.config.max_body_bytes
+        content_length = response.headers.get('content-length', '')
+        if max_bytes and content_length.isdigit() and int(content_length) > max_bytes:
+            self._abort_download(response)
+            raise FetchError(f"Body of {url} is {content_length} bytes, "
+                             f"over the {max_bytes} byte limit")
+        
+        deadline = time.monotonic() + self.config.download_timeout
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size or self.CHUNK_SIZE):
+                received += len(chunk)
+                self.budget.charge_bytes(len(chunk))
+                if max_bytes and received > max_bytes:
+                    self._abort_download(response)
+                    raise FetchError(f"Body of {url} exceeds the {max_bytes} byte limit")
+                if time.monotonic() > deadline:
+                    self._abort_download(response)
+                    raise FetchError(f"Download of {url} took longer than "
+                                     f"{self.config.download_timeout}s")
+                yield chunk
+        except requests.RequestException as e:
+            response.close()
+            raise FetchError(str(e), retryable=True) from e
+    
+    def _read_until_fields(self, response: requests.Response, url: str,
+                           site_config: Dict[str, str]) -> Tuple[bytes, bool]:
+        """Read a body only until every field in site_config has been parsed.
+        
+        Chunks are parsed by lxml as they arrive. Once all fields are
+        complete the download stops, unless the rest of the body fits in one
+        more read, which is cheaper than losing the keep-alive connection.
+        
+        Returns:
+            The part of the body that was read, and whether that is all of it
+        """
+        watcher = FieldWatcher(site_config)
+        if not watcher.pending:
+            return b''.join(self._iter_body(response, url)), True
+        
+        chunks = []
+        complete = True
+        body = self._iter_body(response, url, self.STREAM_PARSE_CHUNK_SIZE)
+        for chunk in body:
+            chunks.append(chunk)
+            if not watcher.feed(chunk):
+                continue
+            
+            content_length = response.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) - response.raw.tell() <= self.CHUNK_SIZE:
+                chunks.extend(body)
+            else:
+                body.close()
+                self._abort_download(response)
+                complete = False
+                self.logger.debug(f"Stopped reading {url} once all fields were parsed")
+            break
+        
+        return b''.join(chunks), complete
+    
+    def _stream_parse_config(self, url: str) -> Optional[Dict[str, str]]:
+        """Site selectors to parse a product page with while it downloads.
+        
+        None unless streaming parse is enabled and the site is configured.
+        Also None when structured data is used: JSON-LD and embedded state
+        are often at the end of the page, after every selector has matched.
+        """
+        if not self.config.streaming_parse or self.config.structured_data:
             return None
+        return get_site_config(url)
+    
+    def _abort_download(self, response: requests.Response) -> None:
+        """Close a response without reading the rest of its body.
+        
+        The bytes left unread are counted as saved when the server announced
+        the body size; the connection is dropped rather than drained.
+        """
+        content_length = response.headers.get('content-length', '')
+        saved = int(content_length) - response.raw.tell() if content_length.isdigit() else 0
+        response.close()
+        
+        with self._stats_lock:
+            self._transfer_stats['aborted'] += 1
+            self._transfer_stats['bytes_saved'] += max(0, saved)
     
     def extract_product_urls(self, 
                            category_url: str,
@@ -115,89 +665,244 @@ class ProductScraper:
             List of product URLs
         """
         product_urls = []
+        seen = set()
+        pattern = re.compile(url_pattern) if url_pattern else None
+        
+        for page_url, doc in self._listing_pages(category_url, max_pages):
+            # Extract product URLs from current page, skipping those already found
+            product_urls.extend(self._extract_urls_from_page(doc, page_url, pattern, seen))
+        
+        self.logger.info(f"Found {len(product_urls)} unique product URLs")
+        return product_urls
+    
+    def _listing_pages(self, category_url: str,
+                       max_pages: int) -> Iterator[Tuple[str, HtmlElement]]:
+        """Fetch category pages one after another, following next page links.
+        
+        Args:
+            category_url: URL of the first category page
+            max_pages: Maximum number of pages to fetch
+            
+        Yields:
+            URL and parsed document of each page, until a page cannot be
+            fetched or has no next page link
+        """
         current_url = category_url
         
         for page in range(max_pages):
             self.logger.info(f"Scraping page {page + 1}: {current_url}")
-            soup = self._fetch_page(current_url)
+            doc = self._fetch_page(current_url)
+            
+            if doc is None:
+                return
+            
+            yield current_url, doc
+            
+            current_url = self._find_next_page_url(doc, current_url)
+            if not current_url:
+                return
+    
+    def has_listing_cards(self, url: str) -> bool:
+        """Whether products can be taken from the listing cards of url's site."""
+        return listing_card_plans.get(get_site_config(url)) is not None
+    
+    def extract_listing_products(self,
+                                 category_url: str,
+                                 url_pattern: Optional[str] = None,
+                                 max_pages: int = 10) -> List[Product]:
+        """Build products from the cards on category pages, without fetching product pages.
+        
+        Args:
+            category_url: URL of the category page
+            url_pattern: Regex pattern to match product URLs
+            max_pages: Maximum number of pages to scrape
             
-            if not soup:
-                break
+        Returns:
+            One product per distinct product URL, with the fields its card
+            did not show listed in detail_pending
+        """
+        products: Dict[str, Product] = {}
+        
+        for page_url, doc in self._listing_pages(category_url, max_pages):
+            for product in self._extract_cards_from_page(doc, page_url, url_pattern):
+                products.setdefault(canonicalize_url(product.url), product)
+        
+        self.logger.info(f"Found {len(products)} products on listing cards")
+        return list(products.values())
+    
+    def _extract_cards_from_page(self, doc: HtmlElement, page_url: str,
+                                 url_pattern: Optional[str] = None) -> List[Product]:
+        """Build a product from each card on a listing page."""
+        plan = listing_card_plans.get(get_site_config(page_url))
+        if plan is None:
+            return []
+        
+        pattern = re.compile(url_pattern) if url_pattern else None
+        products = []
+        for href, matches in plan.cards(doc):
+            if not href:
+                continue
+            product_url = clean_url(urljoin(page_url, href))
+            if pattern and not pattern.search(product_url):
+                continue
             
-            # Extract product URLs from current page
-            page_urls = self._extract_urls_from_page(soup, url_pattern)
-            product_urls.extend(page_urls)
+            fields = self._extract_fields(matches, page_url, plan.fields)
+            # Card titles are often cut short, with the full name in the title attribute
+            for element in matches['name'] if 'name' in plan.fields else ():
+                if element.get('title'):
+                    fields['name'] = element.get('title').strip()
+                    break
+            if not fields.get('name'):
+                continue
             
-            # Find next page URL
-            next_url = self._find_next_page_url(soup, current_url)
-            if not next_url:
-                break
+            products.append(Product(
+                name=fields['name'],
+                price=fields.get('price'),
+                url=product_url,
+                description=fields.get('description', ''),
+                rating=fields.get('rating'),
+                reviews_count=fields.get('reviews_count'),
+                availability=fields.get('availability', ''),
+                brand=fields.get('brand', ''),
+                category=fields.get('category', ''),
+                image_urls=fields.get('images', []),
+                detail_pending=[field for field in PRODUCT_FIELDS
+                                if fields.get(field) in (None, '', [])]
+            ))
+        
+        return products
+    
+    def extract_changed_product_urls(self,
+                                     category_url: str,
+                                     url_pattern: Optional[str] = None,
+                                     max_pages: int = 10) -> List[str]:
+        """Extract the URLs of products that are new or changed on category pages.
+        
+        Each listing card is compared with the stored product, looked up
+        once per page; unchanged products are only marked as seen.
+        
+        Args:
+            category_url: URL of the category page
+            url_pattern: Regex pattern to match product URLs
+            max_pages: Maximum number of pages to scrape
             
-            current_url = next_url
+        Returns:
+            URLs of products not in the database, whose card shows another
+            name, price or availability, or whose details are pending
+        """
+        product_urls = []
+        
+        for page_url, doc in self._listing_pages(category_url, max_pages):
+            product_urls.extend(self._changed_card_urls(doc, page_url, url_pattern))
+        
+        return self._unique_urls(product_urls)
+    
+    def _changed_card_urls(self, doc: HtmlElement, page_url: str,
+                           url_pattern: Optional[str] = None) -> List[str]:
+        """Compare the cards on a listing page with the stored products.
+        
+        Returns:
+            URLs of the cards' products that need scraping, in page order
+        """
+        cards = self._extract_cards_from_page(doc, page_url, url_pattern)
+        stored = (self.db_manager.get_listing_snapshots([card.url for card in cards])
+                  if self.db_manager else {})
+        
+        changed, unchanged = [], []
+        counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+        for card in cards:
+            row = stored.get(card.url)
+            if row is None:
+                counts['new'] += 1
+                changed.append(card.url)
+            elif row['detail_pending'] or self._card_differs(card, row):
+                counts['changed'] += 1
+                changed.append(card.url)
+            else:
+                counts['unchanged'] += 1
+                unchanged.append(card.url)
+        
+        if unchanged:
+            self.db_manager.mark_seen(unchanged)
+        with self._stats_lock:
+            for key, count in counts.items():
+                self._listing_diff[key] += count
+        return changed
+    
+    @staticmethod
+    def _card_differs(card: Product, row: Dict[str, Any]) -> bool:
+        """Whether a listing card shows a name, price or availability other than the stored one.
+        
+        Fields the card does not show are not compared. Names are compared
+        without case and spacing, and up to the ellipsis of a shortened
+        name; availability by whether it says in or out of stock.
+        """
+        if card.name:
+            name = ' '.join(card.name.lower().split())
+            stored_name = ' '.join((row['name'] or '').lower().split())
+            shortened = name.rstrip('.…').rstrip()
+            if name != stored_name and not (shortened != name
+                                            and stored_name.startswith(shortened)):
+                return True
         
-        # Remove duplicates while preserving order
+        if card.price is not None and (row['price'] is None
+                                       or round(card.price, 2) != round(row['price'], 2)):
+            return True
+        
+        if card.availability:
+            def state(text: str) -> str:
+                text = ' '.join(text.lower().split())
+                if any(term in text for term in ('out of stock', 'sold out', 'unavailable')):
+                    return 'out of stock'
+                if 'in stock' in text or 'available' in text:
+                    return 'in stock'
+                return text
+            
+            if state(card.availability) != state(row['availability'] or ''):
+                return True
+        
+        return False
+    
+    def _unique_urls(self, product_urls: List[str]) -> List[str]:
+        """Remove duplicates, compared by canonical URL, while preserving order."""
         unique_urls = []
         seen = set()
         for url in product_urls:
-            if url not in seen:
+            key = canonicalize_url(url)
+            if key not in seen:
                 unique_urls.append(url)
-                seen.add(url)
+                seen.add(key)
         
         self.logger.info(f"Found {len(unique_urls)} unique product URLs")
         return unique_urls
     
-    def _extract_urls_from_page(self, soup: BeautifulSoup, 
-                               url_pattern: Optional[str] = None) -> List[str]:
-        """Extract product URLs from a single page."""
-        urls = []
-        
-        # Common selectors for product links
-        selectors = [
-            'a[href*="/product/"]',
-            'a[href*="/item/"]',
-            'a[href*="/p/"]',
-            'a[href*="/catalogue/"]',  # books.toscrape.com
-            '.product-link',
-            '.product-item a',
-            '.product-card a',
-            '[data-product-id] a',
-            'h3 a',  # books.toscrape.com book titles
-        ]
-        
-        for selector in selectors:
-            links = soup.select(selector)
-            for link in links:
-                href = link.get('href')
-                if href:
-                    full_url = urljoin(self.base_url, href)
-                    if url_pattern:
-                        if re.search(url_pattern, full_url):
-                            urls.append(full_url)
-                    else:
-                        urls.append(full_url)
-        
-        return urls
-    
-    def _find_next_page_url(self, soup: BeautifulSoup, current_url: str) -> Optional[str]:
+    def _extract_urls_from_page(self, doc: HtmlElement, page_url: str,
+                                url_pattern: Optional[Pattern] = None,
+                                seen: Optional[Set[str]] = None) -> List[str]:
+        """Extract product URLs from a single page, in one pass over its links.
+        
+        Args:
+            doc: Parsed listing page
+            page_url: URL of the page, to resolve links against
+            url_pattern: Compiled pattern product URLs must match
+            seen: Canonical URLs found on earlier pages, which are skipped;
+                those of the page's URLs are added to it
+            
+        Returns:
+            Product URLs new to seen, in page order, without fragment and
+            tracking parameters
+        """
+        return self.LISTING_LINKS.harvest(doc, page_url, url_pattern, seen)
+    
+    def _find_next_page_url(self, doc: HtmlElement, current_url: str) -> Optional[str]:
         """Find the URL of the next page."""
-        next_selectors = [
-            'a[rel="next"]',
-            'a:contains("Next")',
-            'a:contains(">")',
-            '.pagination .next a',
-            '.pager-next a',
-        ]
-        
-        for selector in next_selectors:
-            try:
-                next_link = soup.select_one(selector)
-                if next_link and next_link.get('href'):
-                    return urljoin(current_url, next_link.get('href'))
-            except:
-                continue
+        for selector in self.NEXT_PAGE_LINKS:
+            next_link = selector.select_one(doc)
+            if next_link is not None and next_link.get('href'):
+                return urljoin(current_url, next_link.get('href'))
         
         return None
-    
+
     def scrape_product(self, product_url: str) -> Optional[Product]:
         """Scrape a single product page.
         
@@ -207,40 +912,89 @@ class ProductScraper:
         Returns:
             Product instance or None if failed
         """
-        soup = self._fetch_page(product_url)
-        if not soup:
+        doc, not_modified = self._fetch(product_url, self._stream_parse_config(product_url))
+        if doc is None:
             return None
         
+        return self._build_product(doc, product_url, not_modified)
+    
+    def scrape_product_attempt(self, product_url: str) -> Optional[Product]:
+        """Make a single attempt at a product page, without waiting.
+        
+        Unlike scrape_product there is no rate limit wait and no retry: the
+        caller takes the token with try_acquire beforehand and reschedules
+        retryable failures itself.
+        
+        Args:
+            product_url: URL of the product page
+            
+        Returns:
+            Product instance, or None if the page held no product
+        
+        Raises:
+            FetchError: If the page could not be fetched
+        """
+        doc, not_modified = self._download(product_url, self._stream_parse_config(product_url))
+        if doc is None:
+            return None
+        
+        return self._build_product(doc, product_url, not_modified)
+    
+    def _build_product(self, doc: HtmlElement, product_url: str,
+                       not_modified: bool = False) -> Optional[Product]:
+        """Return the product on a fetched page.
+        
+        A page the server reported unchanged is not extracted again when
+        the product from the earlier run is still in the database.
+        """
+        if not_modified and self.db_manager:
+            product = self.db_manager.get_product_by_url(product_url)
+            if product:
+                with self._stats_lock:
+                    self._unchanged_products += 1
+                self.logger.debug(f"Unchanged product page, using stored product: {product_url}")
+                return product
+        
+        return self._parse_product(doc, product_url)
+    
+    def _parse_product(self, doc: HtmlElement, product_url: str) -> Optional[Product]:
+        """Build a Product from an already fetched product page.
+        
+        Fields found in the page's structured data are taken from there;
+        selectors only look for the others, and are not run at all when
+        the structured data has every field.
+        """
         try:
-            # Get site-specific configuration
-            site_config = get_site_config(product_url)
+            fields, sources = ({}, [])
+            if self.config.structured_data:
+                fields, sources = extract_structured(doc, product_url)
+            missing = [field for field in PRODUCT_FIELDS if field not in fields]
+            
+            if missing:
+                fields.update(self._select_fields(doc, product_url, missing))
             
-            # Extract product data using multiple strategies
-            name = self._extract_product_name(soup, site_config)
-            price = self._extract_product_price(soup, site_config)
-            description = self._extract_product_description(soup, site_config)
-            rating = self._extract_product_rating(soup, site_config)
-            reviews_count = self._extract_reviews_count(soup, site_config)
-            availability = self._extract_availability(soup, site_config)
-            brand = self._extract_brand(soup, site_config)
-            category = self._extract_category(soup, site_config)
-            image_urls = self._extract_image_urls(soup, product_url, site_config)
+            if sources:
+                with self._stats_lock:
+                    self._structured_stats['pages'] += 1
+                    self._structured_stats['complete'] += not missing
             
+            name = fields['name']
             if not name:
                 self.logger.warning(f"Could not extract product name from {product_url}")
                 return None
             
             product = Product(
                 name=name,
-                price=price,
+                price=fields['price'],
                 url=product_url,
-                description=description,
-                rating=rating,
-                reviews_count=reviews_count,
-                availability=availability,
-                brand=brand,
-                category=category,
-                image_urls=image_urls
+                description=fields['description'],
+                rating=fields['rating'],
+                reviews_count=fields['reviews_count'],
+                availability=fields['availability'],
+                brand=fields['brand'],
+                category=fields['category'],
+                image_urls=fields['images'],
+                metadata={'structured_data': sources} if sources else {}
             )
             
             self.logger.info(f"Successfully scraped product: {name}")
@@ -250,257 +1004,177 @@ class ProductScraper:
             self.logger.error(f"Error scraping product {product_url}: {e}")
             return None
     
-    def _extract_product_name(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> str:
+    def _select_fields(self, doc: HtmlElement, product_url: str,
+                       fields: List[str]) -> Dict[str, Any]:
+        """Extract some product fields with the site's selectors.
+        
+        Args:
+            doc: Parsed product page
+            product_url: URL of the page
+            fields: Fields to extract
+            
+        Returns:
+            Extracted value of each field, empty when not found
+        """
+        site_config = get_site_config(product_url)
+        learner = self.selector_learner if site_config is None else None
+        if learner:
+            domain = site_domain(product_url)
+            plan, learned = learner.plan_for(domain)
+        else:
+            plan, learned = selector_plans.get(site_config), False
+        
+        # Candidate elements for the fields, found in one pass over the page
+        matches = plan.subset(fields).match(doc)
+        values = self._extract_fields(matches, product_url, fields)
+        
+        # A field the learned selectors have found before is missing, or the
+        # name: check with all of them
+        rechecked = learned and any((plan.fields[field] or field == 'name')
+                                    and values[field] in (None, '', []) for field in fields)
+        if rechecked:
+            matches = learner.full_plan().subset(fields).match(doc)
+            values = self._extract_fields(matches, product_url, fields)
+        
+        if learner and ('name' not in values or values['name']):
+            learner.record(domain, {field: matches.hits(field) for field in fields
+                                    if values[field] not in (None, '', [])},
+                           learned and not rechecked, rechecked)
+        return values
+    
+    def _extract_fields(self, matches: PageMatches, product_url: str,
+                        fields: Collection[str] = PRODUCT_FIELDS) -> Dict[str, Any]:
+        """Extract product fields from a page's candidate elements."""
+        extractors = {
+            'name': self._extract_product_name,
+            'price': self._extract_product_price,
+            'description': self._extract_product_description,
+            'rating': self._extract_product_rating,
+            'reviews_count': self._extract_reviews_count,
+            'availability': self._extract_availability,
+            'brand': self._extract_brand,
+            'category': self._extract_category,
+            'images': lambda matches: self._extract_image_urls(matches, product_url),
+        }
+        return {field: extractors[field](matches) for field in fields}
+    
+    def _extract_product_name(self, matches: PageMatches) -> str:
         """Extract product name from page."""
-        selectors = [
-            'h1[data-product-name]',
-            'h1.product-title',
-            'h1.product-name',
-            '.product-title h1',
-            '.product-name h1',
-            'h1',
-            '[data-testid="product-name"]',
-            '.pdp-title',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('name'):
-            selectors.insert(0, site_config['name'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                if text and len(text) > 3:
-                    return text
+        for element in matches['name']:
+            text = element_text(element)
+            if text and len(text) > 3:
+                return text
         
         return ""
     
-    def _extract_product_price(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> Optional[float]:
+    def _extract_product_price(self, matches: PageMatches) -> Optional[float]:
         """Extract product price from page."""
-        selectors = [
-            '[data-testid="price"]',
-            '.price-current',
-            '.price-now',
-            '.product-price',
-            '.price',
-            '.current-price',
-            '.sale-price',
-            '[data-price]',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('price'):
-            selectors.insert(0, site_config['price'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                # Try data attribute first
-                price_attr = element.get('data-price')
-                if price_attr:
-                    try:
-                        return float(price_attr)
-                    except:
-                        pass
-                
-                # Extract from text
-                text = element.get_text(strip=True)
-                # Remove currency symbols and extract numbers
-                price_match = re.search(r'[\d,]+\.?\d*', text.replace(',', '').replace('£', '').replace('$', ''))
-                if price_match:
-                    try:
-                        return float(price_match.group())
-                    except:
-                        pass
+        for element in matches['price']:
+            # Try data attribute first
+            price_attr = element.get('data-price')
+            if price_attr:
+                try:
+                    return float(price_attr)
+                except:
+                    pass
+            
+            # Extract from text
+            text = element_text(element)
+            # Remove currency symbols and extract numbers
+            price_match = re.search(r'[\d,]+\.?\d*', text.replace(',', '').replace('£', '').replace('$', ''))
+            if price_match:
+                try:
+                    return float(price_match.group())
+                except:
+                    pass
         
         return None
     
-    def _extract_product_description(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> str:
+    def _extract_product_description(self, matches: PageMatches) -> str:
         """Extract product description from page."""
-        selectors = [
-            '[data-testid="product-description"]',
-            '.product-description',
-            '.product-details',
-            '.product-info',
-            '.description',
-            '.product-overview',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('description'):
-            selectors.insert(0, site_config['description'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                if text and len(text) > 10:
-                    return text[:1000]  # Limit description length
+        for element in matches['description']:
+            text = element_text(element)
+            if text and len(text) > 10:
+                return text[:1000]  # Limit description length
         
         return ""
     
-    def _extract_product_rating(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> Optional[float]:
+    def _extract_product_rating(self, matches: PageMatches) -> Optional[float]:
         """Extract product rating from page."""
-        selectors = [
-            '[data-testid="rating"]',
-            '.rating-value',
-            '.star-rating',
-            '.rating',
-            '.review-rating',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('rating'):
-            selectors.insert(0, site_config['rating'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                # Try data attribute
-                rating_attr = element.get('data-rating')
-                if rating_attr:
-                    try:
-                        return float(rating_attr)
-                    except:
-                        pass
-                
-                # Extract from text or class names
-                text = element.get_text(strip=True)
-                class_names = ' '.join(element.get('class', []))
-                
-                # Check for star rating class patterns (e.g., 'star-rating Three')
-                star_match = re.search(r'(One|Two|Three|Four|Five)', class_names)
-                if star_match:
-                    star_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
-                    return float(star_map.get(star_match.group(1), 0))
-                
-                # Extract from text
-                rating_match = re.search(r'(\d+\.?\d*)', text)
-                if rating_match:
-                    try:
-                        rating = float(rating_match.group(1))
-                        if 0 <= rating <= 5:
-                            return rating
-                    except:
-                        pass
+        for element in matches['rating']:
+            # Try data attribute
+            rating_attr = element.get('data-rating')
+            if rating_attr:
+                try:
+                    return float(rating_attr)
+                except:
+                    pass
+            
+            # Extract from text or class names
+            text = element_text(element)
+            class_names = element.get('class', '')
+            
+            # Check for star rating class patterns (e.g., 'star-rating Three')
+            star_match = re.search(r'(One|Two|Three|Four|Five)', class_names)
+            if star_match:
+                star_map = {'One': 1, 'Two': 2, 'Three': 3, 'Four': 4, 'Five': 5}
+                return float(star_map.get(star_match.group(1), 0))
+            
+            # Extract from text
+            rating_match = re.search(r'(\d+\.?\d*)', text)
+            if rating_match:
+                try:
+                    rating = float(rating_match.group(1))
+                    if 0 <= rating <= 5:
+                        return rating
+                except:
+                    pass
         
         return None
     
-    def _extract_reviews_count(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> Optional[int]:
+    def _extract_reviews_count(self, matches: PageMatches) -> Optional[int]:
         """Extract number of reviews from page."""
-        selectors = [
-            '[data-testid="reviews-count"]',
-            '.reviews-count',
-            '.review-count',
-            '.rating-count',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('reviews_count'):
-            selectors.insert(0, site_config['reviews_count'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                count_match = re.search(r'(\d+)', text.replace(',', ''))
-                if count_match:
-                    try:
-                        return int(count_match.group(1))
-                    except:
-                        pass
+        for element in matches['reviews_count']:
+            text = element_text(element)
+            count_match = re.search(r'(\d+)', text.replace(',', ''))
+            if count_match:
+                try:
+                    return int(count_match.group(1))
+                except:
+                    pass
         
         return None
     
-    def _extract_availability(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> str:
+    def _extract_availability(self, matches: PageMatches) -> str:
         """Extract product availability from page."""
-        selectors = [
-            '[data-testid="availability"]',
-            '.availability',
-            '.stock-status',
-            '.product-availability',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('availability'):
-            selectors.insert(0, site_config['availability'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                if text:
-                    return text
-        
-        return ""
+        return self._first_text(matches, 'availability')
     
-    def _extract_brand(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> str:
+    def _extract_brand(self, matches: PageMatches) -> str:
         """Extract product brand from page."""
-        selectors = [
-            '[data-testid="brand"]',
-            '.brand',
-            '.product-brand',
-            '.manufacturer',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('brand'):
-            selectors.insert(0, site_config['brand'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                if text:
-                    return text
-        
-        return ""
+        return self._first_text(matches, 'brand')
     
-    def _extract_category(self, soup: BeautifulSoup, site_config: Optional[Dict[str, str]] = None) -> str:
+    def _extract_category(self, matches: PageMatches) -> str:
         """Extract product category from page."""
-        selectors = [
-            '[data-testid="category"]',
-            '.breadcrumb',
-            '.category',
-            '.product-category',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('category'):
-            selectors.insert(0, site_config['category'])
-        
-        for selector in selectors:
-            element = soup.select_one(selector)
-            if element:
-                text = element.get_text(strip=True)
-                if text:
-                    return text
+        return self._first_text(matches, 'category')
+    
+    def _first_text(self, matches: PageMatches, field: str) -> str:
+        """Text of the first match of a field's selectors that has any."""
+        for element in matches[field]:
+            text = element_text(element)
+            if text:
+                return text
         
         return ""
     
-    def _extract_image_urls(self, soup: BeautifulSoup, base_url: str, site_config: Optional[Dict[str, str]] = None) -> List[str]:
+    def _extract_image_urls(self, matches: PageMatches, base_url: str) -> List[str]:
         """Extract product image URLs from page."""
         image_urls = []
         
-        selectors = [
-            '.product-image img',
-            '.product-photos img',
-            '.product-gallery img',
-            '[data-testid="product-image"] img',
-        ]
-        
-        # Use site-specific selector if available
-        if site_config and site_config.get('images'):
-            selectors.insert(0, site_config['images'])
-        
-        for selector in selectors:
-            images = soup.select(selector)
-            for img in images:
-                src = img.get('src') or img.get('data-src')
-                if src:
-                    full_url = urljoin(base_url, src)
-                    if full_url not in image_urls:
-                        image_urls.append(full_url)
-        
-        return image_urls[:10]  # Limit to 10 images
\ No newline at end of file
+        for img in matches['images']:
+            src = img.get('src') or img.get('data-src')
+            if src:
+                full_url = urljoin(base_url, src)
+                if full_url not in image_urls:
+                    image_urls.append(full_url)
+        
+        return image_urls[:10]  # Limit to 10 images
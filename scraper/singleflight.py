@@ -0,0 +1,83 @@
+"""
+Coalescing of concurrent identical calls (singleflight).
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    """One in-flight call and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers that arrive
+    while it is running wait for it and receive the same result, or the
+    same exception. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'coalesced': 0}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Whether a call for the key is running right now."""
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Run func, or wait for the running call with the same key.
+
+        Args:
+            key: Identifies calls that produce the same result
+            func: Function to call
+            *args, **kwargs: Passed on to func
+
+        Returns:
+            The result of func, possibly computed for another caller
+        """
+        with self._lock:
+            self._counters['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._counters['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of calls and how many of them shared another call's result."""
+        with self._lock:
+            return dict(self._counters)
+
+
+# Page downloads shared by every scraper in the process, so worker threads
+# and concurrent web app jobs fetch a URL only once at a time
+page_flights = SingleFlight()
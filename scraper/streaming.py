@@ -0,0 +1,80 @@
+"""
+Incremental parsing of product pages while they download.
+"""
+
+import logging
+from typing import Dict, Optional
+
+from lxml import etree
+from cssselect import HTMLTranslator, SelectorError
+
+
+# Product fields a site configuration may give selectors for
+PRODUCT_FIELDS = ('name', 'price', 'description', 'rating', 'reviews_count',
+                  'availability', 'brand', 'category', 'images')
+
+# Fields whose selector matches several elements (all of them are extracted)
+LIST_FIELDS = {'images'}
+
+
+class FieldWatcher:
+    """Feed an HTML body to lxml chunk by chunk and report when every
+    configured field has been seen.
+
+    A field counts as seen once the first element its selector matches is
+    complete, i.e. some element follows it in the document; for list
+    fields the matched element's parent must be complete, so sibling
+    matches are in as well.
+    """
+
+    def __init__(self, site_config: Dict[str, str]):
+        """Initialize the watcher.
+
+        Args:
+            site_config: Site selectors keyed by field name; empty selectors
+                are ignored
+        """
+        self.logger = logging.getLogger(__name__)
+        self._parser = etree.HTMLPullParser(events=('start',))
+        self._root = None
+        self._pending: Dict[str, Optional[etree.XPath]] = {}
+
+        translator = HTMLTranslator()
+        for field in PRODUCT_FIELDS:
+            selector = site_config.get(field)
+            if not selector:
+                continue
+
+            complete = '[../following::*]' if field in LIST_FIELDS else '[following::*]'
+            try:
+                self._pending[field] = etree.XPath(
+                    f'({translator.css_to_xpath(selector)})[1]{complete}')
+            except (SelectorError, etree.XPathError) as e:
+                # Cannot be watched, so the whole body is always read
+                self.logger.debug(f"Cannot watch selector {selector!r} for {field}: {e}")
+                self._pending[field] = None
+
+    @property
+    def pending(self) -> list:
+        """Fields not seen yet."""
+        return list(self._pending)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse the next chunk of the body.
+
+        Returns:
+            True once every watched field has been seen
+        """
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if self._root is None:
+                self._root = element.getroottree().getroot()
+
+        if self._root is None:
+            return False
+
+        for field, xpath in list(self._pending.items()):
+            if xpath is not None and xpath(self._root):
+                del self._pending[field]
+
+        return not self._pending
@@ -0,0 +1,377 @@
+"""
+Product data embedded in pages as structured data: JSON-LD, microdata,
+hydration state JSON and OpenGraph tags.
+"""
+
+import re
+import json
+import html
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from lxml import etree
+
+
+# Sources in the order their values are preferred
+SOURCES = ('json-ld', 'microdata', 'embedded-state', 'opengraph')
+
+# Product scopes marked up with schema.org microdata
+_MICRODATA_PRODUCTS = etree.XPath(
+    "//*[@itemscope][contains(@itemtype, 'schema.org/Product')]", smart_strings=False)
+
+# Hydration state assigned to a window global, e.g. window.__INITIAL_STATE__ = {...}
+_STATE_ASSIGNMENT = re.compile(r'window\.(__[A-Z][A-Z0-9_]*__)\s*=\s*')
+
+# Availability terms of schema.org and OpenGraph, by their letters in lower case
+_AVAILABILITY = {
+    'instock': 'In stock',
+    'outofstock': 'Out of stock',
+    'oos': 'Out of stock',
+    'soldout': 'Sold out',
+    'preorder': 'Pre-order',
+    'presale': 'Presale',
+    'backorder': 'Backorder',
+    'discontinued': 'Discontinued',
+    'limitedavailability': 'Limited availability',
+    'onlineonly': 'Online only',
+    'instoreonly': 'In store only',
+}
+
+# Keys a product object in hydration state may use for each field
+_STATE_KEYS = {
+    'name': ('name', 'title', 'productName'),
+    'price': ('price', 'salePrice', 'currentPrice', 'finalPrice', 'offers'),
+    'description': ('description',),
+    'rating': ('aggregateRating', 'rating', 'averageRating', 'ratingValue'),
+    'reviews_count': ('reviewCount', 'reviewsCount', 'numReviews', 'totalReviews', 'ratingCount'),
+    'availability': ('availability', 'stockStatus', 'availabilityStatus', 'inStock', 'isInStock'),
+    'brand': ('brand', 'brandName', 'manufacturer'),
+    'images': ('images', 'imageUrls', 'image'),
+}
+
+# JSON nodes looked at when searching hydration state for a product
+_MAX_STATE_NODES = 20000
+
+
+def extract_structured(root: etree._Element, base_url: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Product fields from the structured data embedded in a page.
+
+    Scripts and meta tags are found in one pass over the page, microdata
+    with one XPath query; no CSS selectors are evaluated. For each field
+    the first source that has it wins, in the order of SOURCES.
+
+    Args:
+        root: Parsed page
+        base_url: URL of the page, to resolve image URLs against
+
+    Returns:
+        The fields found, keyed like the product fields of a site
+        configuration and only when non-empty, and the sources they came from
+    """
+    items: Dict[str, List[Dict[str, Any]]] = {source: [] for source in SOURCES}
+    meta: Dict[str, List[str]] = {}
+
+    for element in root.iter('script', 'meta'):
+        if element.tag == 'meta':
+            key = (element.get('property') or element.get('name') or '').strip().lower()
+            content = element.get('content')
+            if content and (key.startswith('og:') or key.startswith('product:')):
+                meta.setdefault(key, []).append(content.strip())
+            continue
+
+        script_type = (element.get('type') or '').strip().lower()
+        text = element.text or ''
+        if script_type == 'application/ld+json':
+            data = _loads(text)
+            product = _first_product(data) if data is not None else None
+            if product is not None and not items['json-ld']:
+                items['json-ld'].append(product)
+        elif element.get('id') == '__NEXT_DATA__':
+            data = _loads(text)
+            if data is not None:
+                items['embedded-state'].append(data)
+        elif '__' in text:
+            for match in _STATE_ASSIGNMENT.finditer(text):
+                try:
+                    data, _ = json.JSONDecoder(strict=False).raw_decode(text, match.end())
+                except ValueError:
+                    continue
+                items['embedded-state'].append(data)
+
+    for scope in _MICRODATA_PRODUCTS(root)[:1]:
+        items['microdata'].append(_microdata_item(scope))
+
+    candidates = {
+        'json-ld': [_schema_fields(item, base_url) for item in items['json-ld']],
+        'microdata': [_schema_fields(item, base_url) for item in items['microdata']],
+        'embedded-state': [_state_fields(data, base_url) for data in items['embedded-state']],
+        'opengraph': [_opengraph_fields(meta, base_url)] if meta else [],
+    }
+
+    fields: Dict[str, Any] = {}
+    sources: List[str] = []
+    for source in SOURCES:
+        for found in candidates[source]:
+            for field, value in found.items():
+                if field not in fields and value not in (None, '', []):
+                    fields[field] = value
+                    if source not in sources:
+                        sources.append(source)
+    return fields, sources
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON from a script, or return None."""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return None
+
+
+def _is_product(node: Dict[str, Any]) -> bool:
+    """Whether a JSON-LD node is typed as a schema.org product."""
+    types = node.get('@type')
+    for node_type in types if isinstance(types, list) else [types]:
+        if isinstance(node_type, str) and node_type.rsplit('/', 1)[-1].rsplit(':', 1)[-1] in (
+                'Product', 'ProductGroup', 'ProductModel', 'IndividualProduct'):
+            return True
+    return False
+
+
+def _walk(data: Any, limit: int = _MAX_STATE_NODES) -> Iterator[Dict[str, Any]]:
+    """Yield the objects in parsed JSON, breadth first, shallowest first."""
+    queue = deque([data])
+    seen = 0
+    while queue and seen < limit:
+        node = queue.popleft()
+        seen += 1
+        if isinstance(node, dict):
+            yield node
+            queue.extend(value for value in node.values() if isinstance(value, (dict, list)))
+        elif isinstance(node, list):
+            queue.extend(value for value in node if isinstance(value, (dict, list)))
+
+
+def _first_product(data: Any) -> Optional[Dict[str, Any]]:
+    """The shallowest schema.org product in parsed JSON, if any."""
+    for node in _walk(data):
+        if _is_product(node):
+            return node
+    return None
+
+
+def _microdata_item(scope: etree._Element) -> Dict[str, Any]:
+    """Properties of a microdata item, with nested items as dicts.
+
+    A property given several times becomes a list.
+    """
+    item: Dict[str, Any] = {}
+
+    def collect(element: etree._Element) -> None:
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue
+            names = child.get('itemprop')
+            nested = child.get('itemscope') is not None
+            if names:
+                value = _microdata_item(child) if nested else _microdata_value(child)
+                for name in names.split():
+                    if name not in item:
+                        item[name] = value
+                    elif isinstance(item[name], list):
+                        item[name].append(value)
+                    else:
+                        item[name] = [item[name], value]
+            if not nested:
+                collect(child)
+
+    collect(scope)
+    return item
+
+
+def _microdata_value(element: etree._Element) -> str:
+    """Value of a microdata property element."""
+    if element.get('content') is not None:
+        return element.get('content').strip()
+    tag = element.tag
+    if tag in ('img', 'audio', 'video', 'source', 'embed', 'iframe'):
+        return element.get('src', '')
+    if tag in ('a', 'link', 'area'):
+        return element.get('href', '')
+    if tag == 'object':
+        return element.get('data', '')
+    if tag in ('data', 'meter'):
+        return element.get('value', '')
+    if tag == 'time' and element.get('datetime'):
+        return element.get('datetime')
+    return ' '.join(''.join(element.itertext()).split())
+
+
+def _first(value: Any) -> Any:
+    """The first item of a list, or the value itself."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _text(value: Any) -> str:
+    """A string field value; names of objects such as brands are used."""
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('@value')
+        value = _first(value)
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return html.unescape(str(value)).strip()
+    return ''
+
+
+def _number(value: Any) -> Optional[float]:
+    """A number from a JSON number or a price-like string."""
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get('value', value.get('amount', value.get('@value')))
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'\d+\.?\d*', str(value).replace(',', ''))
+    return float(match.group()) if match else None
+
+
+def _integer(value: Any) -> Optional[int]:
+    """A whole number, e.g. a review count."""
+    number = _number(value)
+    return int(number) if number is not None else None
+
+
+def _availability(value: Any) -> str:
+    """Availability as text, from a schema.org URL, an OpenGraph term or a flag."""
+    value = _first(value)
+    if isinstance(value, bool):
+        return 'In stock' if value else 'Out of stock'
+    text = _text(value)
+    term = text.rstrip('/').rsplit('/', 1)[-1]
+    return _AVAILABILITY.get(re.sub(r'[^a-z]', '', term.lower()), text)
+
+
+def _rating(value: Any) -> Optional[float]:
+    """A rating on a 0-5 scale, from a number or an AggregateRating object."""
+    value = _first(value)
+    best = None
+    if isinstance(value, dict):
+        best = _number(value.get('bestRating'))
+        value = value.get('ratingValue', value.get('average', value.get('value')))
+    rating = _number(value)
+    if rating is None:
+        return None
+    if best and best != 5:
+        rating = round(rating * 5 / best, 2)
+    return rating if 0 <= rating <= 5 else None
+
+
+def _images(value: Any, base_url: str) -> List[str]:
+    """Absolute image URLs from strings or ImageObjects, without duplicates."""
+    urls: List[str] = []
+    for image in value if isinstance(value, list) else [value]:
+        if isinstance(image, dict):
+            image = image.get('url') or image.get('contentUrl') or image.get('src')
+            image = _first(image)
+        if isinstance(image, str) and image.strip():
+            url = urljoin(base_url, image.strip())
+            if url not in urls:
+                urls.append(url)
+    return urls[:10]
+
+
+def _offer_price(offers: Any) -> Optional[float]:
+    """The price of the first offer that has one."""
+    for offer in offers if isinstance(offers, list) else [offers]:
+        if not isinstance(offer, dict):
+            price = _number(offer)
+        else:
+            price = _number(offer.get('price', offer.get('lowPrice')))
+            if price is None:
+                price = _number(_first(offer.get('priceSpecification')) or {})
+        if price is not None:
+            return price
+    return None
+
+
+def _schema_fields(item: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    """Product fields from a schema.org Product, from JSON-LD or microdata."""
+    offers = item.get('offers')
+    if offers is None and isinstance(item.get('hasVariant'), list) and item['hasVariant']:
+        offers = _first(item['hasVariant']).get('offers') if isinstance(
+            _first(item['hasVariant']), dict) else None
+    first_offer = _first(offers) if offers is not None else None
+    aggregate = _first(item.get('aggregateRating'))
+
+    category = _first(item.get('category'))
+    return {
+        'name': _text(item.get('name')),
+        'price': _offer_price(offers) if offers is not None else None,
+        'description': _text(item.get('description'))[:1000],
+        'rating': _rating(aggregate) if aggregate is not None else None,
+        'reviews_count': (_integer(aggregate.get('reviewCount', aggregate.get('ratingCount')))
+                          if isinstance(aggregate, dict) else None),
+        'availability': (_availability(first_offer.get('availability'))
+                         if isinstance(first_offer, dict) else ''),
+        'brand': _text(item.get('brand')),
+        'category': _text(category) if isinstance(category, str) else '',
+        'images': _images(item.get('image'), base_url),
+    }
+
+
+def _state_fields(data: Any, base_url: str) -> Dict[str, Any]:
+    """Product fields from hydration state JSON.
+
+    A schema.org product in the state is used if there is one; otherwise
+    the shallowest object with both a name and a price.
+    """
+    product = _first_product(data)
+    if product is not None:
+        return _schema_fields(product, base_url)
+
+    for node in _walk(data):
+        name = next((node[key] for key in _STATE_KEYS['name'] if isinstance(node.get(key), str)), None)
+        price_key = next((key for key in _STATE_KEYS['price'] if key in node), None)
+        if not name or price_key is None:
+            continue
+
+        def pick(field: str) -> Any:
+            return next((node[key] for key in _STATE_KEYS[field] if node.get(key) is not None), None)
+
+        price = (_offer_price(node[price_key]) if price_key == 'offers'
+                 else _number(node[price_key]))
+        rating = pick('rating')
+        return {
+            'name': html.unescape(name).strip(),
+            'price': price,
+            'description': _text(pick('description'))[:1000],
+            'rating': _rating(rating) if rating is not None else None,
+            'reviews_count': _integer(pick('reviews_count')),
+            'availability': _availability(pick('availability')),
+            'brand': _text(pick('brand')),
+            'images': _images(pick('images'), base_url),
+        }
+    return {}
+
+
+def _opengraph_fields(meta: Dict[str, List[str]], base_url: str) -> Dict[str, Any]:
+    """Product fields from OpenGraph tags, on pages typed or priced as products."""
+    def tag(*keys: str) -> str:
+        return next((meta[key][0] for key in keys if key in meta), '')
+
+    price = tag('product:price:amount', 'og:price:amount', 'product:sale_price:amount')
+    if not (tag('og:type').lower().startswith('product') or price):
+        return {}
+
+    return {
+        'name': html.unescape(tag('og:title')).strip(),
+        'price': _number(price),
+        'description': html.unescape(tag('og:description')).strip()[:1000],
+        'availability': _availability(tag('product:availability', 'og:availability')),
+        'brand': html.unescape(tag('product:brand', 'og:brand')).strip(),
+        'images': _images(meta.get('og:image', []) + meta.get('og:image:url', []), base_url),
+    }
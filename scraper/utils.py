@@ -5,14 +5,17 @@ Utility functions for rate limiting and retry logic.
 import time
 import random
 import logging
-from typing import Callable, Any, Optional
-from functools import wraps
+import sqlite3
+import threading
+from typing import Callable, Any, Optional, Dict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote_plus
 from dataclasses import dataclass
 
 
 @dataclass
 class RateLimiter:
-    """Rate limiter to control request frequency."""
+    """Token bucket rate limiter to control request frequency."""
     
     requests_per_second: float = 1.0
     burst_size: int = 5
@@ -21,119 +24,747 @@ class RateLimiter:
         self.last_request_time = 0.0
         self.tokens = self.burst_size
         self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update. Caller holds the lock."""
+        current_time = time.monotonic()
+        time_passed = current_time - self.last_request_time
+        self.tokens = min(self.burst_size,
+                          self.tokens + time_passed * self.requests_per_second)
+        self.last_request_time = current_time
     
     def wait_if_needed(self) -> None:
-        """Wait if rate limit would be exceeded."""
-        current_time = time.time()
+        """Wait if rate limit would be exceeded.
         
-        # Add tokens based on time passed
-        time_passed = current_time - self.last_request_time
-        self.tokens = min(self.burst_size, 
-                         self.tokens + time_passed * self.requests_per_second)
+        Safe to call from several threads: each caller reserves its token
+        under the lock (letting the balance go negative) and then sleeps
+        outside it until the reservation is covered. Waiters are therefore
+        served in the order they reserved, without polling.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            wait_time = -self.tokens / self.requests_per_second if self.tokens < 0 else 0.0
         
-        if self.tokens < 1:
-            wait_time = (1 - self.tokens) / self.requests_per_second
+        if wait_time > 0:
             self.logger.debug(f"Rate limiting: waiting {wait_time:.2f} seconds")
             time.sleep(wait_time)
-            self.tokens = 0
-        else:
-            self.tokens -= 1
+    
+    def try_acquire(self) -> float:
+        """Take a token only if one is available now, never sleeping.
         
-        self.last_request_time = time.time()
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be available
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.requests_per_second
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back further requests for at least the given time."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.requests_per_second)
+    
+    def set_rate(self, requests_per_second: float) -> None:
+        """Change the rate; tokens earned so far are credited at the old rate."""
+        with self._lock:
+            self._refill()
+            self.requests_per_second = requests_per_second
 
 
-def retry_on_failure(max_retries: int = 3, 
-                    backoff_factor: float = 2.0,
-                    exceptions: tuple = (Exception,),
-                    jitter: bool = True) -> Callable:
-    """Decorator for retrying failed operations.
+class SQLiteBucketStore:
+    """Token bucket state kept in a SQLite file shared between processes.
+    
+    Each bucket update is one short IMMEDIATE transaction, so CLI runs and
+    the web app on the same machine draw from a single budget per host.
+    """
+    
+    def __init__(self, db_path: str):
+        """Initialize the store.
+        
+        Args:
+            db_path: Path to the SQLite file holding the buckets
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                host TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def take(self, host: str, requests_per_second: float, burst_size: int) -> float:
+        """Reserve one token for a host.
+        
+        Returns:
+            Seconds the caller must wait before its request may go out
+        """
+        tokens = self._update(host, requests_per_second, burst_size,
+                              lambda tokens: tokens - 1)
+        return -tokens / requests_per_second if tokens < 0 else 0.0
+    
+    def try_take(self, host: str, requests_per_second: float, burst_size: int) -> float:
+        """Take one token for a host only if one is available now.
+        
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be available
+        """
+        taken = []
+        
+        def update(tokens: float) -> float:
+            if tokens >= 1:
+                taken.append(True)
+                return tokens - 1
+            return tokens
+        
+        tokens = self._update(host, requests_per_second, burst_size, update)
+        return 0.0 if taken else (1 - tokens) / requests_per_second
+    
+    def pause(self, host: str, seconds: float, requests_per_second: float,
+              burst_size: int) -> None:
+        """Hold back requests to a host for at least the given time."""
+        self._update(host, requests_per_second, burst_size,
+                     lambda tokens: min(tokens, -seconds * requests_per_second))
+    
+    def refill(self, host: str, requests_per_second: float, burst_size: int) -> None:
+        """Credit a host's bucket with the tokens earned so far, e.g. before a rate change."""
+        self._update(host, requests_per_second, burst_size, lambda tokens: tokens)
+    
+    def _update(self, host: str, requests_per_second: float, burst_size: int,
+                update: Callable[[float], float]) -> float:
+        """Refill a host's bucket, apply update to it and store the result."""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_buckets WHERE host = ?', (host,)
+            ).fetchone()
+            
+            # Wall clock time, since it has to be comparable across processes
+            current_time = time.time()
+            if row is None:
+                tokens = burst_size
+            else:
+                time_passed = max(0.0, current_time - row[1])
+                tokens = min(burst_size, row[0] + time_passed * requests_per_second)
+            tokens = update(tokens)
+            
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_buckets (host, tokens, updated_at) VALUES (?, ?, ?)',
+                (host, tokens, current_time)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        return tokens
+
+
+class SQLiteRateLimiter:
+    """Rate limiter for one host backed by a SQLiteBucketStore."""
+    
+    def __init__(self, store: SQLiteBucketStore, host: str,
+                 requests_per_second: float = 1.0, burst_size: int = 5):
+        self.store = store
+        self.host = host
+        self.requests_per_second = requests_per_second
+        self.burst_size = burst_size
+        self.logger = logging.getLogger(__name__)
+    
+    def wait_if_needed(self) -> None:
+        """Wait if the shared rate limit would be exceeded."""
+        wait_time = self.store.take(self.host, self.requests_per_second, self.burst_size)
+        if wait_time > 0:
+            self.logger.debug(f"Rate limiting {self.host}: waiting {wait_time:.2f} seconds")
+            time.sleep(wait_time)
+    
+    def try_acquire(self) -> float:
+        """Take a token only if one is available now, never sleeping.
+        
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be available
+        """
+        return self.store.try_take(self.host, self.requests_per_second, self.burst_size)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back further requests to the host for at least the given time."""
+        self.store.pause(self.host, seconds, self.requests_per_second, self.burst_size)
+    
+    def set_rate(self, requests_per_second: float) -> None:
+        """Change the rate; tokens earned so far are credited at the old rate."""
+        self.store.refill(self.host, self.requests_per_second, self.burst_size)
+        self.requests_per_second = requests_per_second
+
+
+class RateLimiterRegistry:
+    """Process-wide registry of token buckets keyed by host.
+    
+    Every scraper in the process shares the bucket for a host, so scrapers
+    aimed at the same site respect one budget while different sites are
+    throttled independently.
+    """
+    
+    def __init__(self, factory: Optional[Callable[[str, float, int], Any]] = None):
+        """Initialize the registry.
+        
+        Args:
+            factory: Builds the limiter for a host from (host, requests_per_second,
+                burst_size); defaults to an in-memory RateLimiter
+        """
+        self._factory = factory or (lambda host, rate, burst: RateLimiter(rate, burst))
+        self._limiters: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, host: str, requests_per_second: float = 1.0,
+            burst_size: int = 5) -> Any:
+        """Return the bucket for a host, creating it on first use.
+        
+        Args:
+            host: Host (netloc) the requests go to
+            requests_per_second: Refill rate for a newly created bucket
+            burst_size: Capacity for a newly created bucket
+        
+        Returns:
+            The host's rate limiter; settings of an existing bucket are kept
+        """
+        host = host.lower()
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._factory(host, requests_per_second, burst_size)
+                self._limiters[host] = limiter
+            return limiter
+    
+    def rates(self) -> Dict[str, float]:
+        """Return the current requests per second of every bucket."""
+        with self._lock:
+            return {host: limiter.requests_per_second
+                    for host, limiter in self._limiters.items()}
+    
+    def clear(self) -> None:
+        """Forget all buckets."""
+        with self._lock:
+            self._limiters.clear()
+
+
+# Shared by every scraper in the process
+host_rate_limiters = RateLimiterRegistry()
+
+_shared_registries: Dict[str, RateLimiterRegistry] = {}
+_shared_registries_lock = threading.Lock()
+
+
+def get_rate_limiter_registry(backend: str = "memory",
+                              db_path: Optional[str] = None) -> RateLimiterRegistry:
+    """Return the per-host rate limiter registry for a backend.
     
     Args:
-        max_retries: Maximum number of retry attempts
-        backoff_factor: Exponential backoff multiplier
-        exceptions: Tuple of exceptions to catch and retry
-        jitter: Whether to add random jitter to backoff
+        backend: "memory" for buckets private to this process, or "sqlite"
+            for buckets shared with other processes through db_path
+        db_path: SQLite file holding shared buckets
     
     Returns:
-        Decorated function with retry logic
+        Registry shared by every caller asking for the same backend
+    """
+    if backend == "memory":
+        return host_rate_limiters
+    if backend != "sqlite":
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    if not db_path:
+        raise ValueError("The sqlite rate limit backend needs a database path")
+    
+    with _shared_registries_lock:
+        registry = _shared_registries.get(db_path)
+        if registry is None:
+            store = SQLiteBucketStore(db_path)
+            registry = RateLimiterRegistry(
+                lambda host, rate, burst: SQLiteRateLimiter(store, host, rate, burst)
+            )
+            _shared_registries[db_path] = registry
+        return registry
+
+
+class RetryPolicy:
+    """Single retry policy for page fetches.
+    
+    Combines a per-request attempt cap, a run-wide retry budget (retries
+    may add at most budget_ratio extra requests, plus a small floor),
+    Retry-After honoring and jittered exponential backoff.
+    """
+    
+    RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+    
+    def __init__(self, max_retries: int = 3,
+                 backoff_factor: float = 2.0,
+                 budget_ratio: float = 0.1,
+                 min_budget: int = 10,
+                 max_backoff: float = 60.0):
+        """Initialize the retry policy.
+        
+        Args:
+            max_retries: Maximum retries for a single request
+            backoff_factor: Exponential backoff multiplier
+            budget_ratio: Retries allowed as a fraction of first attempts
+            min_budget: Retries always allowed, so small runs can retry at all
+            max_backoff: Upper bound on any single wait, including Retry-After
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.budget_ratio = budget_ratio
+        self.min_budget = min_budget
+        self.max_backoff = max_backoff
+        self.requests = 0
+        self.retries = 0
+        self.budget_exhausted = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def record_request(self) -> None:
+        """Count a first attempt, which earns retry budget."""
+        with self._lock:
+            self.requests += 1
+    
+    def should_retry(self, attempt: int) -> bool:
+        """Decide whether a failed request gets another attempt.
+        
+        Args:
+            attempt: Number of retries already made for this request
+        
+        Returns:
+            True if the retry is allowed; it is then charged to the budget
+        """
+        if attempt >= self.max_retries:
+            return False
+        
+        with self._lock:
+            if self.retries + 1 > self.min_budget + self.budget_ratio * self.requests:
+                self.budget_exhausted += 1
+                return False
+            self.retries += 1
+            return True
+    
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the given retry.
+        
+        Args:
+            attempt: Number of retries already made for this request
+            retry_after: Delay requested by the server, which takes precedence
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        
+        backoff_time = min(self.backoff_factor ** attempt, self.max_backoff)
+        return backoff_time * (0.5 + random.random() * 0.5)
+    
+    def stats(self) -> Dict[str, int]:
+        """Counters for stats displays."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'budget_exhausted': self.budget_exhausted,
+            }
+    
+    @classmethod
+    def from_config(cls, config) -> 'RetryPolicy':
+        """Create a policy from a ScraperConfig."""
+        return cls(max_retries=config.max_retries,
+                   backoff_factor=config.backoff_factor,
+                   budget_ratio=config.retry_budget_ratio)
+
+
+class CrawlBudget:
+    """Time, request and byte limits for one scrape run.
+    
+    The clock starts with the first request. Requests are charged before
+    they are sent, so the request limit is never exceeded; bytes are
+    charged as bodies arrive, so downloads already under way may take the
+    total somewhat past the byte limit. A limit of 0 means no limit.
+    """
+    
+    def __init__(self, max_seconds: float = 0.0, max_requests: int = 0, max_bytes: int = 0):
+        """Initialize the budget.
+        
+        Args:
+            max_seconds: Seconds the run may take from its first request
+            max_requests: Requests the run may send
+            max_bytes: Response body bytes the run may download
+        """
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.requests = 0
+        self.bytes = 0
+        self._started: Optional[float] = None
+        self._exhausted: Optional[str] = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def _check(self) -> Optional[str]:
+        """Name of the first limit reached, with the lock held."""
+        if self._exhausted is None:
+            if self.max_seconds and self._started is not None \
+                    and time.monotonic() - self._started >= self.max_seconds:
+                self._exhausted = 'time'
+            elif self.max_requests and self.requests >= self.max_requests:
+                self._exhausted = 'requests'
+            elif self.max_bytes and self.bytes >= self.max_bytes:
+                self._exhausted = 'bytes'
+            if self._exhausted:
+                self.logger.warning(f"Crawl budget reached: {self.describe(self._exhausted)}")
+        return self._exhausted
+    
+    def exhausted(self) -> Optional[str]:
+        """Return 'time', 'requests' or 'bytes' once that limit is reached, else None."""
+        with self._lock:
+            return self._check()
+    
+    def charge_request(self) -> Optional[str]:
+        """Charge a request about to be sent.
+        
+        Returns:
+            None if the request may go out, otherwise the limit that stops it
+        """
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+            exhausted = self._check()
+            if exhausted is None:
+                self.requests += 1
+            return exhausted
+    
+    def charge_bytes(self, amount: int) -> None:
+        """Charge downloaded body bytes."""
+        with self._lock:
+            self.bytes += amount
+    
+    def describe(self, budget: str) -> str:
+        """Human-readable description of one of the limits."""
+        if budget == 'time':
+            return f"time budget of {self.max_seconds:g}s"
+        if budget == 'requests':
+            return f"request budget of {self.max_requests} requests"
+        return f"byte budget of {self.max_bytes} bytes"
+    
+    def stats(self) -> Dict[str, Any]:
+        """Usage and limits for stats displays."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+            return {
+                'seconds': round(elapsed, 1),
+                'requests': self.requests,
+                'bytes': self.bytes,
+                'max_seconds': self.max_seconds,
+                'max_requests': self.max_requests,
+                'max_bytes': self.max_bytes,
+                'exhausted': self._check(),
+            }
+    
+    @classmethod
+    def from_config(cls, config) -> 'CrawlBudget':
+        """Create a budget from a ScraperConfig."""
+        return cls(max_seconds=config.time_budget,
+                   max_requests=config.request_budget,
+                   max_bytes=config.byte_budget)
+
+
+def parse_duration(value: str) -> float:
+    """Parse a duration such as "90", "45s", "20m" or "1.5h" into seconds.
+    
+    Raises:
+        ValueError: If the value is not a duration
+    """
+    value = value.strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as "500000", "200KB", "50MB" or "2GB" into bytes.
+    
+    Raises:
+        ValueError: If the value is not a size
+    """
+    value = value.strip().upper()
+    for suffix in ('B', 'I'):
+        if value.endswith(suffix):
+            value = value[:-1]
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+class CircuitOpenError(Exception):
+    """A circuit breaker rejected a call without making it."""
+    
+    def __init__(self, message: str, retry_after: float = 0.0):
+        """Initialize the error.
+        
+        Args:
+            message: Description of the rejection
+            retry_after: Seconds until the breaker may admit a call again
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CallNotMade(Exception):
+    """A call guarded by a circuit breaker gave up before contacting the host.
+    
+    The breaker counts it as neither a success nor a failure.
     """
-    def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> Any:
-            logger = logging.getLogger(__name__)
-            
-            for attempt in range(max_retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except exceptions as e:
-                    if attempt == max_retries:
-                        logger.error(f"Failed after {max_retries} retries: {e}")
-                        raise
-                    
-                    # Calculate backoff time
-                    backoff_time = backoff_factor ** attempt
-                    if jitter:
-                        backoff_time *= (0.5 + random.random() * 0.5)
-                    
-                    logger.warning(f"Attempt {attempt + 1} failed: {e}. "
-                                 f"Retrying in {backoff_time:.2f} seconds...")
-                    time.sleep(backoff_time)
-            
-            return None
-        return wrapper
-    return decorator
 
 
 class CircuitBreaker:
     """Circuit breaker pattern for handling failures."""
     
+    # How long callers are told to wait while the half-open probes are taken
+    PROBE_WAIT = 1.0
+    
     def __init__(self, failure_threshold: int = 5, 
-                 recovery_timeout: int = 60):
+                 recovery_timeout: int = 60,
+                 half_open_max_calls: int = 1,
+                 name: str = "circuit"):
         """Initialize circuit breaker.
         
         Args:
             failure_threshold: Number of failures before opening circuit
             recovery_timeout: Time in seconds before attempting recovery
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+            name: Label used in log messages, usually the host
         """
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.name = name
         self.failure_count = 0
-        self.last_failure_time = 0
+        self.last_failure_time = 0.0
         self.state = "closed"  # closed, open, half-open
         self.logger = logging.getLogger(__name__)
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+    
+    def retry_after(self) -> float:
+        """Seconds until a call would be admitted, 0 if it would be now."""
+        with self._lock:
+            if self.state == "open":
+                return max(0.0, self.last_failure_time + self.recovery_timeout - time.monotonic())
+            if self.state == "half-open" and self._probes_in_flight >= self.half_open_max_calls:
+                return self.PROBE_WAIT
+            return 0.0
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
-        """Call function with circuit breaker protection."""
-        if self.state == "open":
-            if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = "half-open"
-                self.logger.info("Circuit breaker transitioning to half-open")
-            else:
-                raise Exception("Circuit breaker is open")
+        """Call function with circuit breaker protection.
+        
+        State transitions happen under a lock; the wrapped call itself runs
+        outside it so concurrent callers are not serialized.
         
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all
+                probe slots taken
+        """
+        probe = self._admit()
         try:
             result = func(*args, **kwargs)
-            self._on_success()
-            return result
-        except Exception as e:
-            self._on_failure()
+        except CallNotMade:
+            if probe:
+                with self._lock:
+                    self._probes_in_flight -= 1
+            raise
+        except Exception:
+            self._on_failure(probe)
             raise
+        
+        self._on_success(probe)
+        return result
     
-    def _on_success(self) -> None:
+    def _admit(self) -> bool:
+        """Admit one call, returning whether it is a half-open probe."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self.last_failure_time + self.recovery_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is open",
+                                           retry_after=remaining)
+                self.state = "half-open"
+                self.logger.info(f"Circuit breaker for {self.name} transitioning to half-open")
+            
+            if self.state == "half-open":
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"Circuit breaker for {self.name} is probing",
+                                           retry_after=self.PROBE_WAIT)
+                self._probes_in_flight += 1
+                return True
+            
+            return False
+    
+    def _on_success(self, probe: bool = False) -> None:
         """Handle successful operation."""
-        self.failure_count = 0
-        if self.state == "half-open":
-            self.state = "closed"
-            self.logger.info("Circuit breaker closed after successful recovery")
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+            self.failure_count = 0
+            if self.state == "half-open":
+                self.state = "closed"
+                self.logger.info(f"Circuit breaker for {self.name} closed after successful recovery")
     
-    def _on_failure(self) -> None:
+    def _on_failure(self, probe: bool = False) -> None:
         """Handle failed operation."""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self.failure_count >= self.failure_threshold:
-            self.state = "open"
-            self.logger.warning(f"Circuit breaker opened after {self.failure_count} failures")
+        with self._lock:
+            if probe:
+                self._probes_in_flight -= 1
+            self.failure_count += 1
+            self.last_failure_time = time.monotonic()
+            
+            if self.state == "half-open":
+                # A failed probe reopens the circuit for another recovery period
+                self.state = "open"
+                self.logger.warning(f"Circuit breaker for {self.name} reopened after failed probe")
+            elif self.state == "closed" and self.failure_count >= self.failure_threshold:
+                self.state = "open"
+                self.logger.warning(f"Circuit breaker for {self.name} opened after "
+                                    f"{self.failure_count} failures")
+
+
+class CircuitBreakerRegistry:
+    """Process-wide circuit breakers, one per host.
+    
+    A host's breaker is created with the settings of the first scraper to
+    use it, like the rate limiter buckets.
+    """
+    
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, host: str, failure_threshold: int, recovery_timeout: int,
+            half_open_max_calls: int = 1) -> CircuitBreaker:
+        """Return the breaker for a host, creating it on first use."""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(failure_threshold, recovery_timeout,
+                                         half_open_max_calls, name=host)
+                self._breakers[host] = breaker
+            return breaker
+    
+    def states(self) -> Dict[str, str]:
+        """Current state of every host's breaker."""
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
+    
+    def clear(self) -> None:
+        """Forget all breakers."""
+        with self._lock:
+            self._breakers.clear()
+
+
+host_circuit_breakers = CircuitBreakerRegistry()
+
+
+# Query parameters that only record where a visitor came from
+TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'dclid', 'yclid', 'igshid',
+                   'mc_cid', 'mc_eid', '_ga'}
+
+
+def _is_tracking_param(key: str) -> bool:
+    """Whether a decoded query parameter name is a tracking parameter."""
+    key = key.lower()
+    return key.startswith('utm_') or key in TRACKING_PARAMS
+
+
+def clean_url(url: str) -> str:
+    """Drop the fragment and tracking query parameters from a URL.
+    
+    Everything else is kept as written, so the result requests the same
+    resource; it is the form to fetch and store a URL in.
+    
+    Args:
+        url: Absolute URL
+    
+    Returns:
+        URL without fragment and tracking parameters
+    """
+    parts = urlsplit(url.strip())
+    query = parts.query
+    if query:
+        query = '&'.join(pair for pair in query.split('&')
+                         if not _is_tracking_param(unquote_plus(pair.split('=', 1)[0])))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so that equivalent spellings compare equal.
+    
+    Lowercases the scheme and host, drops a default port, the fragment and
+    tracking query parameters (utm_* and click ids), and sorts the rest of
+    the query. The result is a key to compare URLs by, not necessarily a
+    URL the server treats the same: fetch and store clean_url instead.
+    
+    Args:
+        url: Absolute URL
+    
+    Returns:
+        Canonical form of the URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rpartition(':')[2]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rpartition(':')[0]
+    
+    query = sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if not _is_tracking_param(key))
+    
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(query), ''))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header into seconds.
+    
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+    
+    Returns:
+        Seconds to wait, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
 
 
 def random_user_agent() -> str:
@@ -4,7 +4,9 @@ Flask web interface for the scraper application.
 
 import os
 import json
+import asyncio
 import threading
+from dataclasses import replace
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
@@ -14,7 +16,8 @@ import sqlite3
 from .database import DatabaseManager
 from .models import Product
 from .scraper import ProductScraper
-from .utils import RateLimiter
+from .async_scraper import AsyncProductScraper
+from .runner import ScrapeRunner, ScrapeSummary
 from .config import load_config
 
 
@@ -25,6 +28,7 @@ class ScraperWebApp:
         self.app = Flask(__name__)
         self.app.secret_key = os.urandom(24)
         self.database_path = database_path
+        self.config = load_config(os.getenv('SCRAPER_CONFIG'))
         self.db_manager = DatabaseManager(database_path)
         self.scraping_status = {
             'active': False,
@@ -32,7 +36,9 @@ class ScraperWebApp:
             'total': 0,
             'current_url': '',
             'errors': 0,
-            'start_time': None
+            'start_time': None,
+            'host_rates': {},
+            'stopped_by': None
         }
         self.setup_routes()
     
@@ -90,6 +96,13 @@ class ScraperWebApp:
                 url = request.form.get('url', '').strip()
                 max_pages = request.form.get('max_pages', 5, type=int)
                 rate_limit = request.form.get('rate_limit', 1.0, type=float)
+                use_async = request.form.get('use_async') == 'on'
+                adaptive_rate = request.form.get('adaptive_rate') == 'on'
+                budgets = {
+                    'time_budget': request.form.get('time_budget', 0.0, type=float) * 60,
+                    'request_budget': request.form.get('request_budget', 0, type=int),
+                    'byte_budget': int(request.form.get('byte_budget', 0.0, type=float) * 1024 * 1024),
+                }
                 
                 if not url:
                     flash('Please enter a URL', 'error')
@@ -100,7 +113,8 @@ class ScraperWebApp:
                     return redirect(url_for('scrape'))
                 
                 # Start scraping in background thread
-                thread = threading.Thread(target=self.start_scraping, args=(url, max_pages, rate_limit))
+                thread = threading.Thread(target=self.start_scraping, args=(url, max_pages, rate_limit, use_async, adaptive_rate),
+                                          kwargs=budgets)
                 thread.daemon = True
                 thread.start()
                 
@@ -358,49 +372,63 @@ class ScraperWebApp:
             print(f"Error getting brands: {e}")
             return []
     
-    def start_scraping(self, url: str, max_pages: int, rate_limit: float):
-        """Start scraping in background thread."""
+    def start_scraping(self, url: str, max_pages: int, rate_limit: float,
+                       use_async: bool = False, adaptive_rate: bool = False,
+                       time_budget: float = 0.0, request_budget: int = 0, byte_budget: int = 0):
+        """Start scraping in background thread.
+        
+        Budgets of 0 fall back to the configured ones (seconds, requests and
+        bytes for the whole job).
+        """
         self.scraping_status.update({
             'active': True,
             'progress': 0,
             'total': 0,
             'current_url': url,
             'errors': 0,
-            'start_time': datetime.now().isoformat()
+            'start_time': datetime.now().isoformat(),
+            'host_rates': {},
+            'stopped_by': None
         })
         
+        scraper = None
         try:
             # Initialize scraper
-            rate_limiter = RateLimiter(rate_limit, 5)
-            scraper = ProductScraper(url, rate_limiter=rate_limiter)
-            
-            # Extract product URLs
-            product_urls = scraper.extract_product_urls(url, max_pages=max_pages)
+            config = replace(self.config, requests_per_second=rate_limit, burst_size=5,
+                             adaptive_rate=adaptive_rate or self.config.adaptive_rate,
+                             time_budget=time_budget or self.config.time_budget,
+                             request_budget=request_budget or self.config.request_budget,
+                             byte_budget=byte_budget or self.config.byte_budget,
+                             database_path=self.database_path)
+            if use_async:
+                scraper = AsyncProductScraper(url, config=config, db_manager=self.db_manager)
+                product_urls = asyncio.run(scraper.extract_product_urls_async(url, max_pages=max_pages))
+            else:
+                scraper = ProductScraper(url, config=config, db_manager=self.db_manager)
+                product_urls = scraper.extract_product_urls(url, max_pages=max_pages)
             
             self.scraping_status['total'] = len(product_urls)
             
-            # Scrape products
-            for i, product_url in enumerate(product_urls):
-                if not self.scraping_status['active']:  # Allow stopping
-                    break
-                
+            def on_progress(product_url: str, summary: ScrapeSummary) -> None:
                 self.scraping_status['current_url'] = product_url
-                self.scraping_status['progress'] = i + 1
-                
-                try:
-                    product = scraper.scrape_product(product_url)
-                    if product:
-                        self.db_manager.save_product(product)
-                    else:
-                        self.scraping_status['errors'] += 1
-                except Exception as e:
-                    print(f"Error scraping {product_url}: {e}")
-                    self.scraping_status['errors'] += 1
+                self.scraping_status['progress'] = summary.processed
+                self.scraping_status['errors'] = summary.error_count
+                self.scraping_status['host_rates'] = scraper.get_stats()['host_rates']
+            
+            # Scrape products; clearing 'active' stops the run
+            runner = ScrapeRunner(scraper, self.db_manager,
+                                  on_progress=on_progress,
+                                  should_stop=lambda: not self.scraping_status['active'])
+            summary = runner.run(product_urls)
+            if summary.stopped_by:
+                self.scraping_status['stopped_by'] = scraper.budget.describe(summary.stopped_by)
             
         except Exception as e:
             print(f"Scraping error: {e}")
             self.scraping_status['errors'] += 1
         finally:
+            if scraper:
+                scraper.close()
             self.scraping_status['active'] = False
     
     def run(self, host: str = '127.0.0.1', port: int = 5000, debug: bool = False):
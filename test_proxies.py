@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Check proxy ban handling and failover against local stand-in proxies.
+"""
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from scraper.scraper import ProductScraper, FetchError
+from scraper.config import ScraperConfig
+
+PRODUCT_PAGE = b"""<html><head><title>Demo Widget</title></head><body>
+<h1>Demo Widget</h1><p class="price">$19.99</p>
+</body></html>"""
+
+
+class ShopHandler(BaseHTTPRequestHandler):
+    """Target site serving the same product page at every path."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(PRODUCT_PAGE)))
+        self.end_headers()
+        self.wfile.write(PRODUCT_PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_proxy_handler(target: str, banned: bool):
+    """Build a forwarding proxy handler that sends every host to the target.
+
+    A banned proxy answers 403 without forwarding, like an egress IP the
+    site has blocked. Requests seen by the proxy are counted in ``hits``.
+    """
+
+    class ProxyHandler(BaseHTTPRequestHandler):
+        hits = 0
+
+        def do_GET(self):
+            type(self).hits += 1
+            if banned:
+                self.send_response(403)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            # Proxied requests carry an absolute URI; keep only path and query
+            parsed = urlparse(self.path)
+            path = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+            with urlopen(f"http://{target}{path}", timeout=5) as upstream:
+                body = upstream.read()
+                self.send_response(upstream.status)
+                self.send_header('Content-Type', upstream.headers.get('Content-Type', 'text/html'))
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ProxyHandler
+
+
+def serve(handler) -> ThreadingHTTPServer:
+    """Start a server for a handler on a free local port."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_proxy_failover():
+    """A proxy answering 403 is quarantined and traffic moves to the healthy one."""
+    shop = serve(ShopHandler)
+    target = f"127.0.0.1:{shop.server_port}"
+    banned_proxy = serve(make_proxy_handler(target, banned=True))
+    healthy_proxy = serve(make_proxy_handler(target, banned=False))
+    banned_url = f"http://127.0.0.1:{banned_proxy.server_port}"
+    healthy_url = f"http://127.0.0.1:{healthy_proxy.server_port}"
+
+    # The site's host name only resolves through the proxies
+    config = ScraperConfig(proxies=[banned_url, healthy_url],
+                           requests_per_second=100.0, burst_size=100)
+    scraper = ProductScraper("http://shop.invalid", config=config)
+    banned_hits = banned_proxy.RequestHandlerClass
+    healthy_hits = healthy_proxy.RequestHandlerClass
+
+    try:
+        print("🚦 Sending requests until the banned proxy is picked...")
+        # Proxies are drawn at random, so the banned one is hit sooner or later
+        for i in range(50):
+            try:
+                scraper.scrape_product_attempt(f"http://shop.invalid/item/{i}")
+            except FetchError as e:
+                print(f"  Request {i + 1} failed: {e.status_code}")
+                assert e.status_code == 403
+            if banned_hits.hits:
+                break
+        assert banned_hits.hits == 1, "the banned proxy was never picked"
+
+        stats = scraper.proxy_pool.stats()
+        print(f"  Banned proxy: {stats[banned_url]}")
+        assert stats[banned_url]['bans'] == 1
+        assert stats[banned_url]['quarantined_for'] > 0
+
+        print("🔀 Checking that traffic moved to the healthy proxy...")
+        served = healthy_hits.hits
+        for i in range(10):
+            product = scraper.scrape_product_attempt(f"http://shop.invalid/after/{i}")
+            assert product is not None and product.name == "Demo Widget"
+
+        assert banned_hits.hits == 1, "a quarantined proxy received traffic"
+        assert healthy_hits.hits == served + 10
+        stats = scraper.proxy_pool.stats()
+        print(f"  Healthy proxy: {stats[healthy_url]}")
+        assert stats[healthy_url]['bans'] == 0
+        assert stats[healthy_url]['quarantined_for'] == 0
+    finally:
+        scraper.close()
+        for server in (shop, banned_proxy, healthy_proxy):
+            server.shutdown()
+            server.server_close()
+
+    print("\n🎉 Proxy check passed: the banned proxy was quarantined.")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    test_proxy_failover()